@@ -1,28 +1,379 @@
 from __future__ import annotations
 import bisect
-import copy
-from os import stat
 import random
-import traceback
-from typing import List, Tuple, Union
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple, Union
 
 from btree import DataPointer, Node
+from pager import BUFFER_POOL, BufferPool, Pager
+
+# leaves appended per buffer pool hold by append, so a large batch doesn't pin all of its pages at once
+APPEND_HOLD_LEAVES = 256
 #sys.stdout = open('file', 'w')
 
+
 class BPlusNode(Node):
-    def __init__(self, leaf: bool, parent: Node) -> None:
-        super().__init__(leaf)
-        self.pointers: List[BPlusNode] = []
-        self.parent: BPlusNode = parent
-        self.next: BPlusNode = None
-        self.prev: BPlusNode = None
+    """
+    Nodes refer to each other by page number, the tree resolves those
+    through the buffer pool. Leaves only link to the next leaf, the same
+    as the right sibling pointer in the page header, the previous one is
+    found through the parents. Internal nodes hold the zone map of each
+    child, see BPlusTree.use_zone_maps. Leaves hold the overflow pages of
+    their long records, see page_writer.TablePageCodec.
+    """
+    __slots__ = ("page_no", "parent_page", "child_pages", "next_page", "zones", "zone_columns", "overflow_pages")
+
+    def __init__(self, leaf: bool, parent_page: int = None, page_no: int = None) -> None:
+        self.is_leaf = leaf
+        self.keys: List[Union[DataPointer, int]] = []
+        self.page_no = page_no
+        self.parent_page = parent_page
+        self.child_pages: List[int] = []
+        self.next_page: int = None
+        # child page -> zone, for the zone columns they were worked out for
+        self.zones: Dict[int, tuple] = {}
+        self.zone_columns: tuple = ()
+        self.overflow_pages: List[int] = []
 
 class BPlusTree:
+    """
+    The root always lives on its pager's root_page. The pages of the leftmost
+    and rightmost leaves are kept up to date by the operations that split,
+    merge or move leaves, so scans from either end start without a search.
+    """
 
-    def __init__(self, min_ptr_degree: int = 3) -> None:
-        self.root = BPlusNode(True, None)
+    def __init__(self, min_ptr_degree: int = 3, pager: Pager = None, pool: BufferPool = None) -> None:
         self.min_degree = max(min_ptr_degree, 3)
+        self.pager = pager if pager is not None else Pager()
+        self.pool = pool if pool is not None else BUFFER_POOL
+        # None until the first scan finds them, for trees opened from existing pages
+        self.leftmost_page: int = None
+        self.rightmost_page: int = None
+        # number of entries, None until count() first works it out for those too
+        self.entry_count: int = None
+        # zone maps are off until use_zone_maps, nodes changed since they were last brought up to date
+        self.zone_columns: tuple = ()
+        self.leaf_zone: Callable[[List[DataPointer]], tuple] = None
+        self._touched: Dict[int, BPlusNode] = {}
+
+        if not self.pager.has_pages:
+            self.clear()
+
+    @property
+    def root(self) -> BPlusNode:
+        return self._node(self.pager.root_page)
+
+    def clear(self):
+        """
+        Drops every page and starts over with an empty root leaf.
+        """
+        stale = []
+        if self.pager.has_pages:
+            levels = list(self._levels())
+            stale = [page_no for level in levels for page_no in level][1:] + self._overflow_pages(levels[-1])
+        self.pool.drop(self.pager)
+        self.pager.reset(stale)
+        self.pool.add(self.pager, BPlusNode(True, None, self.pager.root_page))
+        self.leftmost_page = self.rightmost_page = self.pager.root_page
+        self.entry_count = 0
+
+    def drop(self):
+        """
+        Frees every page, root included, the tree can't be used afterwards.
+        """
+        levels = list(self._levels())
+        pages = [page_no for level in levels for page_no in level] + self._overflow_pages(levels[-1])
+        self.pool.drop(self.pager)
+        self.pager.drop(pages)
+        self.leftmost_page = self.rightmost_page = self.entry_count = None
+
+    def _overflow_pages(self, leaves: List[int]) -> List[int]:
+        # of the leaves, as the node in memory has them or else as its page does
+        if self.pager.codec is None:
+            return []
+
+        pages = []
+        for page_no in leaves:
+            if (node := self.pool.frames.get((self.pager, page_no))) is not None:
+                pages.extend(node.overflow_pages)
+            else:
+                pages.extend(self.pager.codec.overflow_pages(self.pager.read_page(page_no), self.pager))
+        return pages
+
+    def _levels(self) -> Iterator[List[int]]:
+        # page numbers level by level from the root, leaves are listed by their parents and only one is read
+        level = [self.pager.root_page]
+        while True:
+            yield level
+            if self._node(level[0]).is_leaf:
+                return
+            level = [child for page_no in level for child in self._node(page_no).child_pages]
+
+    def count(self) -> int:
+        """
+        Number of entries in the tree. Kept up to date by inserts and deletes once
+        known, a tree opened from existing pages adds up its leaves the first time,
+        taking the cell count from the page header of leaves that aren't in memory
+        rather than decoding them.
+        """
+        if self.entry_count is None:
+            *_, leaves = self._levels()
+            self.entry_count = 0
+            for page_no in leaves:
+                if self.pager.codec is None or (self.pager, page_no) in self.pool.frames:
+                    self.entry_count += len(self._node(page_no).keys)
+                else:
+                    self.entry_count += self.pager.codec.cell_count(self.pager.read_page(page_no))
+
+        return self.entry_count
+
+    def flush(self):
+        self.pool.flush(self.pager)
+
+    def use_zone_maps(self, zone_columns: tuple, leaf_zone: Callable[[List[DataPointer]], tuple]):
+        """
+        Has every internal node keep a zone for each child: per zone column the
+        (min, max) of the values in the child's subtree, or None when unknown.
+        leaf_zone works out the zone of a leaf's entries, the zone of an internal
+        node is the union of its children's. Zones are brought up to date by
+        inserts, deletes and leaf_changed, and are written with the pages, pages
+        kept for other zone columns count as unknown until they change.
+        """
+        self.zone_columns = zone_columns
+        self.leaf_zone = leaf_zone
+
+    def leaf_changed(self, leaf: BPlusNode):
+        """
+        For entries changed in place, the leaf is written back and its zone redone.
+        """
+        with self.pool.hold():
+            self._dirty(leaf)
+            self._update_zones()
+
+    def zone(self) -> tuple:
+        """
+        Zone of the whole tree, from the root's zones of its children.
+        """
+        return self._zone(self.root) if self.zone_columns else None
+
+    def child_zone(self, node: BPlusNode, page_no: int) -> tuple:
+        if node.zone_columns != self.zone_columns or not self.zone_columns:
+            return None
+        return node.zones.get(page_no)
+
+    def _zone(self, node: BPlusNode) -> tuple:
+        if node.is_leaf:
+            return self.leaf_zone(node.keys)
+        return self._merge_zones([self.child_zone(node, page_no) for page_no in node.child_pages])
+
+    @staticmethod
+    def _merge_zones(zones: List[tuple]) -> tuple:
+        if not zones or None in zones:
+            return None
+        if len(zones) == 1:
+            return zones[0]
+
+        merged = []
+        for bounds in zip(*zones):
+            if None in bounds:
+                merged.append(None)
+            else:
+                merged.append((min([lo for lo, _ in bounds]), max([hi for _, hi in bounds])))
+        return tuple(merged)
 
+    @staticmethod
+    def _widen(zone: tuple, other: tuple) -> tuple:
+        # the merge of two known zones, the zone itself when it already covers the other
+        widened = []
+        for a, b in zip(zone, other):
+            if a is None or b is None:
+                widened.append(None)
+            elif b[0] < a[0] or b[1] > a[1]:
+                widened.append((a[0] if a[0] < b[0] else b[0], a[1] if a[1] > b[1] else b[1]))
+            else:
+                widened.append(a)
+        return tuple(widened)
+
+    def _update_zones(self):
+        """
+        From each node changed, up until an ancestor's zone of it stays the same.
+        A zone that only grew widens its parent's by as much, so the parent's
+        other children aren't gone through again, as with most inserts.
+        """
+        touched, self._touched = self._touched, {}
+        for node in touched.values():
+            zone = self._zone(node)
+            parent = self._parent(node)
+            while parent is not None:
+                if parent.zone_columns != self.zone_columns:
+                    parent.zones, parent.zone_columns = {}, self.zone_columns
+                old = parent.zones.get(node.page_no, False)
+                if old == zone:
+                    break
+                parent.zones[node.page_no] = zone
+                self.pool.mark_dirty(self.pager, parent)
+
+                grand = self._parent(parent)
+                known = grand.zones.get(parent.page_no) if grand is not None and grand.zone_columns == self.zone_columns else None
+                if known is not None and old and zone is not None and self._widen(zone, old) == zone:
+                    zone = self._widen(known, zone)
+                else:
+                    zone = self._zone(parent)
+                node, parent = parent, grand
+
+    def _node(self, page_no: int) -> BPlusNode:
+        return self.pool.fetch(self.pager, page_no)
+
+    def _parent(self, node: BPlusNode) -> BPlusNode:
+        return self._node(node.parent_page) if node.parent_page is not None else None
+
+    def _dirty(self, *nodes: BPlusNode):
+        for node in nodes:
+            self.pool.mark_dirty(self.pager, node)
+            if self.zone_columns:
+                self._touched[id(node)] = node
+
+    def _new_node(self, leaf: bool, parent_page: int) -> BPlusNode:
+        node = BPlusNode(leaf, parent_page, self.pager.allocate_page())
+        self.pool.add(self.pager, node)
+        self._dirty(node)
+        return node
+
+    def _free(self, node: BPlusNode):
+        self._touched.pop(id(node), None)
+        self.pool.discard(self.pager, node.page_no)
+        self.pager.free_page(node.page_no)
+        for page_no in node.overflow_pages:
+            self.pager.free_page(page_no)
+
+    def _adopt(self, node: BPlusNode, child_pages: List[int]):
+        for page_no in child_pages:
+            child = self._node(page_no)
+            child.parent_page = node.page_no
+            self._dirty(child)
+
+    def _move_node(self, node: BPlusNode, page_no: int):
+        # page numbers of everything pointing at the node must be fixed up by the caller,
+        # apart from its children
+        self.pool.discard(self.pager, node.page_no)
+        if node.is_leaf:
+            self._leaf_replaced(node.page_no, page_no)
+        node.page_no = page_no
+        self.pool.add(self.pager, node)
+        self._dirty(node)
+        if not node.is_leaf:
+            self._adopt(node, node.child_pages)
+
+    def _leaf_replaced(self, old_page: int, new_page: int):
+        if self.leftmost_page == old_page:
+            self.leftmost_page = new_page
+        if self.rightmost_page == old_page:
+            self.rightmost_page = new_page
+
+    def _find_edges(self):
+        for edge in [0, -1]:
+            node = self.root
+            while not node.is_leaf:
+                node = self._node(node.child_pages[edge])
+            if edge == 0:
+                self.leftmost_page = node.page_no
+            else:
+                self.rightmost_page = node.page_no
+
+    def leftmost_leaf(self) -> BPlusNode:
+        if self.leftmost_page is None:
+            self._find_edges()
+        return self._node(self.leftmost_page)
+
+    def rightmost_leaf(self) -> BPlusNode:
+        if self.rightmost_page is None:
+            self._find_edges()
+        return self._node(self.rightmost_page)
+
+    def next_leaf(self, leaf: BPlusNode) -> BPlusNode:
+        return self._node(leaf.next_page) if leaf.next_page is not None else None
+
+    def prev_leaf(self, leaf: BPlusNode) -> BPlusNode:
+        """
+        Up to the first ancestor the leaf isn't leftmost under, then down the
+        right edge of the subtree to its left.
+        """
+        node = leaf
+        while node.parent_page is not None:
+            parent = self._parent(node)
+            i = parent.child_pages.index(node.page_no)
+            if i > 0:
+                node = self._node(parent.child_pages[i - 1])
+                while not node.is_leaf:
+                    node = self._node(node.child_pages[-1])
+                return node
+            node = parent
+
+        return None
+
+    def scan_leaves(self, lo: int = None, hi: int = None, reverse: bool = False,
+                    zone_filter: Callable[[tuple], bool] = None) -> Iterator[Tuple[BPlusNode, List[DataPointer]]]:
+        """
+        (leaf, entries of the leaf with lo <= key <= hi) in key order, or the
+        reverse, a bound of None is open. Only the leaves holding the range are
+        visited, the first one through the leftmost/rightmost leaf or a search.
+        With a zone_filter the leaves are reached down from the root instead,
+        leaving out every subtree whose zone the filter rejects.
+        """
+        if zone_filter is not None and self.zone_columns:
+            for leaf in self._zoned_leaves(lo, hi, reverse, zone_filter):
+                start = 0 if lo is None else bisect.bisect_left(leaf.keys, lo)
+                end = len(leaf.keys) if hi is None else bisect.bisect_right(leaf.keys, hi)
+                if start < end:
+                    yield leaf, leaf.keys[start:end][::-1] if reverse else leaf.keys[start:end]
+        elif not reverse:
+            leaf = self.leftmost_leaf() if lo is None else self._search(self.root, lo)[0]
+            while leaf is not None:
+                start = 0 if lo is None else bisect.bisect_left(leaf.keys, lo)
+                end = len(leaf.keys) if hi is None else bisect.bisect_right(leaf.keys, hi)
+                if start < end:
+                    yield leaf, leaf.keys[start:end]
+                if end < len(leaf.keys):
+                    return
+                leaf = self.next_leaf(leaf)
+        else:
+            leaf = self.rightmost_leaf() if hi is None else self._search(self.root, hi)[0]
+            while leaf is not None:
+                start = 0 if lo is None else bisect.bisect_left(leaf.keys, lo)
+                end = len(leaf.keys) if hi is None else bisect.bisect_right(leaf.keys, hi)
+                if start < end:
+                    yield leaf, leaf.keys[start:end][::-1]
+                if start > 0:
+                    return
+                leaf = self.prev_leaf(leaf)
+
+    def _zoned_leaves(self, lo: int, hi: int, reverse: bool,
+                      zone_filter: Callable[[tuple], bool]) -> Iterator[BPlusNode]:
+        # depth first, child i holds the keys from router i - 1 up to router i
+        pending = [self.pager.root_page]
+        while pending:
+            node = self._node(pending.pop())
+            if node.is_leaf:
+                yield node
+                continue
+
+            children = []
+            for i, page_no in enumerate(node.child_pages):
+                if lo is not None and i < len(node.keys) and node.keys[i] <= lo:
+                    continue
+                if hi is not None and i > 0 and node.keys[i - 1] > hi:
+                    continue
+                zone = self.child_zone(node, page_no)
+                if zone is None or zone_filter(zone):
+                    children.append(page_no)
+
+            pending.extend(children if reverse else reversed(children))
+
+    def scan(self, lo: int = None, hi: int = None, reverse: bool = False) -> Iterator[DataPointer]:
+        """
+        Every entry with lo <= key <= hi, in key order or the reverse.
+        """
+        for _, entries in self.scan_leaves(lo, hi, reverse):
+            yield from entries
 
     def search(self, key: Union[DataPointer, int]):
         (node, idx) = self._search(self.root, key)
@@ -38,141 +389,288 @@ class BPlusTree:
         return 2 * self.min_degree
 
     def _search(self, node: BPlusNode, key: Union[DataPointer, int]) -> Tuple[BPlusNode, int]:
-        i = 0
-        n = len(node.keys)
+        while not node.is_leaf:
+            i = bisect.bisect_right(node.keys, key)
+            node = self._node(node.child_pages[i])
 
-        if node.is_leaf:
-            while i < n and key > node.keys[i]:
-                i += 1
-            if i < n and key == node.keys[i]:
-                return (node, i)
-            else:
-                return (node, None)
+        i = bisect.bisect_left(node.keys, key)
+        if i < len(node.keys) and key == node.keys[i]:
+            return (node, i)
         else:
-            while i < n and key >= node.keys[i]:
-                i += 1
-            return self._search(node.pointers[i], key)
+            return (node, None)
 
     def insert(self, entry: Union[DataPointer, int]) -> None:
-        insertion_leaf, _ = self._search(self.root, entry)
-        max_key_fill = self.max_ptr_degree() - 1
+        with self.pool.hold():
+            insertion_leaf, _ = self._search(self.root, entry)
+            max_key_fill = self.max_ptr_degree() - 1
+
+            if len(insertion_leaf.keys) >= max_key_fill:
+                # split the leaf, recursively call insert on parent with copied key.
+                (mkey, rc) = self._insert_split_leaf(insertion_leaf, entry)
+                if insertion_leaf.parent_page is not None:
+                    self._insert_up(self._parent(insertion_leaf), mkey, rc)
+                else:
+                    self._grow_root(mkey, insertion_leaf, rc)
 
-        if len(insertion_leaf.keys) >= max_key_fill:
-            # split the leaf, recursively call insert on parent with copied key.
-            (mkey, lc, rc) = self._insert_split_leaf(insertion_leaf, entry)
-            if insertion_leaf.parent:
-                self._insert_up(insertion_leaf.parent, mkey, lc)
             else:
-                new_root = BPlusNode(False, None)
-                new_root.keys = [mkey]
-                new_root.pointers = [lc, rc]
-                lc.parent = new_root
-                rc.parent = new_root
-                self.root = new_root
+                bisect.insort_left(insertion_leaf.keys, entry)
+                self._dirty(insertion_leaf)
+
+            if self.entry_count is not None:
+                self.entry_count += 1
+            self._update_zones()
+
+    def append(self, sorted_entries: Iterable[Union[DataPointer, int]]) -> None:
+        """
+        Adds keys larger than every key in the tree, in order. They fill up the
+        rightmost leaf and then new leaves to its right, packed as full as
+        bulk_load packs them rather than the half full ones splits leave, and
+        only the right edge of the tree is walked to hang them in. Keys that
+        don't all come after the tree's last one are inserted one at a time.
+        """
+        entries = list(sorted_entries)
+        if not entries:
+            return
 
-        else:
-            bisect.insort_left(insertion_leaf.keys, entry)
+        last_keys = self.rightmost_leaf().keys
+        if last_keys and self._router_key(last_keys[-1]) >= self._router_key(entries[0]):
+            for entry in entries:
+                self.insert(entry)
+            return
 
-    def _insert_up(self, parent: BPlusNode, router: int, lc: BPlusNode):
+        cap = self.max_ptr_degree() - 1
+        step = cap * APPEND_HOLD_LEAVES
+        for start in range(0, len(entries), step):
+            with self.pool.hold():
+                self._append_leaves(entries[start:start + step], cap)
+                self._update_zones()
+
+        if self.entry_count is not None:
+            self.entry_count += len(entries)
+
+    def _append_leaves(self, entries: List[Union[DataPointer, int]], cap: int):
+        leaf = self.rightmost_leaf()
+        keys = leaf.keys + entries
+        sizes = self._even_chunk_sizes(len(keys), cap)
+
+        leaf.keys = keys[:sizes[0]]
+        self._dirty(leaf)
+        start = sizes[0]
+
+        for size in sizes[1:]:
+            new_leaf = self._new_node(True, leaf.parent_page)
+            new_leaf.keys = keys[start:start + size]
+            leaf.next_page = new_leaf.page_no
+            self.rightmost_page = new_leaf.page_no
+
+            router = self._router_key(new_leaf.keys[0])
+            if leaf.parent_page is not None:
+                self._insert_up(self._parent(leaf), router, new_leaf)
+            else:
+                self._grow_root(router, leaf, new_leaf)
+
+            leaf = new_leaf
+            start += size
+
+    def _grow_root(self, router: int, lc: BPlusNode, rc: BPlusNode):
+        # the old root moves off the root page, a new root takes its place above both halves
+        self._move_node(lc, self.pager.allocate_page())
+        new_root = BPlusNode(False, None, self.pager.root_page)
+        new_root.keys = [router]
+        new_root.child_pages = [lc.page_no, rc.page_no]
+        lc.parent_page = rc.parent_page = new_root.page_no
+        self.pool.add(self.pager, new_root)
+        self._dirty(rc)
+
+    def bulk_load(self, sorted_iterable: Iterable[Union[DataPointer, int]], fill_factor: float = 1.0) -> None:
+        """
+        Replaces the tree with one built bottom-up from sorted unique keys.
+        The shape of every level is worked out first, so each node is written
+        once with its parent and next leaf already known, then the leaf level
+        and each internal level above it are laid down in order.
+        fill_factor (0, 1] sets how full nodes are packed, leaving room for later inserts.
+        """
+        keys = list(sorted_iterable)
+        max_key_fill = self.max_ptr_degree() - 1
+        cap = min(max_key_fill, max(self.min_ptr_degree(), round(max_key_fill * fill_factor)))
+
+        self.clear()
+        if not keys:
+            return
+
+        # levels[0] holds the number of keys per leaf, the rest the number of children per node
+        levels = [self._even_chunk_sizes(len(keys), cap)]
+        while len(levels[-1]) > 1:
+            levels.append(self._even_chunk_sizes(len(levels[-1]), cap + 1))
+
+        # root keeps the page clear() gave it, everything else is numbered level by level
+        pages = [[self.pager.allocate_page() for _ in sizes] for sizes in levels[:-1]] + [[self.pager.root_page]]
+        parents = [self._parent_positions(sizes) for sizes in levels[1:]] + [[None]]
+        self.pool.discard(self.pager, self.pager.root_page)
+        self.leftmost_page, self.rightmost_page = pages[0][0], pages[0][-1]
+        self.entry_count = len(keys)
+
+        mins, zones, start = [], [], 0
+        for i, size in enumerate(levels[0]):
+            leaf = BPlusNode(True, None, pages[0][i])
+            leaf.keys = keys[start:start + size]
+            if i + 1 < len(pages[0]):
+                leaf.next_page = pages[0][i + 1]
+            if parents[0][i] is not None:
+                leaf.parent_page = pages[1][parents[0][i]]
+            mins.append(self._router_key(leaf.keys[0]))
+            if self.zone_columns:
+                zones.append(self.leaf_zone(leaf.keys))
+            self.pool.add(self.pager, leaf)
+            start += size
+
+        for lvl in range(1, len(levels)):
+            level_mins, level_zones, start = [], [], 0
+            for i, size in enumerate(levels[lvl]):
+                node = BPlusNode(False, None, pages[lvl][i])
+                node.child_pages = pages[lvl - 1][start:start + size]
+                # routers are the smallest key to their right
+                node.keys = mins[start + 1:start + size]
+                if parents[lvl][i] is not None:
+                    node.parent_page = pages[lvl + 1][parents[lvl][i]]
+                level_mins.append(mins[start])
+                if self.zone_columns:
+                    node.zones = dict(zip(node.child_pages, zones[start:start + size]))
+                    node.zone_columns = self.zone_columns
+                    level_zones.append(self._merge_zones(zones[start:start + size]))
+                self.pool.add(self.pager, node)
+                start += size
+            mins, zones = level_mins, level_zones
+
+    def _even_chunk_sizes(self, n: int, cap: int) -> List[int]:
+        # as few chunks of at most cap items as possible, sizes differ by at most one
+        n_chunks = -(-n // cap)
+        while n_chunks > 1 and n // n_chunks < self.min_ptr_degree():
+            n_chunks -= 1
+
+        return [n // n_chunks + (1 if i < n % n_chunks else 0) for i in range(n_chunks)]
+
+    @staticmethod
+    def _parent_positions(group_sizes: List[int]) -> List[int]:
+        return [parent for parent, size in enumerate(group_sizes) for _ in range(size)]
+
+    @staticmethod
+    def _router_key(entry: Union[DataPointer, int]) -> int:
+        return entry.id if isinstance(entry, DataPointer) else entry
+
+    def _insert_up(self, parent: BPlusNode, router: int, rc: BPlusNode):
         max_key_fill = self.max_ptr_degree() - 1
 
         if len(parent.keys) >= max_key_fill:
             # insert and split, propogate up recursively
-            (mkey, lci, rci) = self._insert_split_internal(parent, router, lc)
-            if parent.parent:
-                self._insert_up(parent.parent, mkey, lci)
+            (mkey, rci) = self._insert_split_internal(parent, router, rc)
+            if parent.parent_page is not None:
+                self._insert_up(self._parent(parent), mkey, rci)
             else:
-                new_root = BPlusNode(False, None)
-                new_root.keys = [mkey]
-                new_root.pointers = [lci, rci]
-                lci.parent = new_root
-                rci.parent = new_root
-                self.root = new_root
+                self._grow_root(mkey, parent, rci)
         else:
-            i = bisect.bisect_left(parent.keys, router)
-            parent.pointers.insert(i, lc)
+            i = bisect.bisect_right(parent.keys, router)
+            parent.child_pages.insert(i + 1, rc.page_no)
             parent.keys.insert(i, router)
+            self._dirty(parent)
 
-    def _insert_split_internal(self, internal_node: BPlusNode, router: int, lc: BPlusNode):
-        index = bisect.bisect_left(internal_node.keys, router)
-        internal_node.pointers.insert(index, lc)
+    def _insert_split_internal(self, internal_node: BPlusNode, router: int, rc: BPlusNode):
+        index = bisect.bisect_right(internal_node.keys, router)
+        internal_node.child_pages.insert(index + 1, rc.page_no)
         internal_node.keys.insert(index, router)
 
-        split_node = BPlusNode(False, internal_node.parent)
+        split_node = self._new_node(False, internal_node.parent_page)
         t = self.min_ptr_degree()
 
         median_key = internal_node.keys[t]
-        split_node.keys = internal_node.keys[:t]
-        split_node.pointers = internal_node.pointers[:t+1]
+        split_node.keys = internal_node.keys[t+1:]
+        split_node.child_pages = internal_node.child_pages[t+1:]
 
-        for ptr in split_node.pointers:
-            ptr.parent = split_node
+        internal_node.keys = internal_node.keys[:t]
+        internal_node.child_pages = internal_node.child_pages[:t+1]
 
-        internal_node.keys = internal_node.keys[t+1:]
-        internal_node.pointers = internal_node.pointers[t+1:]
+        self._adopt(split_node, split_node.child_pages)
+        self._dirty(internal_node)
 
-        return (median_key, split_node, internal_node)
+        return (median_key, split_node)
 
 
-    def _insert_split_leaf(self, leaf_node: BPlusNode, entry: Union[DataPointer, int]) -> Tuple[int, BPlusNode, BPlusNode]:
+    def _insert_split_leaf(self, leaf_node: BPlusNode, entry: Union[DataPointer, int]) -> Tuple[int, BPlusNode]:
         bisect.insort_left(leaf_node.keys, entry)
 
-        split_node = BPlusNode(True, leaf_node.parent)
+        split_node = self._new_node(True, leaf_node.parent_page)
         t = self.min_ptr_degree()
 
-        median_key = leaf_node.keys[t]
-        median_key = median_key.id if isinstance(median_key, DataPointer) else median_key
-        split_node.keys = leaf_node.keys[:t]
-        leaf_node.keys = leaf_node.keys[t:]
+        median_key = self._router_key(leaf_node.keys[t])
+        split_node.keys = leaf_node.keys[t:]
+        leaf_node.keys = leaf_node.keys[:t]
 
-        if leaf_node.prev:
-            leaf_node.prev.next = split_node
+        split_node.next_page = leaf_node.next_page
+        leaf_node.next_page = split_node.page_no
+        if self.rightmost_page == leaf_node.page_no:
+            self.rightmost_page = split_node.page_no
+        self._dirty(leaf_node)
 
-        split_node.prev = leaf_node.prev
-        split_node.next = leaf_node
-        leaf_node.prev = split_node
+        return (median_key, split_node)
 
-        return (median_key, split_node, leaf_node)
-        
     def delete(self, key: int):
+        with self.pool.hold():
+            found = self._delete(key)
+            self._update_zones()
+            return found
+
+    def _delete(self, key: int):
         val_loc, idx = self._search(self.root, key)
 
         if idx is None:
             return
             raise KeyError(f"Key {key} not in tree.")
 
-        val_loc.keys.remove(key)
+        val_loc.keys.pop(idx)
+        self._dirty(val_loc)
+        if self.entry_count is not None:
+            self.entry_count -= 1
 
-        if self._node_is_underflow(val_loc) and val_loc.parent:
-            vparent = val_loc.parent
-            ptr_idx = vparent.pointers.index(val_loc)
-            left_sib = vparent.pointers[ptr_idx - 1] if ptr_idx - 1 >= 0 else None
-            right_sib = vparent.pointers[ptr_idx + 1] if ptr_idx + 1 < len(vparent.pointers) else None
+        if self._node_is_underflow(val_loc) and val_loc.parent_page is not None:
+            vparent = self._parent(val_loc)
+            ptr_idx = vparent.child_pages.index(val_loc.page_no)
+            left_sib = self._node(vparent.child_pages[ptr_idx - 1]) if ptr_idx - 1 >= 0 else None
+            right_sib = self._node(vparent.child_pages[ptr_idx + 1]) if ptr_idx + 1 < len(vparent.child_pages) else None
             transfer_max = self.min_ptr_degree() + 1
+            self._dirty(vparent)
 
             if right_sib and len(right_sib.keys) <= transfer_max:
                 val_loc.keys += right_sib.keys
-                vparent.pointers.pop(ptr_idx + 1)
+                val_loc.next_page = right_sib.next_page
+                vparent.child_pages.pop(ptr_idx + 1)
                 vparent.keys.pop(ptr_idx)
+                self._leaf_replaced(right_sib.page_no, val_loc.page_no)
+                self._free(right_sib)
 
             elif left_sib and len(left_sib.keys) <= transfer_max:
                 left_sib.keys += val_loc.keys
-                vparent.pointers.pop(ptr_idx)
+                left_sib.next_page = val_loc.next_page
+                vparent.child_pages.pop(ptr_idx)
                 vparent.keys.pop(ptr_idx - 1)
+                self._leaf_replaced(val_loc.page_no, left_sib.page_no)
+                self._dirty(left_sib)
+                self._free(val_loc)
 
             elif right_sib and len(right_sib.keys) > transfer_max:
 
                 while self._node_is_underflow(val_loc) and not self._node_is_underflow(right_sib):
                     pull_key = right_sib.keys.pop(0)
                     val_loc.keys.append(pull_key)
-                    vparent.keys[ptr_idx] = right_sib.keys[0].id if isinstance(right_sib.keys[0], DataPointer) else right_sib.keys[0]
+                    vparent.keys[ptr_idx] = self._router_key(right_sib.keys[0])
+                self._dirty(right_sib)
 
             elif left_sib and len(left_sib.keys) > transfer_max:
 
                 while self._node_is_underflow(val_loc) and not self._node_is_underflow(left_sib):
                     pull_key = left_sib.keys.pop()
                     val_loc.keys.insert(0, pull_key)
-                    vparent.keys[ptr_idx - 1] = pull_key.id if isinstance(pull_key, DataPointer) else pull_key
+                    vparent.keys[ptr_idx - 1] = self._router_key(pull_key)
+                self._dirty(left_sib)
 
             if self._node_is_underflow(vparent):
                 self._fuse_or_share_internal(vparent)
@@ -184,84 +682,62 @@ class BPlusTree:
 
     def _fuse_or_share_internal(self, node: BPlusNode):
 
-        if gp := node.parent:
-            idx = gp.pointers.index(node)
-            ls = gp.pointers[idx-1] if idx - 1 >= 0 else None
-            rs = gp.pointers[idx+1] if idx + 1 < len(gp.pointers) else None
+        if gp := self._parent(node):
+            idx = gp.child_pages.index(node.page_no)
+            ls = self._node(gp.child_pages[idx-1]) if idx - 1 >= 0 else None
+            rs = self._node(gp.child_pages[idx+1]) if idx + 1 < len(gp.child_pages) else None
             transfer_max = self.min_ptr_degree() + 1
+            self._dirty(gp, node)
 
             if rs and len(rs.keys) <= transfer_max:
                 median_key = gp.keys.pop(idx)
-                gp.pointers.pop(idx+1)
+                gp.child_pages.pop(idx+1)
                 node.keys = node.keys + [median_key] + rs.keys
-                for ptr in rs.pointers:
-                    ptr.parent = node
-                node.pointers.extend(rs.pointers)
+                self._adopt(node, rs.child_pages)
+                node.child_pages.extend(rs.child_pages)
+                self._free(rs)
 
             elif ls and len(ls.keys) <= transfer_max:
                 median_key = gp.keys.pop(idx-1)
-                gp.pointers.pop(idx)
+                gp.child_pages.pop(idx)
                 ls.keys = ls.keys + [median_key] + node.keys
-                for ptr in node.pointers:
-                    ptr.parent = ls
-                ls.pointers.extend(node.pointers)
+                self._adopt(ls, node.child_pages)
+                ls.child_pages.extend(node.child_pages)
+                self._dirty(ls)
+                self._free(node)
 
             elif rs and len(rs.keys) > transfer_max:
 
                 while self._node_is_underflow(node) and not self._node_is_underflow(rs):
-                    pull_ptr = rs.pointers.pop(0)
+                    pull_ptr = rs.child_pages.pop(0)
                     pull_key = rs.keys.pop(0)
                     node.keys.append(gp.keys[idx])
-                    pull_ptr.parent = node
-                    node.pointers.append(pull_ptr)
+                    self._adopt(node, [pull_ptr])
+                    node.child_pages.append(pull_ptr)
                     gp.keys[idx] = pull_key
+                self._dirty(rs)
 
             elif ls and len(ls.keys) > transfer_max:
 
                 while self._node_is_underflow(node) and not self._node_is_underflow(ls):
-                    pull_ptr = ls.pointers.pop()
+                    pull_ptr = ls.child_pages.pop()
                     pull_key = ls.keys.pop()
                     node.keys.insert(0, gp.keys[idx-1])
-                    pull_ptr.parent = node
-                    node.pointers.insert(0, pull_ptr)
+                    self._adopt(node, [pull_ptr])
+                    node.child_pages.insert(0, pull_ptr)
                     gp.keys[idx-1] = pull_key
+                self._dirty(ls)
 
             if self._node_is_underflow(gp):
                 self._fuse_or_share_internal(gp)
 
         elif len(node.keys) == 0:
-            new_root = node.pointers.pop()
-            new_root.parent = None
-            self.root = new_root
-
-    @staticmethod
-    def _borrow_left_leaf(node: BPlusNode, left_sib: BPlusNode):
-        if left_sib and BPlusTree._is_more_than_half(left_sib) and left_sib.is_leaf:
-            new_key = left_sib.keys.pop()
-            node.keys.insert(0, new_key)
-            return True
-        
-        return False
-
-
-    @staticmethod
-    def _borrow_right_leaf(node: BPlusNode, right_sib: BPlusNode):
-        if right_sib and BPlusTree._is_more_than_half(right_sib) and right_sib.is_leaf:
-            new_key = right_sib.keys.pop(0)
-            node.keys.append(new_key)
-            return True
-        
-        return False
-
-    @staticmethod
-    def _merge_leaves(left: BPlusNode, right: BPlusNode):
-        
-        left.next = right.next
-        if right.next:
-            right.next.prev = left
-        
-        left.keys += right.keys
-        return 
+            # the only child becomes the root, taking over the root page
+            new_root = self._node(node.child_pages.pop())
+            self.pool.discard(self.pager, self.pager.root_page)
+            self.pager.free_page(new_root.page_no)
+            new_root.parent_page = None
+            self._move_node(new_root, self.pager.root_page)
 
     def _node_is_underflow(self, node: BPlusNode):
         return len(node.keys) < self.min_ptr_degree()
@@ -278,9 +754,9 @@ class BPlusTree:
         else:
             print(_prefix, "`- " if _last else "|- ", str(node.keys), sep="")
             _prefix += "   " if _last else "|  "
-            for i, child in enumerate(node.pointers):
-                _last = (i == len(node.pointers) - 1)
-                self.show(child, _prefix, _last)
+            for i, page_no in enumerate(node.child_pages):
+                _last = (i == len(node.child_pages) - 1)
+                self.show(self._node(page_no), _prefix, _last)
 
 
     def show_tree(self):
@@ -290,8 +766,8 @@ class BPlusTree:
         pass
 
 
-    
-                
+
+
 if __name__ == "__main__":
     tree = BPlusTree()
 
@@ -303,7 +779,7 @@ if __name__ == "__main__":
     for i in ls_nums:
         dp = DataPointer(int.__int__, i)
         tree.insert(dp)
-        
+
     tree.show_tree()
 
     random.shuffle(ls_nums)
@@ -316,6 +792,6 @@ if __name__ == "__main__":
             traceback.print_exc()
             tree.show_tree()
             break
-        
+
     #tree.show_tree()
-    """
\ No newline at end of file
+    """
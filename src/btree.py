@@ -1,16 +1,17 @@
 from __future__ import annotations
 from functools import total_ordering
-from typing import Callable, Generic, List, Tuple, TypeVar, Union
+from typing import Callable, Generic, Iterator, List, Tuple, TypeVar, Union
 import random
 T = TypeVar("T")
 
 
 @total_ordering
 class DataPointer(Generic[T]):
-    
+    # the extractor is only used to key the instance, one of these per row
+    __slots__ = ("id", "data")
+
     def __init__(self, type_id_extractor: Callable[[T], int], keyed_instance: T) -> None:
         self.id: int = type_id_extractor(keyed_instance)
-        self.id_extractor: Callable[[T], int] = type_id_extractor
         self.data: T = keyed_instance
 
     def get_id(self):
@@ -41,6 +42,7 @@ class DataPointer(Generic[T]):
 
 
 class Node:
+    __slots__ = ("keys", "pointers", "is_leaf")
 
     def __init__(self, leaf: bool) -> None:
         self.keys: List[Union[DataPointer, int]] = []
@@ -63,6 +65,77 @@ class BTree:
     def search(self, key: Union[DataPointer, int]):
         return self._search(self.root, key)
 
+    def iter_range(self, lo=None, hi=None) -> Iterator[Union[DataPointer, int]]:
+        """
+        In-order walk of all keys k with lo <= k <= hi, a bound of None is open.
+        Subtrees that lie entirely outside the bounds are never visited.
+        """
+        return self._iter_range(self.root, lo, hi)
+
+    def _iter_range(self, node: Node, lo, hi):
+        n = len(node.keys)
+
+        for i in range(n):
+            key = node.keys[i]
+
+            if not node.is_leaf and (lo is None or key > lo):
+                yield from self._iter_range(node.pointers[i], lo, hi)
+
+            if hi is not None and key > hi:
+                return
+
+            if lo is None or key >= lo:
+                yield key
+
+        if not node.is_leaf and node.pointers:
+            yield from self._iter_range(node.pointers[n], lo, hi)
+
+    def bulk_load(self, sorted_keys: List[Union[DataPointer, int]]) -> None:
+        """
+        Bottom-up build from keys that are already sorted and unique, replaces
+        the current contents. Each level is cut into runs of keys with a single
+        separator key between runs, the separators become the next level up.
+        """
+        keys = list(sorted_keys)
+        children = None
+
+        while True:
+            nodes, separators = self._pack_level(keys, children)
+            if len(nodes) == 1:
+                self.root = nodes[0]
+                return
+            keys, children = separators, nodes
+
+    def _pack_level(self, keys: List, children: List[Node] = None) -> Tuple[List[Node], List]:
+        n = len(keys)
+        max_keys = self.max_ptr_degree() - 1
+        min_keys = self.min_ptr_degree() - 1
+
+        # n = sum(run sizes) + (n_runs - 1) separators
+        n_runs = max(1, -(-(n + 1) // (max_keys + 1)))
+        while n_runs > 1 and (n - n_runs + 1) // n_runs < min_keys:
+            n_runs -= 1
+
+        base, extra = divmod(n - n_runs + 1, n_runs)
+        nodes, separators = [], []
+        k_pos = c_pos = 0
+
+        for r in range(n_runs):
+            size = base + (1 if r < extra else 0)
+            node = Node(children is None)
+            node.keys = keys[k_pos:k_pos + size]
+            if children is not None:
+                node.pointers = children[c_pos:c_pos + size + 1]
+                c_pos += size + 1
+            k_pos += size
+            nodes.append(node)
+
+            if r < n_runs - 1:
+                separators.append(keys[k_pos])
+                k_pos += 1
+
+        return nodes, separators
+
     def _search(self, node: Node, key: Union[DataPointer, int]) -> Tuple[Node, int]:
         i = 0
         n = len(node.keys)
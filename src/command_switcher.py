@@ -1,17 +1,27 @@
 import inspect
+import json
+import time
+from functools import lru_cache
 from re import L
-from typing import Dict, List
+from typing import Callable, Dict, List, Sequence
 from pyparsing import ParseSyntaxException
 from table import Table
 from utils.table_format import table_format_print
+from utils.table_export import table_export
 from utils.settings import Settings
 from utils.internal_queries import (insert_parse_dict_cdata, 
                                     insert_parse_dict_tdata,
                                     delete_cdata_dict,
                                     delete_tdata_dict)
-import query_parser as qp
+from wal import WAL
+import fast_parser as fp
 CMD = "command"
 
+# saves the database if a checkpoint is due, checkpoint_if_due(tables, indices), set by
+# the REPL. COPY calls it after every chunk, not only once it's done, as the pages
+# written since the last save are held in memory until then
+checkpoint_hook: Callable[[Dict, Dict], None] = None
+
 def switch_and_delegate(parse_dict: Dict, in_memory_tables: Dict[str, Table], 
     in_memory_indices: Dict):
 
@@ -28,15 +38,111 @@ def switch_and_delegate(parse_dict: Dict, in_memory_tables: Dict[str, Table],
     function_ptr = DEFINED_CLAUSES[command]
     
     if command.upper() != "SELECT":
-        sign = inspect.signature(function_ptr)
-
-        for function_arg in sign.parameters.keys():
+        for function_arg in clause_arguments(function_ptr):
             if function_arg not in parse_dict:
                 raise ParseSyntaxException("", 0, msg="Malformed SQL Statement.")
 
-    del parse_dict[CMD]
+    arguments = {k: v for k, v in parse_dict.items() if k != CMD}
+    return run_logged(parse_dict, lambda: function_ptr(**arguments))
+
+
+@lru_cache(maxsize=None)
+def clause_arguments(function_ptr: Callable) -> List[str]:
+    # the ones without a default, a statement has to give those
+    return [name for name, param in inspect.signature(function_ptr).parameters.items()
+            if param.default is inspect.Parameter.empty]
+
+
+def run_logged(parse_dict: Dict, run: Callable):
+    """
+    Runs the statement, and if it changes tables writes it to the
+    write-ahead log once it succeeded.
+    """
+    if parse_dict[CMD] not in LOGGED_CLAUSES or not WAL.is_logging:
+        return run()
+
+    # the statement as parsed, before execution fills in its dictionaries
+    log_record = json.dumps({k: v for k, v in parse_dict.items() if k != "mem_data"}, default=str)
+
+    # whatever it runs itself (catalog rows) is replayed along with it
+    with WAL.suspended():
+        result = run()
+
+    WAL.append(json.loads(log_record))
+    return result
+
+
+class PreparedStatement:
+    """
+    A statement parsed once, the values of its ? placeholders given to each
+    execute. INSERT and SELECT are planned when prepared, the table and the
+    ordinals of the columns they name are looked up once, so executing one
+    goes straight to the table. Other statements are run through
+    switch_and_delegate with their values filled in.
+
+        insert = PreparedStatement("INSERT INTO TABLE (a, b) t VALUES (?, ?);", tables, indices)
+        for row in rows:
+            insert.execute(row)
+    """
+
+    def __init__(self, statement: str, in_memory_tables: Dict, in_memory_indices: Dict):
+        if not statement.rstrip().endswith(";"):
+            statement += ";"
+        self.parse_dict = fp.parse(statement)
+        self.command = self.parse_dict[CMD]
+
+        if self.command not in DEFINED_CLAUSES or self.command in {"PREPARE", "EXECUTE"}:
+            raise ParseSyntaxException("", 0, msg=f"{self.command} statements can't be prepared.")
+
+        self.parameter_count = fp.count_parameters(self.parse_dict)
+        self.tables = in_memory_tables
+        self.indices = in_memory_indices
+        self.table = None
+
+        if self.command in {"INSERT INTO TABLE", "SELECT"}:
+            self._plan()
 
-    return function_ptr(**parse_dict)
+    def _plan(self):
+        self.table_name = self.parse_dict["table_name"].lower()
+        self.table = get_table(self.table_name, self.tables, self.indices)
+        self.plan = {k: v for k, v in self.parse_dict.items() if k != CMD}
+        self.table.resolve_columns(self.plan)
+
+    def execute(self, parameters: Sequence = ()):
+        """
+        For a SELECT the rows and the column names, like Table.select,
+        or the number of rows written for one INTO OUTFILE.
+        """
+        if len(parameters) != self.parameter_count:
+            raise ValueError(f"Statement takes {self.parameter_count} values, {len(parameters)} given.")
+
+        if self.table is None:
+            parse_dict = fp.bind_parameters(self.parse_dict, iter(parameters))
+            return switch_and_delegate(parse_dict, self.tables, self.indices)
+
+        # dropped and created again since it was planned
+        if self.tables.get(self.table_name) is not self.table:
+            self._plan()
+
+        statement = fp.bind_parameters(self.plan, iter(parameters))
+
+        if self.command == "SELECT":
+            if "outfile" in statement:
+                return export_rows(self.table, statement)
+            if statement.get("aggregate_list"):
+                return self.table.aggregate(statement)
+            return self.table.select(statement)
+
+        # logged as the statement it stands for
+        parse_dict = dict(statement, command=self.command)
+        del parse_dict["col_ord_list"]
+        if "value_lists" in statement:
+            return run_logged(parse_dict, lambda: self.table.insert_many(statement))
+        return run_logged(parse_dict, lambda: self.table.insert(statement))
+
+
+# statements prepared with PREPARE, by name
+PREPARED_STATEMENTS: Dict[str, PreparedStatement] = {}
 
 
 def get_table(tname: str, in_mem_tables: Dict, in_mem_idx: Dict, creation_mode=False):
@@ -89,8 +195,16 @@ def create_table(table_name: str, column_list: List[Dict], mem_data: Dict):
 
 
 def create_index(table_name: str, column_name: str, mem_data: Dict):
-    # should create a new b tree object in memory
-    raise NotImplementedError
+    table_name = table_name.lower()
+    imt, imi = map(lambda x: mem_data[x], ["imt", "imi"])
+
+    table_obj: Table = get_table(table_name, imt, imi)
+    table_obj.create_index(column_name)
+    imi[table_name] = table_obj.indexes
+
+    print(f"Index on {table_name} ({column_name}) created! \n")
+
+    return
 
 
 def drop_table(table_name: str, mem_data: Dict):
@@ -99,7 +213,9 @@ def drop_table(table_name: str, mem_data: Dict):
 
     if table_obj := get_table(table_name, imt, imi):
         del imt[table_name]
-        #del imi[table_name]
+        imi.pop(table_name, None)
+        # its pages go back to the database file's free list
+        table_obj.bptree.drop()
         del table_obj
         
     p1 = delete_tdata_dict(table_name)
@@ -109,18 +225,51 @@ def drop_table(table_name: str, mem_data: Dict):
         
     return
 
-def insert_row(table_name: str, column_name_list: List[str], value_list: List[str], mem_data: Dict):
+def insert_row(table_name: str, column_name_list: List[str], mem_data: Dict, value_list: List[str] = None,
+               value_lists: List[List[str]] = None):
     table_name = table_name.lower()
     imt, imi = map(lambda x: mem_data[x], ["imt", "imi"])
 
     table_obj: Table = get_table(table_name, imt, imi)
 
-    table_obj.insert(
-        {
-            "column_name_list": column_name_list,
-            "value_list": value_list
-        }
-    )
+    if value_lists is not None:
+        table_obj.insert_many(
+            {
+                "column_name_list": column_name_list,
+                "value_lists": value_lists
+            }
+        )
+
+    else:
+        table_obj.insert(
+            {
+                "column_name_list": column_name_list,
+                "value_list": value_list
+            }
+        )
+
+    return
+
+def copy_rows(table_name: str, file_path: str, mem_data: Dict, column_name_list: List[str] = None,
+              header: bool = False):
+    table_name = table_name.lower()
+    imt, imi = map(lambda x: mem_data[x], ["imt", "imi"])
+
+    table_obj: Table = get_table(table_name, imt, imi)
+
+    copied, start = 0, time.perf_counter()
+    for insert_dict in table_obj.copy_chunks(file_path, column_name_list, header):
+        # logged a chunk at a time as the insert it is, replay doesn't need the file
+        chunk = {CMD: "INSERT INTO TABLE", "table_name": table_name,
+                 **{k: v for k, v in insert_dict.items() if k != "col_ord_list"}}
+        run_logged(chunk, lambda: table_obj.copy_chunk(insert_dict, copied))
+        copied += len(insert_dict["value_lists"])
+
+        if checkpoint_hook is not None:
+            checkpoint_hook(imt, imi)
+
+    seconds = time.perf_counter() - start
+    print(f"{copied} rows copied into {table_name} in {seconds:.2f}s ({copied / max(seconds, 1e-9):.0f} rows/s) \n")
 
     return
 
@@ -151,19 +300,32 @@ def update_row(table_name: str, operation: Dict, condition: Dict, mem_data: Dict
 
     return
 
-def select_rows(table_name: str, column_name_list: List[str], condition: Dict, mem_data: Dict, ret_mode: bool = False):
+def select_rows(table_name: str, column_name_list: List[str], condition: Dict, mem_data: Dict, ret_mode: bool = False,
+                distinct: bool = False, limit: int = None, offset: int = 0, aggregate_list: List[Dict] = None,
+                outfile: str = None, outfile_format: str = "CSV"):
     table_name = table_name.lower()
     imt, imi = map(lambda x: mem_data[x], ["imt", "imi"])
 
     table_obj: Table = get_table(table_name, imt, imi)
 
+    selection = {
+        "column_name_list": column_name_list,
+        "condition": condition,
+        "distinct": distinct,
+        "limit": limit,
+        "offset": offset
+    }
 
-    selections, cname_list = table_obj.select(
-        {
-            "column_name_list": column_name_list,
-            "condition": condition
-        }
-    )
+    if outfile is not None:
+        selection.update(outfile=outfile, outfile_format=outfile_format, aggregate_list=aggregate_list)
+        print(f"{export_rows(table_obj, selection)} rows written to {outfile} \n")
+        return
+
+    if aggregate_list:
+        selection["aggregate_list"] = aggregate_list
+        selections, cname_list = table_obj.aggregate(selection)
+    else:
+        selections, cname_list = table_obj.select(selection)
     
     if ret_mode:
         return selections
@@ -171,14 +333,68 @@ def select_rows(table_name: str, column_name_list: List[str], condition: Dict, m
     table_format_print(selections, cname_list)
     
 
+def export_rows(table_obj: Table, selection: Dict) -> int:
+    """
+    Streams the selection to its "outfile" as it's scanned, the rows are never
+    gathered into a table to print. Returns the number of rows written.
+    """
+    if selection.get("aggregate_list"):
+        rows, cname_list = table_obj.aggregate(selection)
+    else:
+        rows = table_obj.iter_select(selection)
+        cname_list = selection["column_name_list"] or table_obj.column_data["column_names"]
+
+    return table_export(rows, cname_list, selection["outfile"], selection["outfile_format"])
+
+
+def prepare_statement(statement_name: str, statement: str, mem_data: Dict):
+    statement_name = statement_name.lower()
+    imt, imi = map(lambda x: mem_data[x], ["imt", "imi"])
+
+    PREPARED_STATEMENTS[statement_name] = PreparedStatement(statement, imt, imi)
+
+    print(f"Statement {statement_name} prepared! \n")
+
+    return
+
+def execute_statement(statement_name: str, parameter_list: List[str], mem_data: Dict):
+    statement_name = statement_name.lower()
+
+    if statement_name not in PREPARED_STATEMENTS:
+        raise NameError(f"No statement named {statement_name} was prepared!")
+
+    prepared = PREPARED_STATEMENTS[statement_name]
+    result = prepared.execute(parameter_list)
+
+    if prepared.command == "SELECT" and "outfile" in prepared.parse_dict:
+        print(f"{result} rows written to {prepared.parse_dict['outfile']} \n")
+    elif prepared.command == "SELECT":
+        table_format_print(*result)
+
+    return
+
+
 DEFINED_CLAUSES = {
     "CREATE TABLE": create_table,
     "CREATE INDEX": create_index,
     "DROP TABLE": drop_table,
     "INSERT INTO TABLE": insert_row,
+    "COPY": copy_rows,
     "DELETE": delete_row,
     "UPDATE": update_row,
-    "SELECT": select_rows
+    "SELECT": select_rows,
+    "PREPARE": prepare_statement,
+    "EXECUTE": execute_statement
+}
+
+# statements that change tables, written to the write-ahead log
+LOGGED_CLAUSES = {
+    "CREATE TABLE",
+    "CREATE INDEX",
+    "DROP TABLE",
+    "INSERT INTO TABLE",
+    "DELETE",
+    "UPDATE"
 }
     
 if __name__ == "__main__":
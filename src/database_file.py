@@ -0,0 +1,342 @@
+"""
+rio.db, every table of the database in one file of fixed-size pages.
+
+Page 0 is the file header:
+    magic 8 | page size 4 | page count 4 | free list head 4 | checkpoint lsn 8
+    | directory length 4 | directory overflow page 4 | directory
+The directory has an entry per table with its root page and per blob (the
+saved indexes) with its first page: [kind 1][page 4][name length 1][name].
+What doesn't fit in page 0 continues in a chain of overflow pages.
+
+Page n starts at n * page size, pages are read as memoryview slices of an
+mmap of the file, the decoders read them in place without copying. Free pages
+are chained through their first 4 bytes, blobs are chains of
+[next page 4][bytes used 2][bytes] pages, a next page of 0 ends either chain.
+
+Pages changed since the last checkpoint are kept in memory. A checkpoint
+copies the pages it is about to overwrite to the journal first, and the next
+open rolls back one that was cut short.
+"""
+from __future__ import annotations
+import mmap
+import os
+import struct
+from typing import Dict, List, Tuple
+
+MAGIC = b"RioDB\x00\x00\x01"
+HEADER = struct.Struct(">8sIIIQII")
+CHAIN_HEADER = struct.Struct(">IH")
+DIR_ENTRY = struct.Struct(">BIB")
+
+KIND_TABLE = 1
+KIND_BLOB = 2
+
+JOURNAL_SUFFIX = "-journal"
+# last bytes of a journal that was completely written
+JOURNAL_COMMIT = b"RioDBjnl"
+
+
+def fsync_dir(path: str):
+    # so renames and removals in the directory are on disk too
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class DatabaseFile:
+
+    def __init__(self, path: str, page_size: int = 512) -> None:
+        self.path = path
+        self.page_size = page_size
+        self.page_count = 1
+        self.free_head = 0
+        self.checkpoint_lsn = 0
+        # name -> (kind, page)
+        self.directory: Dict[str, Tuple[int, int]] = {}
+
+        self._fd = None
+        self._disk_pages = 0
+        self._view: memoryview = None
+        self._written: Dict[int, bytes] = {}
+        self._header_changed = False
+        self._dir_bytes = b""
+        self._dir_overflow = 0
+
+    @classmethod
+    def open(cls, path: str, page_size: int = 512) -> DatabaseFile:
+        """
+        Opens the file, or creates it with the given page size.
+        """
+        db = cls(path, page_size)
+        db._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        db._rollback()
+
+        if os.fstat(db._fd).st_size:
+            db._read_header()
+        else:
+            db._header_changed = True
+
+        return db
+
+    def set_page_size(self, page_size: int):
+        """
+        Only for a file nothing was saved to yet.
+        """
+        if self._disk_pages or self.page_count > 1 or self.directory:
+            raise ValueError("The page size of a database can't be changed once it holds tables.")
+        self.page_size = page_size
+
+    def _map_pages(self):
+        # views handed out earlier keep the old map alive until they are dropped
+        length = self._disk_pages * self.page_size
+        self._view = memoryview(mmap.mmap(self._fd, length, access=mmap.ACCESS_READ)) if length else None
+
+    def close(self):
+        self._view = None
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    @property
+    def journal_path(self) -> str:
+        return self.path + JOURNAL_SUFFIX
+
+    def _read_header(self):
+        magic, page_size, *_ = HEADER.unpack(os.pread(self._fd, HEADER.size, 0))
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not a RioDB database file.")
+
+        self.page_size = page_size
+        header = os.pread(self._fd, page_size, 0)
+        (_, _, self.page_count, self.free_head, self.checkpoint_lsn,
+         dir_len, self._dir_overflow) = HEADER.unpack_from(header)
+        self._disk_pages = self.page_count
+        self._map_pages()
+
+        self._dir_bytes = header[HEADER.size:HEADER.size + dir_len]
+        if self._dir_overflow:
+            self._dir_bytes += self._read_chain(self._dir_overflow)
+
+        pos = 0
+        while pos < len(self._dir_bytes):
+            kind, page_no, name_len = DIR_ENTRY.unpack_from(self._dir_bytes, pos)
+            pos += DIR_ENTRY.size
+            self.directory[self._dir_bytes[pos:pos + name_len].decode("utf-8")] = (kind, page_no)
+            pos += name_len
+
+    def _write_header(self):
+        dir_bytes = b"".join(
+            DIR_ENTRY.pack(kind, page_no, len(name.encode("utf-8"))) + name.encode("utf-8")
+            for name, (kind, page_no) in self.directory.items()
+        )
+
+        room = self.page_size - HEADER.size
+        if dir_bytes != self._dir_bytes:
+            if self._dir_overflow:
+                self._free_chain(self._dir_overflow)
+            self._dir_overflow = self._write_chain(dir_bytes[room:]) if len(dir_bytes) > room else 0
+            self._dir_bytes = dir_bytes
+
+        header = HEADER.pack(MAGIC, self.page_size, self.page_count, self.free_head,
+                             self.checkpoint_lsn, min(len(dir_bytes), room), self._dir_overflow)
+        self._written[0] = (header + dir_bytes[:room]).ljust(self.page_size, b"\x00")
+
+    def read_page(self, page_no: int) -> bytes:
+        if (page := self._written.get(page_no)) is not None:
+            return page
+
+        if page_no < self._disk_pages:
+            start = page_no * self.page_size
+            return self._view[start:start + self.page_size]
+
+        raise KeyError(f"Page {page_no} has never been written.")
+
+    def write_page(self, page_no: int, page_bytes: bytes):
+        self._written[page_no] = page_bytes
+
+    def allocate_page(self) -> int:
+        self._header_changed = True
+
+        if self.free_head:
+            page_no = self.free_head
+            self.free_head = int.from_bytes(self.read_page(page_no)[:4], "big")
+            return page_no
+
+        self.page_count += 1
+        return self.page_count - 1
+
+    def free_page(self, page_no: int):
+        self.write_page(page_no, self.free_head.to_bytes(4, "big").ljust(self.page_size, b"\x00"))
+        self.free_head = page_no
+        self._header_changed = True
+
+    @property
+    def dirty_pages(self) -> int:
+        return len(self._written)
+
+    def _write_chain(self, data: bytes) -> int:
+        room = self.page_size - CHAIN_HEADER.size
+        chunks = [data[i:i + room] for i in range(0, len(data), room)] or [b""]
+        pages = [self.allocate_page() for _ in chunks]
+
+        for i, (page_no, chunk) in enumerate(zip(pages, chunks)):
+            next_page = pages[i + 1] if i + 1 < len(pages) else 0
+            page = CHAIN_HEADER.pack(next_page, len(chunk)) + chunk
+            self.write_page(page_no, page.ljust(self.page_size, b"\x00"))
+
+        return pages[0]
+
+    def _read_chain(self, page_no: int) -> bytes:
+        chunks = []
+        while page_no:
+            page = self.read_page(page_no)
+            page_no, used = CHAIN_HEADER.unpack_from(page)
+            chunks.append(page[CHAIN_HEADER.size:CHAIN_HEADER.size + used])
+        return b"".join(chunks)
+
+    def _free_chain(self, page_no: int):
+        while page_no:
+            next_page, _ = CHAIN_HEADER.unpack_from(self.read_page(page_no))
+            self.free_page(page_no)
+            page_no = next_page
+
+    def names(self, kind: int) -> List[str]:
+        return [name for name, (k, _) in self.directory.items() if k == kind]
+
+    def pager(self, name: str, codec) -> FilePager:
+        """
+        The pages of the table called name, a new table gets a root page.
+        """
+        if name in self.directory:
+            return FilePager(self, name, codec, self.directory[name][1], True)
+
+        root_page = self.allocate_page()
+        self.directory[name] = (KIND_TABLE, root_page)
+        return FilePager(self, name, codec, root_page, False)
+
+    def read_blob(self, name: str) -> bytes:
+        return self._read_chain(self.directory[name][1])
+
+    def write_blob(self, name: str, data: bytes):
+        if name in self.directory:
+            self._free_chain(self.directory[name][1])
+        self.directory[name] = (KIND_BLOB, self._write_chain(data))
+
+    def remove(self, name: str):
+        """
+        Forgets the entry, a blob's pages are freed, a table's must have been already.
+        """
+        kind, page_no = self.directory.pop(name)
+        if kind == KIND_BLOB:
+            self._free_chain(page_no)
+        self._header_changed = True
+
+    def checkpoint(self, lsn: int):
+        """
+        Writes the header and every page changed since the last checkpoint.
+        """
+        if lsn != self.checkpoint_lsn:
+            self.checkpoint_lsn = lsn
+            self._header_changed = True
+
+        if not (self._written or self._header_changed):
+            return
+
+        self._write_header()
+        self._write_journal()
+
+        for page_no in sorted(self._written):
+            os.pwrite(self._fd, self._written[page_no], page_no * self.page_size)
+        os.fsync(self._fd)
+
+        os.remove(self.journal_path)
+        fsync_dir(self.path)
+
+        self._written.clear()
+        self._disk_pages = self.page_count
+        self._header_changed = False
+        self._map_pages()
+
+    def _write_journal(self):
+        # [page size 4][page count 4] then [page_no 4][page] for each page about to be overwritten
+        with open(self.journal_path, "wb") as journal:
+            journal.write(self.page_size.to_bytes(4, "big") + self._disk_pages.to_bytes(4, "big"))
+            for page_no in sorted(self._written):
+                if page_no < self._disk_pages:
+                    journal.write(page_no.to_bytes(4, "big"))
+                    journal.write(os.pread(self._fd, self.page_size, page_no * self.page_size))
+            journal.write(JOURNAL_COMMIT)
+            journal.flush()
+            os.fsync(journal.fileno())
+        fsync_dir(self.path)
+
+    def _rollback(self):
+        """
+        Puts back the pages a checkpoint cut short had started to overwrite. A journal
+        that wasn't completely written means the file itself wasn't touched yet.
+        """
+        if not os.path.exists(self.journal_path):
+            return
+
+        with open(self.journal_path, "rb") as journal:
+            data = journal.read()
+
+        if data.endswith(JOURNAL_COMMIT):
+            page_size = int.from_bytes(data[:4], "big")
+            disk_pages = int.from_bytes(data[4:8], "big")
+
+            for pos in range(8, len(data) - len(JOURNAL_COMMIT), 4 + page_size):
+                page_no = int.from_bytes(data[pos:pos + 4], "big")
+                os.pwrite(self._fd, data[pos + 4:pos + 4 + page_size], page_no * page_size)
+
+            os.ftruncate(self._fd, disk_pages * page_size)
+            os.fsync(self._fd)
+
+        os.remove(self.journal_path)
+        fsync_dir(self.path)
+
+
+class FilePager:
+    """
+    One table's pages within a DatabaseFile, same interface as pager.Pager.
+    Page numbers are the file's, shared by all tables.
+    """
+
+    def __init__(self, database: DatabaseFile, name: str, codec, root_page: int, has_pages: bool) -> None:
+        self.database = database
+        self.name = name
+        self.codec = codec
+        self.root_page = root_page
+        self.has_pages = has_pages
+        self.nodes: Dict[int, object] = {}
+
+    @property
+    def page_size(self) -> int:
+        return self.database.page_size
+
+    def read_page(self, page_no: int) -> bytes:
+        return self.database.read_page(page_no)
+
+    def write_page(self, page_no: int, page_bytes: bytes):
+        self.database.write_page(page_no, page_bytes)
+
+    def allocate_page(self) -> int:
+        return self.database.allocate_page()
+
+    def free_page(self, page_no: int):
+        self.database.free_page(page_no)
+
+    def reset(self, stale_pages: List[int] = ()):
+        for page_no in stale_pages:
+            self.database.free_page(page_no)
+        self.has_pages = True
+
+    def drop(self, pages: List[int] = ()):
+        for page_no in pages:
+            self.database.free_page(page_no)
+        self.database.remove(self.name)
+
+    def close(self):
+        pass
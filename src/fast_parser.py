@@ -0,0 +1,618 @@
+import json
+import re
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
+
+# Hand written tokenizer and recursive descent parser for the statements of
+# query_parser.py, picked by their first keyword. It gives the same
+# dictionaries as the pyparsing grammar, which is only built (on first use)
+# for what this parser turns down: the statement is parsed again there, so
+# anything it accepts still runs and anything it doesn't gets its error.
+
+# Set to parse every statement with both and raise if they disagree.
+VALIDATE = False
+
+KEYWORDS = {
+    "SELECT", "CREATE", "DROP", "SHOW", "INSERT", "DELETE", "UPDATE", "NOT", "UNIQUE", "PRIMARY",
+    "KEY", "TABLES", "TABLE", "INDEX", "VALUES", "FROM", "INTO", "WHERE", "SET", "DISTINCT",
+    "LIMIT", "OFFSET", "AND", "OR"
+}
+
+DATA_TYPES = {
+    "NULL", "TINYINT", "SMALLINT", "INT", "BIGINT", "LONG", "FLOAT", "DOUBLE", "YEAR",
+    "TIME", "DATETIME", "DATE", "TEXT"
+}
+
+KEYWORDS |= DATA_TYPES
+
+AGGREGATES = {"COUNT", "SUM", "MIN", "MAX", "AVG"}
+
+RESERVED_IDENTIFIERS = ("davisbase_tables", "davisbase_columns")
+
+COMPARATORS = {">", "<", ">=", "<=", "=", "<>"}
+
+PARAMETER = "parameter"
+
+# the regular expressions of the grammar's tokens, strings as pyparsing's quoted_string
+TOKEN = re.compile(r"""
+    (?P<space>[ \t\r\n]+)
+  | (?P<number>[+-]?\d*\.?\d+(?:[eE][+-]?\d+)?)
+  | (?P<word>[A-Za-z][A-Za-z0-9_]*)
+  | (?P<string>"(?:[^"\n\r\\]|(?:"")|(?:\\(?:[^x]|x[0-9a-fA-F]+)))*"
+              |'(?:[^'\n\r\\]|(?:'')|(?:\\(?:[^x]|x[0-9a-fA-F]+)))*')
+  | (?P<symbol><>|>=|<=|[<>=(),;*?])
+""", re.VERBOSE)
+
+
+def tokenize(text: str) -> List[Tuple[str, str]]:
+    """
+    (kind, text) pairs up to the first ;, words and numbers need something
+    between them, keywords have to stand apart there as well.
+    """
+    tokens = []
+    pos = 0
+    word_end = -1
+    while pos < len(text):
+        match = TOKEN.match(text, pos)
+        if match is None:
+            raise ValueError(f"Unexpected character at {pos}.")
+
+        kind = match.lastgroup
+        if kind in ("word", "number"):
+            if pos == word_end:
+                raise ValueError(f"Unexpected character at {pos}.")
+            word_end = match.end()
+        if kind != "space":
+            tokens.append((kind, match.group()))
+            if match.group() == ";":
+                break
+        pos = match.end()
+
+    return tokens
+
+
+class Parser:
+
+    def __init__(self, text: str):
+        self.tokens = tokenize(text)
+        self.pos = 0
+
+    def peek(self, ahead: int = 0) -> Tuple[str, str]:
+        if self.pos + ahead < len(self.tokens):
+            return self.tokens[self.pos + ahead]
+        return ("end", "")
+
+    def next(self) -> Tuple[str, str]:
+        token = self.peek()
+        if token[0] == "end":
+            raise ValueError("Statement ended early.")
+        self.pos += 1
+        return token
+
+    def at_keyword(self, keyword: str, ahead: int = 0) -> bool:
+        kind, text = self.peek(ahead)
+        return kind == "word" and text.upper() == keyword
+
+    def keyword(self, *keywords: str) -> str:
+        kind, text = self.next()
+        if kind != "word" or text.upper() not in keywords:
+            raise ValueError(f"Expected {' or '.join(keywords)}, found {text!r}.")
+        return text.upper()
+
+    def optional_keyword(self, keyword: str) -> bool:
+        if self.at_keyword(keyword):
+            self.pos += 1
+            return True
+        return False
+
+    def symbol(self, symbol: str):
+        kind, text = self.next()
+        if kind != "symbol" or text != symbol:
+            raise ValueError(f"Expected {symbol!r}, found {text!r}.")
+
+    def at_symbol(self, symbol: str) -> bool:
+        return self.peek() == ("symbol", symbol)
+
+    def identifier(self) -> str:
+        kind, text = self.next()
+        if kind != "word" or text.upper() in KEYWORDS:
+            raise ValueError(f"Expected an identifier, found {text!r}.")
+        return text
+
+    def new_identifier(self) -> str:
+        name = self.identifier()
+        if name.lower().startswith(RESERVED_IDENTIFIERS):
+            raise ValueError(f"{name} is reserved.")
+        return name
+
+    def literal(self) -> Any:
+        kind, text = self.next()
+        if kind == "number":
+            return text
+        if kind == "string":
+            return text.replace("'", "").replace('"', "")
+        if kind == "word" and text.upper() == "NULL":
+            return ""
+        if (kind, text) == ("symbol", "?"):
+            return {PARAMETER: "?"}
+        raise ValueError(f"Expected a value, found {text!r}.")
+
+    def delimited(self, item) -> List:
+        items = [item()]
+        while self.at_symbol(","):
+            self.pos += 1
+            items.append(item())
+        return items
+
+    def parenthesized(self, item) -> List:
+        self.symbol("(")
+        items = self.delimited(item)
+        self.symbol(")")
+        return items
+
+    def end(self):
+        self.symbol(";")
+
+    def file_path(self) -> str:
+        kind, text = self.next()
+        if kind != "string":
+            raise ValueError(f"Expected a quoted file path, found {text!r}.")
+        return text[1:-1]
+
+    #---------------- STATEMENTS ------------------#
+
+    def statement(self) -> Dict:
+        kind, text = self.peek()
+        verb = text.upper() if kind == "word" else ""
+        if verb not in STATEMENTS:
+            raise ValueError(f"Unknown statement {text!r}.")
+        return STATEMENTS[verb](self)
+
+    def create(self) -> Dict:
+        if self.at_keyword("INDEX", 1):
+            return self.create_index()
+        return self.create_table()
+
+    def create_table(self) -> Dict:
+        command = " ".join([self.keyword("CREATE"), self.keyword("TABLE")])
+        table_name = self.new_identifier()
+        columns = self.parenthesized(self.column_definition)
+        self.end()
+
+        for i, column in enumerate(columns):
+            column["ordinal_position"] = i + 1
+            column["table_name"] = table_name
+
+        return {
+            "command": command,
+            "table_name": table_name,
+            "column_list": columns
+        }
+
+    def column_definition(self) -> Dict:
+        name = self.new_identifier()
+        data_type = self.keyword(*DATA_TYPES)
+        # the grammar's NULL is "" wherever it's matched, as a type too
+        if data_type == "NULL":
+            data_type = ""
+
+        constraints = set()
+        for _ in range(3):
+            if self.optional_keyword("UNIQUE"):
+                constraints.add("UNIQUE")
+            elif self.at_keyword("PRIMARY"):
+                self.pos += 1
+                self.keyword("KEY")
+                constraints.add("PRIMARY_KEY")
+            elif self.at_keyword("NOT") and self.at_keyword("NULL", 1):
+                self.pos += 2
+                constraints.add("NOT_NULL")
+            else:
+                break
+
+        column = {
+            "column_key": "",
+            "is_nullable": "YES"
+        }
+
+        if "PRIMARY_KEY" in constraints:
+            column["column_key"] = "PRI"
+            column["is_nullable"] = "NO"
+        elif "UNIQUE" in constraints:
+            column["column_key"] = "UNI"
+            column["is_nullable"] = "NO"
+
+        if "NOT_NULL" in constraints:
+            column["is_nullable"] = "NO"
+
+        column["column_name"] = name
+        column["data_type"] = data_type
+        return column
+
+    def create_index(self) -> Dict:
+        command = " ".join([self.keyword("CREATE"), self.keyword("INDEX")])
+        table_name = self.identifier()
+        self.symbol("(")
+        column_name = self.identifier()
+        self.symbol(")")
+        self.end()
+
+        return {
+            "command": command,
+            "table_name": table_name,
+            "column_name": column_name
+        }
+
+    def drop_table(self) -> Dict:
+        command = " ".join([self.keyword("DROP"), self.keyword("TABLE")])
+        table_name = self.identifier()
+        self.end()
+
+        return {
+            "command": command,
+            "table_name": table_name,
+        }
+
+    def insert_row(self) -> Dict:
+        command = " ".join([self.keyword("INSERT"), self.keyword("INTO"), self.keyword("TABLE")])
+        column_names = self.parenthesized(self.identifier) if self.at_symbol("(") else []
+        table_name = self.identifier()
+        self.keyword("VALUES")
+        rows = self.delimited(lambda: self.parenthesized(self.literal))
+        self.end()
+
+        insert_dict = {
+            "command": command,
+            "column_name_list": column_names,
+            "table_name": table_name
+        }
+
+        if len(rows) == 1:
+            insert_dict["value_list"] = rows[0]
+        else:
+            insert_dict["value_lists"] = rows
+
+        return insert_dict
+
+    def delete_record(self) -> Dict:
+        command = self.keyword("DELETE")
+        self.keyword("FROM")
+        self.keyword("TABLE")
+        table_name = self.identifier()
+        condition = self.where() if self.at_keyword("WHERE") else {}
+        self.end()
+
+        return {
+            "command": command,
+            "table_name": table_name,
+            "condition": condition
+        }
+
+    def update_record(self) -> Dict:
+        command = self.keyword("UPDATE")
+        table_name = self.identifier()
+        operation_type = self.keyword("SET")
+        column_name = self.identifier()
+        self.symbol("=")
+        operation = {
+            "operation_type": operation_type,
+            "column_name": column_name,
+            "comparator": "=",
+            "value": self.literal()
+        }
+        condition = self.where()
+        self.end()
+
+        return {
+            "command": command,
+            "table_name": table_name,
+            "operation": operation,
+            "condition": condition
+        }
+
+    def select(self) -> Dict:
+        command = self.keyword("SELECT")
+        distinct = self.optional_keyword("DISTINCT")
+
+        columns, aggregates = [], []
+        if self.at_symbol("*"):
+            self.pos += 1
+        elif self.peek()[1].upper() in AGGREGATES and self.peek(1) == ("symbol", "("):
+            aggregates = self.delimited(self.aggregate)
+        else:
+            columns = self.delimited(self.identifier)
+
+        self.keyword("FROM")
+        table_name = self.identifier()
+        condition = self.where() if self.at_keyword("WHERE") else {}
+
+        row_range = {}
+        if self.optional_keyword("LIMIT"):
+            row_range["limit"] = self.row_count()
+            row_range["offset"] = self.row_count() if self.optional_keyword("OFFSET") else 0
+        outfile = self.outfile() if self.at_keyword("INTO") else {}
+        self.end()
+
+        select_dict = {
+            "command": command,
+            "column_name_list": columns,
+            "table_name": table_name,
+            "condition": condition
+        }
+
+        if aggregates:
+            select_dict["aggregate_list"] = aggregates
+        if distinct:
+            select_dict["distinct"] = True
+        select_dict.update(row_range)
+        select_dict.update(outfile)
+
+        return select_dict
+
+    def outfile(self) -> Dict:
+        self.keyword("INTO")
+        self.keyword("OUTFILE")
+        file_path = self.file_path()
+        file_format = self.keyword("CSV", "JSON") if self.optional_keyword("FORMAT") else "CSV"
+
+        return {
+            "outfile": file_path,
+            "outfile_format": file_format
+        }
+
+    def aggregate(self) -> Dict:
+        function = self.keyword(*AGGREGATES)
+        self.symbol("(")
+        if self.at_symbol("*"):
+            self.pos += 1
+            column_name = "*"
+        else:
+            column_name = self.identifier()
+        self.symbol(")")
+
+        return {
+            "function": function,
+            "column_name": column_name
+        }
+
+    def row_count(self) -> int:
+        kind, text = self.next()
+        if kind != "number" or not text.isdigit():
+            raise ValueError(f"Expected a row count, found {text!r}.")
+        return int(text)
+
+    def show_tables(self) -> Dict:
+        self.keyword("SHOW")
+        self.keyword("TABLES")
+        self.end()
+
+        return {
+            "command": "SELECT",
+            "column_name_list": ["table_name"],
+            "table_name": "riobase_tables",
+            "condition": {}
+        }
+
+    def prepare(self) -> Dict:
+        command = self.keyword("PREPARE")
+        statement_name = self.identifier()
+        self.keyword("FROM")
+        kind, text = self.next()
+        if kind != "string":
+            raise ValueError(f"Expected a quoted statement, found {text!r}.")
+        self.end()
+
+        return {
+            "command": command,
+            "statement_name": statement_name,
+            "statement": text[1:-1]
+        }
+
+    def execute(self) -> Dict:
+        command = self.keyword("EXECUTE")
+        statement_name = self.identifier()
+        parameters = self.delimited(self.literal) if self.optional_keyword("USING") else []
+        self.end()
+
+        return {
+            "command": command,
+            "statement_name": statement_name,
+            "parameter_list": parameters
+        }
+
+    #---------------- CONDITIONS ------------------#
+
+    def where(self) -> Dict:
+        self.keyword("WHERE")
+        return self.condition()
+
+    def condition(self) -> Dict:
+        operands = [self.conjunction()]
+        while self.optional_keyword("OR"):
+            operands.append(self.conjunction())
+        return joined("OR", operands)
+
+    def conjunction(self) -> Dict:
+        operands = [self.operand()]
+        while self.optional_keyword("AND"):
+            operands.append(self.operand())
+        return joined("AND", operands)
+
+    def operand(self) -> Dict:
+        negated = self.optional_keyword("NOT")
+
+        if self.at_symbol("("):
+            self.pos += 1
+            condition = self.condition()
+            self.symbol(")")
+            return negated_condition(condition) if negated else condition
+
+        column_name = self.identifier()
+        kind, comparator = self.next()
+        if kind != "symbol" or comparator not in COMPARATORS:
+            raise ValueError(f"Expected a comparator, found {comparator!r}.")
+
+        return {
+            "negated": "TRUE" if negated else "FALSE",
+            "column_name": column_name,
+            "comparator": comparator,
+            "value": self.literal()
+        }
+
+    def copy(self) -> Dict:
+        command = self.keyword("COPY")
+        table_name = self.identifier()
+        column_names = self.parenthesized(self.identifier) if self.at_symbol("(") else []
+        self.keyword("FROM")
+        file_path = self.file_path()
+        header = self.optional_keyword("WITH")
+        if header:
+            self.keyword("HEADER")
+        self.end()
+
+        return {
+            "command": command,
+            "table_name": table_name,
+            "column_name_list": column_names,
+            "file_path": file_path,
+            "header": header
+        }
+
+
+STATEMENTS = {
+    "SELECT": Parser.select,
+    "INSERT": Parser.insert_row,
+    "UPDATE": Parser.update_record,
+    "DELETE": Parser.delete_record,
+    "CREATE": Parser.create,
+    "DROP": Parser.drop_table,
+    "SHOW": Parser.show_tables,
+    "PREPARE": Parser.prepare,
+    "EXECUTE": Parser.execute,
+    "COPY": Parser.copy
+}
+
+
+def joined(operator: str, operands: List[Dict]) -> Dict:
+    # a lone operand as it is, nested operands of the same operator flattened
+    if len(operands) == 1:
+        return operands[0]
+
+    flat = []
+    for operand in operands:
+        if operand.get("operator") == operator:
+            flat.extend(operand["operands"])
+        else:
+            flat.append(operand)
+    return {"operator": operator, "operands": flat}
+
+
+def negated_condition(condition: Dict) -> Dict:
+    # NOT pushed down to the predicates, AND and OR swap places
+    if "operator" in condition:
+        return {
+            "operator": "OR" if condition["operator"] == "AND" else "AND",
+            "operands": [negated_condition(operand) for operand in condition["operands"]]
+        }
+
+    return dict(condition, negated="FALSE" if condition["negated"] == "TRUE" else "TRUE")
+
+
+def pyparsing_parse(text: str) -> Dict:
+    # the grammar takes a while to build, only done when first needed
+    import query_parser
+    return query_parser.statement.parse_string(text)[0]
+
+
+def parse_statement(text: str) -> Dict:
+    try:
+        parse_dict = Parser(text).statement()
+    except ValueError:
+        return pyparsing_parse(text)
+
+    if VALIDATE and parse_dict != pyparsing_parse(text):
+        raise ValueError(f"Parsers disagree on {text!r}.")
+
+    return parse_dict
+
+
+# statement text with runs of whitespace outside quotes made one space
+WHITESPACE_RUNS = re.compile(r"""('[^']*'|"[^"]*")|\s+""")
+
+PARSE_CACHE_SIZE = 256
+PARSE_CACHE: "OrderedDict[str, str]" = OrderedDict()
+
+
+def parse(text: str) -> Dict:
+    """
+    parse_statement through a cache of the statements parsed last, keyed by
+    their normalized text. Every call gets its own copy of the dictionary,
+    running a statement fills in the one it's given.
+    """
+    key = WHITESPACE_RUNS.sub(lambda m: m.group(1) or " ", text.strip())
+
+    if (cached := PARSE_CACHE.get(key)) is not None:
+        PARSE_CACHE.move_to_end(key)
+        return json.loads(cached)
+
+    parse_dict = parse_statement(key)
+
+    PARSE_CACHE[key] = json.dumps(parse_dict)
+    while len(PARSE_CACHE) > PARSE_CACHE_SIZE:
+        PARSE_CACHE.popitem(last=False)
+
+    return json.loads(PARSE_CACHE[key])
+
+
+def count_parameters(parse_dict: Any) -> int:
+    if isinstance(parse_dict, dict):
+        if PARAMETER in parse_dict:
+            return 1
+        return sum(map(count_parameters, parse_dict.values()))
+    if isinstance(parse_dict, list):
+        return sum(map(count_parameters, parse_dict))
+    return 0
+
+
+def bind_parameters(parse_dict: Any, values) -> Any:
+    """
+    A copy of the parsed statement with its ? placeholders replaced, in the
+    order they were written, by the values taken from the iterator.
+    """
+    if isinstance(parse_dict, dict):
+        if PARAMETER in parse_dict:
+            return next(values)
+        return {k: bind_parameters(v, values) for k, v in parse_dict.items()}
+    if isinstance(parse_dict, list):
+        return [bind_parameters(v, values) for v in parse_dict]
+    return parse_dict
+
+
+if __name__ == "__main__":
+    # parse throughput of both parsers, no cache
+    import time
+    import query_parser
+
+    statements = [
+        "INSERT INTO TABLE (id, name, weight, age) dogs VALUES ({i}, 'Rover {i}', 20.6, 4);",
+        "SELECT name, age FROM dogs WHERE id >= {i} AND (weight < 30 OR NOT name <> 'Rex');",
+        "SELECT COUNT(*), AVG(weight) FROM dogs WHERE age > {i} LIMIT 10 OFFSET 5;",
+        "UPDATE dogs SET age = {i} WHERE name = 'Rover';",
+        "DELETE FROM TABLE dogs WHERE id = {i};",
+        "CREATE TABLE dogs{i} (id INT PRIMARY KEY, name TEXT NOT NULL, weight FLOAT, age INT UNIQUE);",
+    ]
+
+    for template in statements:
+        texts = [template.format(i=i) for i in range(500)]
+        for text in texts[:20]:
+            assert Parser(text).statement() == query_parser.statement.parse_string(text)[0], text
+
+        timings = []
+        for parse_one in (lambda t: Parser(t).statement(), lambda t: query_parser.statement.parse_string(t)[0]):
+            start = time.perf_counter()
+            for text in texts:
+                parse_one(text)
+            timings.append(len(texts) / (time.perf_counter() - start))
+
+        print(f"{template.split()[0]:>7}: {timings[0]:9.0f} statements/s fast, "
+              f"{timings[1]:7.0f} pyparsing, {timings[0] / timings[1]:5.1f}x")
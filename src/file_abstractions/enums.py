@@ -4,11 +4,18 @@ from typing import Any
 import numpy as np
 import datetime as dt
 from collections import namedtuple
+from functools import lru_cache
 
 """
 time to milliseconds ==> (x.hour * 3600 * 1000 + x.minute * 60 * 1000 + x.second * 1000 + x.microsecond // 1000)
 """
 
+# TEXT type ids are 12 + the byte length up to MAX_SHORT_TEXT bytes, longer TEXT
+# (up to MAX_TEXT_BYTES) has the type id LONG_TEXT_ID and a 2 byte length before it
+MAX_SHORT_TEXT = 242
+LONG_TEXT_ID = 0xFF
+MAX_TEXT_BYTES = 0xFFFF
+
 # TODO: GENERIC_DATA_TYPE = namedtuple("GENERIC_DATA_TYPE", ["str_rep", "serial_code", "byte_size", "pytype"])
 
 class DataType(Enum):
@@ -30,11 +37,13 @@ class DataType(Enum):
     def get_id_bytes(self, value: Any):
         id_int = self.value[1]
         if self.value[0] == "TEXT":
-            id_int += len(value) if value else 0
+            n_bytes = len(value.encode()) if value else 0
+            id_int = LONG_TEXT_ID if n_bytes > MAX_SHORT_TEXT else id_int + n_bytes
         return int.to_bytes(id_int, 1, "big")
 
 
     @classmethod
+    @lru_cache(maxsize=None)
     def type_id_to_type_mapping(cls):
         mapping = {}
         for _, k in cls._member_map_.items():
@@ -58,7 +67,7 @@ class DataType(Enum):
             return None
 
         elif type_ in {"TINYINT", "SMALLINT", "INT", "BIGINT", "LONG", "YEAR"}:
-            int_val = int.from_bytes(byte_data, "big")
+            int_val = int.from_bytes(byte_data, "big", signed=True)
             return self.value[3](int_val)
 
         elif type_ == "FLOAT":
@@ -69,7 +78,7 @@ class DataType(Enum):
 
         elif type_ == "TIME":
             ms_since_midnight = int.from_bytes(byte_data, "big")
-            hours = ms_since_midnight // 3600 * 1000
+            hours = ms_since_midnight // (3600 * 1000)
             rem_ms = ms_since_midnight % (3600 * 1000)
             minutes = rem_ms // (60*1000)
             rem_ms = rem_ms % (60 * 1000)
@@ -79,12 +88,12 @@ class DataType(Enum):
             return dt.time(hours, minutes, seconds, mu_s)
 
         elif type_ == "DATETIME":
-            ms_epoch = int.from_bytes(byte_data, "big")
+            ms_epoch = int.from_bytes(byte_data, "big", signed=True)
             s_epoch = ms_epoch / 1000
             return dt.datetime.fromtimestamp(s_epoch)
 
         elif type_ == "DATE":
-            ms_epoch = int.from_bytes(byte_data, "big")
+            ms_epoch = int.from_bytes(byte_data, "big", signed=True)
             s_epoch = ms_epoch / 1000
             return dt.date.fromtimestamp(s_epoch)
 
@@ -97,7 +106,7 @@ class DataType(Enum):
             return b""
 
         elif type_ in {"TINYINT", "SMALLINT", "INT", "BIGINT", "LONG", "YEAR"}:
-            return int(value).to_bytes(self.value[2], "big")
+            return int(value).to_bytes(self.value[2], "big", signed=True)
 
         elif type_ == "FLOAT":
             return pack("f", value)
@@ -118,17 +127,18 @@ class DataType(Enum):
             if isinstance(value, dt.datetime):
                 s_epoch = value.timestamp()
                 ms_epoch = int(s_epoch * 1000)
-                return ms_epoch.to_bytes(self.value[2], "big")
+                return ms_epoch.to_bytes(self.value[2], "big", signed=True)
 
         elif type_ == "DATE":
             if isinstance(value, dt.date):
                 s_epoch = dt.datetime.combine(value, dt.time.min).timestamp()
                 ms_epoch = int(s_epoch * 1000)
-                return ms_epoch.to_bytes(self.value[2], "big")
+                return ms_epoch.to_bytes(self.value[2], "big", signed=True)
 
         elif type_ == "TEXT":
             if isinstance(value, str):
-                return value.encode()
+                text = value.encode()
+                return len(text).to_bytes(2, "big") + text if len(text) > MAX_SHORT_TEXT else text
 
         return int.to_bytes(0, self.value[2], "big")
 
@@ -1,11 +1,13 @@
-import io
 import numpy as np
+import struct
 
 from dataclasses import dataclass
-from itertools import starmap
 from typing import Any
 from enums import PageType
 
+# type, unused, cells, data start, right sibling / last child, parent, unused
+PAGE_HEADER = struct.Struct(">BxHHII2x")
+
 def int_to_byte_stream(int_like_val: Any, size: int):
     """
     :param int_like_val:
@@ -39,19 +41,12 @@ class PageHeader:
     parent: np.uint32
 
     def to_byte_stream(self):
-        return b''.join(
-            starmap(
-                int_to_byte_stream,
-                [
-                    (self.page_type, 1),
-                    (0, 1),
-                    (self.num_cells, 2),
-                    (self.data_start, 2),
-                    (self.right_relatve, 4),
-                    (self.parent, 4),
-                    (0, 2)
-                ]
-            )
+        return PAGE_HEADER.pack(
+            int(self.page_type),
+            int(self.num_cells),
+            int(self.data_start),
+            int(self.right_relatve),
+            int(self.parent)
         )
 
     @classmethod
@@ -65,28 +60,19 @@ class PageHeader:
         )
 
     @classmethod
-    def from_byte_stream(cls, byte_stream: bytes):
-        base_obj = cls.default_header()
-        raw = io.BytesIO(byte_stream)
-        read_buff = io.BufferedRandom(raw)
-        
-        pg_type = big_endian_int(read_buff.read(1))
-        base_obj.page_type = PageType.from_int(pg_type)
-
-        read_buff.read(1)
-        n_cells = big_endian_int(read_buff.read(2))
-        base_obj.num_cells = np.uint16(n_cells)
-
-        pg_data_start = big_endian_int(read_buff.read(2))
-        base_obj.data_start = np.uint16(pg_data_start)
+    def from_byte_stream(cls, byte_stream: bytes, offset: int = 0):
+        """
+        byte_stream can be any buffer (bytes, memoryview, mmap), the header is read in place at offset.
+        """
+        pg_type, n_cells, pg_data_start, right_relative, parent = PAGE_HEADER.unpack_from(byte_stream, offset)
 
-        right_relative = big_endian_int(read_buff.read(4))
-        base_obj.right_relatve = np.uint32(right_relative)
-
-        parent = big_endian_int(read_buff.read(4))
-        base_obj.parent = np.uint32(parent)
-
-        return base_obj
+        return cls(
+            PageType.from_int(pg_type),
+            np.uint16(n_cells),
+            np.uint16(pg_data_start),
+            np.uint32(right_relative),
+            np.uint32(parent)
+        )
 
 
 if __name__ == "__main__":
@@ -6,19 +6,54 @@ TODO: The CRUD methods need to be removed.
 """
 from collections import deque
 from dataclasses import dataclass
-import io
+import math
 import numpy as np
+import struct
 
 from dataclasses import dataclass, field
-from typing import List
+from typing import Callable, List
 from bplus_tree import BPlusNode
 from btree import DataPointer
 
-from header import PageHeader, int_to_byte_stream, big_endian_int
-from record import Record, RouterCell
-from enums import PageType
+from header import PAGE_HEADER, PageHeader, int_to_byte_stream
+from record import IndexCell, Record, RecordCodec, RouterCell, RECORD_HEADER, ROUTER_CELL
+from enums import DataType, PageType
 
 PAGE_SIZE_DEFAULT = 512
+# a table cell longer than max_local_cell keeps its start on the leaf, followed by the
+# first page of a chain of [next page 4][bytes used 2][bytes] pages holding the rest,
+# the same as the blob chains of a database file. A next page of 0 ends the chain.
+OVERFLOW_POINTER = struct.Struct(">I")
+OVERFLOW_HEADER = struct.Struct(">IH")
+CELL_SIZE = struct.Struct(">H")
+# parent page number of the root
+NO_PARENT = 0xFFFFFFFF
+# column types interior pages keep a min/max of for each child, signed unlike the cells
+ZONE_FORMATS = {
+    DataType.TINYINT: "b",
+    DataType.SMALLINT: "h",
+    DataType.INT: "i",
+    DataType.BIGINT: "q",
+    DataType.LONG: "q",
+    DataType.FLOAT: "f",
+    DataType.DOUBLE: "d",
+    DataType.YEAR: "b"
+}
+ZONE_TYPE_IDS = {d_type.value[1]: d_type for d_type in ZONE_FORMATS}
+
+
+def tree_degree(page_size: int) -> int:
+    """
+    Minimum degree of the table trees on pages of page_size, 3 at 512 bytes.
+    Fanout grows with the square root of the page size, larger pages get more
+    (and shorter) rows per leaf, 8 at 4 KiB and 33 at 64 KiB.
+    """
+    return max(3, math.isqrt(9 * page_size // PAGE_SIZE_DEFAULT))
+
+
+def max_local_cell(page_size: int) -> int:
+    # longest cell kept whole on a leaf, so a full leaf of them (and one more) fits the page
+    return (page_size - PAGE_HEADER.size) // (2 * tree_degree(page_size)) - 2
 
 @dataclass
 class LeafPageWriter:
@@ -28,45 +63,46 @@ class LeafPageWriter:
     offsets: List[bytes] = field(default_factory=list)
     records: List[Record] = field(default_factory=list)
     page_size: int = PAGE_SIZE_DEFAULT
+    # of the table's schema, records are decoded one by one without it
+    codec: RecordCodec = None
+
+    def to_byte_stream(self, spill: Callable[[bytes, int], bytes] = None):
+        """
+        spill(cell, max_local) stores the end of a cell too long for the page
+        elsewhere, giving back what stays on the page.
+        """
+        # records read from a page and left unchanged give back the cell they were read from
+        cells = [record.to_byte_stream() for record in self.records]
+        if spill is not None:
+            max_local = max_local_cell(self.page_size)
+            cells = [cell if len(cell) <= max_local else spill(cell, max_local) for cell in cells]
+
+        # cells fill the page from its end, the first one last
+        offsets, data_start = [], self.page_size
+        for cell in cells:
+            data_start -= len(cell)
+            offsets.append(data_start)
+
+        self.header.num_cells = np.uint16(len(cells))
+        if cells:
+            self.header.data_start = np.uint16(data_start)
 
-    def to_byte_stream(self):
-        self.offsets = deque()
-        cell_bytes_ll = deque()
-        num_cells = np.uint16(0)
-
-        data_size = np.uint16(0)
-
-        for record in self.records:
-            num_cells += np.uint16(1)
-            cell = record.to_byte_stream()
-            cell_size = len(cell)
-
-            data_size = data_size + np.uint16(cell_size)
-            self.header.data_start = self.page_size - data_size
-            offset = int_to_byte_stream(self.header.data_start, 2)
-            self.offsets.append(offset)
-            cell_bytes_ll.appendleft(cell)
-
-        self.header.num_cells = num_cells
         header_bytes = self.header.to_byte_stream()
-        offset_bytes = b''.join(self.offsets)
-        cell_bytes = b''.join(cell_bytes_ll)
+        offset_bytes = struct.pack(f">{len(offsets)}H", *offsets)
+        cells.reverse()
+        cell_bytes = b''.join(cells)
         padding_len = self.page_size - len(header_bytes) - len(offset_bytes) - len(cell_bytes)
 
-        padding = int_to_byte_stream(0, 1) * padding_len
-        self.offsets = []
-
-        byte_stream = b''.join([
+        return b''.join([
             header_bytes,
             offset_bytes,
-            padding,
+            bytes(padding_len),
             cell_bytes
         ])
 
-        return byte_stream
-
     def to_bpnode(self) -> BPlusNode:
-        x = BPlusNode(True, None)
+        x = BPlusNode(True, _parent_page(self.header), self.page_number)
+        x.next_page = int(self.header.right_relatve) or None
         x.keys = []
         
         for rec in self.records:
@@ -81,38 +117,52 @@ class LeafPageWriter:
 
 
     @classmethod
-    def from_byte_stream(cls, byte_stream: bytes, pg_num: int):
-        raw = io.BytesIO(byte_stream)
-        read_buff = io.BufferedRandom(raw)
+    def from_byte_stream(cls, byte_stream: bytes, pg_num: int, codec: RecordCodec = None,
+                         gather: Callable[[bytes, int, int], bytes] = None):
+        """
+        byte_stream can be any buffer holding the page, a memoryview of an mmap
+        included. Cells are read at their offsets, by the codec as records
+        decoding their values when first read. gather(page, offset, max_local)
+        gives back the whole of a cell longer than the page keeps.
+        """
+        header = PageHeader.from_byte_stream(byte_stream)
+        decode = codec.decode if codec else Record.from_byte_stream
+        max_local = max_local_cell(len(byte_stream))
+
+        records = []
+        for ci in cell_offsets(byte_stream, header):
+            if gather is not None and RECORD_HEADER.size - 1 + CELL_SIZE.unpack_from(byte_stream, ci)[0] > max_local:
+                records.append(decode(gather(byte_stream, ci, max_local), 0))
+            else:
+                records.append(decode(byte_stream, ci))
 
-        header_bytes = read_buff.read(16)
-        header = PageHeader.from_byte_stream(header_bytes)
-        num_cells = header.num_cells
-
-        read_buff.seek(16)
-
-        offsets_paired = list()
+        return cls(
+            pg_num,
+            header,
+            list(),
+            records
+        )
 
-        for _ in range(num_cells):
-            cell_offset_bytes = read_buff.read(2)
-            cell_offset_int = big_endian_int(cell_offset_bytes)
-            offsets_paired.append((cell_offset_bytes, cell_offset_int))
+@dataclass
+class IndexLeafPageWriter(LeafPageWriter):
+    """
+    Same cell layout as a table leaf page, the records are IndexCells.
+    """
 
+    @classmethod
+    def from_byte_stream(cls, byte_stream: bytes, pg_num: int):
+        header = PageHeader.from_byte_stream(byte_stream)
 
-        records = list()
-        for _, ci in offsets_paired:
-            read_buff.seek(ci)
-            rec_len = big_endian_int(read_buff.read(2))
-            read_buff.seek(ci)
-            record_bytes = read_buff.read(6 + rec_len)
-            rec = Record.from_byte_stream(record_bytes)
-            records.append(rec)
+        cells = [
+            IndexCell.from_byte_stream(byte_stream, ci)
+            for ci in cell_offsets(byte_stream, header)
+        ]
 
         return cls(
             pg_num,
             header,
             list(),
-            records
+            cells
         )
 
 @dataclass
@@ -124,6 +174,8 @@ class InternalPageWriter:
     keys: List[RouterCell] = field(default_factory=list)
     last_child_pg: int = field(default_factory=int)
     page_size: int = PAGE_SIZE_DEFAULT
+    # zone maps of the children, right after the cell offsets
+    zone_bytes: bytes = b""
 
 
     def to_byte_stream(self, parent_page_num: int):
@@ -139,12 +191,12 @@ class InternalPageWriter:
             cell_size = len(cell)
 
             data_size = data_size + np.uint16(cell_size)
-            self.header.data_start = self.page_size - data_size
+            self.header.data_start = self.page_size - int(data_size)
             offset = int_to_byte_stream(self.header.data_start, 2)
             self.offsets.append(offset)
             cell_bytes_ll.appendleft(cell)
 
-        self.header.num_cells = num_cells
+        self.header.num_cells = int(num_cells)
         self.header.page_type = PageType.table_interior_page
         self.header.parent = np.uint32(parent_page_num)
         self.header.right_relatve = np.uint32(self.last_child_pg)
@@ -154,57 +206,253 @@ class InternalPageWriter:
         cell_bytes = b''.join(cell_bytes_ll)
         padding_len = self.page_size - len(header_bytes) - len(offset_bytes) - len(cell_bytes)
 
-        padding = int_to_byte_stream(0, 1) * padding_len
+        zone_bytes = self.zone_bytes if len(self.zone_bytes) <= padding_len else b""
+        padding = int_to_byte_stream(0, 1) * (padding_len - len(zone_bytes))
         self.offsets = []
 
         byte_stream = b''.join([
             header_bytes,
             offset_bytes,
+            zone_bytes,
             padding,
             cell_bytes
         ])
 
         return byte_stream
 
-    def to_bpnode(self):
-        #TODO: Implement for a truer, more efficient implementation.
-        raise NotImplementedError
+    def to_bpnode(self) -> BPlusNode:
+        x = BPlusNode(False, _parent_page(self.header), self.page_number)
+        x.keys = [int(cell.row_id) for cell in self.keys]
+        x.child_pages = self.child_page_numbers()
+        return x
+
+    def child_page_numbers(self) -> List[int]:
+        return [int(cell.lc_page_no) for cell in self.keys] + [int(self.last_child_pg)]
     
     @classmethod
     def from_byte_stream(cls, byte_stream: bytes, pg_num: int):
-        raw = io.BytesIO(byte_stream)
-        read_buff = io.BufferedRandom(raw)
-
-        header_bytes = read_buff.read(16)
-        header = PageHeader.from_byte_stream(header_bytes)
-        num_cells = header.num_cells
+        header = PageHeader.from_byte_stream(byte_stream)
 
-        read_buff.seek(16)
-
-        offsets_paired = list()
-
-        for _ in range(num_cells):
-            cell_offset_bytes = read_buff.read(2)
-            cell_offset_int = big_endian_int(cell_offset_bytes)
-            offsets_paired.append((cell_offset_bytes, cell_offset_int))
-
-
-        router_cells = list()
-        for _, ci in offsets_paired:
-            read_buff.seek(ci)
-            cell_bytes = read_buff.read(8)
-            rec = RouterCell.from_byte_stream(cell_bytes)
-            router_cells.append(rec)
+        router_cells = [
+            RouterCell.from_byte_stream(byte_stream, ci)
+            for ci in cell_offsets(byte_stream, header)
+        ]
 
         return InternalPageWriter(
             pg_num,
             header,
             list(),
             router_cells,
-            header.right_relatve
+            header.right_relatve,
+            zone_bytes=byte_stream[PAGE_HEADER.size + 2 * header.num_cells:int(header.data_start)]
         )
 
 
+def cell_offsets(byte_stream: bytes, header: PageHeader) -> tuple:
+    # the 2 byte cell offsets follow the 16 byte header
+    return struct.unpack_from(f">{header.num_cells}H", byte_stream, PAGE_HEADER.size)
+
+
+def _parent_page(header: PageHeader) -> int:
+    return None if int(header.parent) == NO_PARENT else int(header.parent)
+
+
+class TablePageCodec:
+    """
+    Table pages <-> BPlusNodes for the pager, the node's page_no, parent and
+    next leaf travel in the page header. Records are encoded and decoded by a
+    RecordCodec compiled for the table's data types, when they are known.
+
+    Leaves own the overflow chains of their long cells, a leaf node keeps the
+    pages of its chains (overflow_pages) from when it was read or last written,
+    they are freed when it's written again or freed itself.
+    """
+
+    def __init__(self, data_types: List[DataType] = ()) -> None:
+        self.records = RecordCodec.for_types(tuple(data_types)) if data_types else None
+
+    def decode(self, page_bytes: bytes, pg_num: int, pager=None) -> BPlusNode:
+        pg_type = page_bytes[0]
+
+        if pg_type == PageType.table_leaf_page:
+            overflow_pages = []
+            gather = (lambda page, offset, max_local: self.gather(pager, page, offset, max_local, overflow_pages)
+                      if pager is not None else None)
+            node = LeafPageWriter.from_byte_stream(page_bytes, pg_num, self.records, gather).to_bpnode()
+            node.overflow_pages = overflow_pages
+            return node
+        elif pg_type == PageType.table_interior_page:
+            writer = InternalPageWriter.from_byte_stream(page_bytes, pg_num)
+            node = writer.to_bpnode()
+            node.zone_columns, node.zones = TablePageCodec.decode_zones(writer.zone_bytes, node.child_pages)
+            return node
+
+        raise ValueError(f"Page {pg_num} is not a table page.")
+
+    @staticmethod
+    def cell_count(page_bytes: bytes) -> int:
+        _, num_cells, *_ = PAGE_HEADER.unpack_from(page_bytes)
+        return num_cells
+
+    @staticmethod
+    def overflow_pages(page_bytes: bytes, pager) -> List[int]:
+        # pages of the overflow chains of a leaf page, without decoding its records
+        if page_bytes[0] != PageType.table_leaf_page:
+            return []
+
+        max_local = max_local_cell(len(page_bytes))
+        pages = []
+        for ci in cell_offsets(page_bytes, PageHeader.from_byte_stream(page_bytes)):
+            if RECORD_HEADER.size - 1 + CELL_SIZE.unpack_from(page_bytes, ci)[0] > max_local:
+                page_no, = OVERFLOW_POINTER.unpack_from(page_bytes, ci + max_local - OVERFLOW_POINTER.size)
+                while page_no:
+                    pages.append(page_no)
+                    page_no, _ = OVERFLOW_HEADER.unpack_from(pager.read_page(page_no))
+        return pages
+
+    @staticmethod
+    def gather(pager, page_bytes: bytes, offset: int, max_local: int, pages: List[int]) -> bytes:
+        # the whole cell at offset, its start on the page followed by its chain, whose pages go to pages
+        local = max_local - OVERFLOW_POINTER.size
+        parts = [bytes(page_bytes[offset:offset + local])]
+        page_no, = OVERFLOW_POINTER.unpack_from(page_bytes, offset + local)
+
+        while page_no:
+            pages.append(page_no)
+            page = pager.read_page(page_no)
+            next_page, used = OVERFLOW_HEADER.unpack_from(page)
+            parts.append(bytes(page[OVERFLOW_HEADER.size:OVERFLOW_HEADER.size + used]))
+            page_no = next_page
+
+        return b"".join(parts)
+
+    @staticmethod
+    def spill(pager, cell: bytes, max_local: int, pages: List[int]) -> bytes:
+        # writes what doesn't fit on the leaf to a new chain, whose pages go to pages
+        local = max_local - OVERFLOW_POINTER.size
+        room = pager.page_size - OVERFLOW_HEADER.size
+        chunks = [cell[i:i + room] for i in range(local, len(cell), room)]
+        chain = [pager.allocate_page() for _ in chunks]
+
+        for page_no, next_page, chunk in zip(chain, chain[1:] + [0], chunks):
+            page = OVERFLOW_HEADER.pack(next_page, len(chunk)) + chunk
+            pager.write_page(page_no, page.ljust(pager.page_size, b"\x00"))
+
+        pages.extend(chain)
+        return cell[:local] + OVERFLOW_POINTER.pack(chain[0])
+
+    def encode(self, node: BPlusNode, page_size: int, pager=None) -> bytes:
+        parent = NO_PARENT if node.parent_page is None else node.parent_page
+
+        if node.is_leaf:
+            head = PageHeader(
+                PageType.table_leaf_page,
+                num_cells=0,
+                data_start=0,
+                right_relatve=node.next_page or 0,
+                parent=parent
+            )
+
+            spill = None
+            if pager is not None:
+                # chains are rewritten with the leaf, the old ones are freed first
+                for page_no in node.overflow_pages:
+                    pager.free_page(page_no)
+                node.overflow_pages = []
+                spill = lambda cell, max_local: self.spill(pager, cell, max_local, node.overflow_pages)
+
+            return LeafPageWriter(
+                page_number=node.page_no,
+                header=head,
+                records=[dp.data for dp in node.keys],
+                page_size=page_size
+            ).to_byte_stream(spill)
+
+        head = PageHeader(PageType.table_interior_page, 0, 0, node.child_pages[-1], parent)
+        r_cells = [RouterCell(rid, pno) for pno, rid in zip(node.child_pages[:-1], node.keys)]
+
+        return InternalPageWriter(
+            node.page_no,
+            head,
+            [],
+            r_cells,
+            node.child_pages[-1],
+            page_size,
+            TablePageCodec.encode_zones(node)
+        ).to_byte_stream(parent)
+
+    @staticmethod
+    def zone_columns(data_types: List[DataType], page_size: int, max_children: int) -> tuple:
+        """
+        (column ord, type) of the columns interior pages can keep zone maps for,
+        the fixed width numeric ones from the first, as many as fit beside the
+        cells of a full interior page.
+        """
+        room = page_size - PAGE_HEADER.size - (max_children - 1) * (2 + ROUTER_CELL.size) - 1
+        columns = []
+
+        for c_ord, d_type in enumerate(data_types[:255]):
+            if d_type not in ZONE_FORMATS:
+                continue
+            # ord and type id in the block header, a flag and two values per child
+            need = 2 + max_children * (1 + 2 * d_type.value[2])
+            if need > room:
+                break
+            columns.append((c_ord, d_type))
+            room -= need
+
+        return tuple(columns)
+
+    @staticmethod
+    def encode_zones(node: BPlusNode) -> bytes:
+        """
+        Column count, then the ord and type id of each column, then for every
+        child in order a flag per column followed by its min and max when the
+        flag is set. Children without a known zone get a clear flag.
+        """
+        if not node.zone_columns:
+            return b""
+
+        formats = [ZONE_FORMATS[d_type] * 2 for _, d_type in node.zone_columns]
+        parts = [bytes([len(node.zone_columns)])]
+        parts.extend(bytes([c_ord, d_type.value[1]]) for c_ord, d_type in node.zone_columns)
+
+        for page_no in node.child_pages:
+            zone = node.zones.get(page_no) or (None,) * len(formats)
+            for fmt, bounds in zip(formats, zone):
+                if bounds is None:
+                    parts.append(b"\x00")
+                else:
+                    parts.append(b"\x01" + struct.pack(">" + fmt, *bounds))
+
+        return b"".join(parts)
+
+    @staticmethod
+    def decode_zones(zone_bytes: bytes, child_pages: List[int]) -> tuple:
+        # (zone columns, {child page: zone}), nothing for pages written without zone maps
+        if not len(zone_bytes) or not zone_bytes[0]:
+            return (), {}
+
+        n_cols = zone_bytes[0]
+        columns = tuple((zone_bytes[1 + 2 * i], ZONE_TYPE_IDS[zone_bytes[2 + 2 * i]]) for i in range(n_cols))
+        unpackers = [struct.Struct(">" + ZONE_FORMATS[d_type] * 2) for _, d_type in columns]
+
+        zones, pos = {}, 1 + 2 * n_cols
+        for page_no in child_pages:
+            zone = []
+            for (_, d_type), unpacker in zip(columns, unpackers):
+                pos += 1
+                if zone_bytes[pos - 1]:
+                    lo, hi = unpacker.unpack_from(zone_bytes, pos)
+                    zone.append((d_type.value[3](lo), d_type.value[3](hi)))
+                    pos += unpacker.size
+                else:
+                    zone.append(None)
+            zones[page_no] = tuple(zone)
+
+        return columns, zones
+
+
 if __name__ == "__main__":
 
     r_cells = []
@@ -1,12 +1,13 @@
 from __future__ import annotations
-from enums import DataType
-import io
+from enums import DataType, LONG_TEXT_ID, MAX_SHORT_TEXT
+import datetime as dt
 import numpy as np
+import struct
 
 from dataclasses import dataclass
-from functools import total_ordering
-from itertools import filterfalse
-from typing import Dict, List, Union
+from functools import lru_cache, total_ordering
+from itertools import compress
+from typing import Any, Dict, List, Sequence, Union
 from operator import lt, gt, eq, ne, ge, le, itemgetter
 
 from header import int_to_byte_stream, big_endian_int
@@ -28,40 +29,354 @@ COMP_FUNCT = {
     "<": lt
 }
 
-@dataclass
-@total_ordering
-class Record:
+# the row id every record is keyed by, usable as a column when no column has the name
+ROW_ID_COLUMN = "rowid"
+
+# payload size, row id, number of columns
+RECORD_HEADER = struct.Struct(">HIB")
+# left child page, row id
+ROUTER_CELL = struct.Struct(">II")
+# payload size, type id
+INDEX_CELL_HEADER = struct.Struct(">HB")
+ROW_ID_COUNT = struct.Struct(">H")
+# byte length before a long TEXT value
+TEXT_LENGTH = struct.Struct(">H")
+
+_INT_FORMATS = {1: ">b", 2: ">h", 4: ">i", 8: ">q"}
+_FLOAT_FORMATS = {DataType.FLOAT: "f", DataType.DOUBLE: "d"}
+
+
+def _type_decoders():
+    """
+    (data type, value size, struct to read the value with) for every type id byte,
+    types without a struct go through DataType.bytes_to_typed_value. Long TEXT
+    has a size of 0, its length is stored before it (see read_value).
+    """
+    mapping = DataType.type_id_to_type_mapping()
+    decoders = []
+
+    for type_id in range(256):
+        d_type = mapping.get(type_id, DataType.TEXT)
+
+        if d_type is DataType.TEXT:
+            size, fmt = (0 if type_id == LONG_TEXT_ID else max(type_id - d_type.value[1], 0)), None
+        elif d_type in _FLOAT_FORMATS:
+            size, fmt = d_type.value[2], _FLOAT_FORMATS[d_type]
+        elif d_type.value[3] is not None and issubclass(d_type.value[3], np.integer):
+            size, fmt = d_type.value[2], _INT_FORMATS[d_type.value[2]]
+        else:
+            size, fmt = d_type.value[2], None
 
-    row_id: np.uint32
-    num_columns: np.uint8
-    data_types: List[DataType]
-    data_values: List
+        decoders.append((d_type, size, struct.Struct(fmt) if fmt else None))
 
-    def get_id(self):
-        return self.row_id
+    return decoders
 
-    def _cell_payload_byte_stream(self):
-        
+
+TYPE_DECODERS = _type_decoders()
+# the size of the value stored under every type id, cell.translate()d into sizes to find a column
+_TYPE_ID_SIZES = bytes(size for _, size, _ in TYPE_DECODERS)
+# a column of a Record not decoded yet
+_UNREAD = object()
+
+
+def decode_value(d_type: DataType, size: int, unpacker: struct.Struct, buffer, pos: int):
+    if unpacker is not None:
+        return d_type.value[3](unpacker.unpack_from(buffer, pos)[0])
+    elif d_type is DataType.TEXT:
+        return str(buffer[pos:pos + size], "utf-8")
+    return d_type.bytes_to_typed_value(bytes(buffer[pos:pos + size]))
+
+
+def read_value(type_id: int, buffer, pos: int) -> tuple:
+    # (value, position past it) of the value stored under type_id at pos
+    d_type, size, unpacker = TYPE_DECODERS[type_id]
+    if type_id == LONG_TEXT_ID:
+        size, = TEXT_LENGTH.unpack_from(buffer, pos)
+        pos += TEXT_LENGTH.size
+    value = None if d_type is DataType.NULL else decode_value(d_type, size, unpacker, buffer, pos)
+    return value, pos + size
+
+
+def skip_values(type_ids: bytes, buffer, pos: int) -> int:
+    # position past the values stored under type_ids from pos
+    if LONG_TEXT_ID not in type_ids:
+        return pos + sum(type_ids.translate(_TYPE_ID_SIZES))
+    for type_id in type_ids:
+        if type_id == LONG_TEXT_ID:
+            pos += TEXT_LENGTH.size + TEXT_LENGTH.unpack_from(buffer, pos)[0]
+        else:
+            pos += _TYPE_ID_SIZES[type_id]
+    return pos
+
+
+# struct formats of the fixed width types as stored, ints and dates big endian,
+# floats in the (little endian) order they were always packed in
+FIXED_FORMATS = {
+    DataType.TINYINT: ">b",
+    DataType.SMALLINT: ">h",
+    DataType.INT: ">i",
+    DataType.BIGINT: ">q",
+    DataType.LONG: ">q",
+    DataType.FLOAT: "<f",
+    DataType.DOUBLE: "<d",
+    DataType.YEAR: ">b",
+    DataType.TIME: ">i",
+    DataType.DATETIME: ">q",
+    DataType.DATE: ">q"
+}
+
+TEXT_TYPE_ID = DataType.TEXT.value[1]
+# every TEXT type id (TEXT_TYPE_ID + length) mapped to TEXT_TYPE_ID, the others left as they are
+_TEXT_IDS_AS_ONE = bytes(min(type_id, TEXT_TYPE_ID) for type_id in range(256))
+
+
+def _time_to_int(value):
+    if not isinstance(value, dt.time):
+        return 0
+    return value.hour * 3600000 + value.minute * 60000 + value.second * 1000 + value.microsecond // 1000
+
+def _datetime_to_int(value):
+    return int(value.timestamp() * 1000) if isinstance(value, dt.datetime) else 0
+
+def _date_to_int(value):
+    if not isinstance(value, dt.date):
+        return 0
+    return int(dt.datetime.combine(value, dt.time.min).timestamp() * 1000)
+
+def _int_to_time(ms: int):
+    return dt.time(ms // 3600000, ms // 60000 % 60, ms // 1000 % 60, ms % 1000 * 1000)
+
+# (to the stored int, back from it) for the types that aren't numbers in memory
+_DATE_CONVERTERS = {
+    DataType.TIME: (_time_to_int, _int_to_time),
+    DataType.DATETIME: (_datetime_to_int, lambda ms: dt.datetime.fromtimestamp(ms / 1000)),
+    DataType.DATE: (_date_to_int, lambda ms: dt.date.fromtimestamp(ms / 1000))
+}
+
+
+class RecordCodec:
+    """
+    Records <-> cells for one table schema, compiled once: the type id bytes
+    of a record are a template with only the TEXT lengths filled in, and each
+    run of fixed width columns stored in the same byte order is packed and
+    unpacked by one precomputed struct. TEXT values are encoded together and
+    sliced out between the runs.
+
+    Records the schema doesn't cover (NULLs, cells written under other column
+    types, values that don't pack) go value by value.
+
+    It is also the schema every Record of the table refers to, for_types hands
+    out one codec per distinct list of column types. Decoded records keep their
+    cell and have their values decoded from it when first read, a column on its
+    own (decode_column) or all of them (decode_values).
+    """
+
+    def __init__(self, data_types: List[DataType]) -> None:
+        self.data_types = list(data_types)
+        self.num_columns = len(self.data_types)
+        self.text_ords = [i for i, d_type in enumerate(self.data_types) if d_type is DataType.TEXT]
+        self.covered = all(d_type in FIXED_FORMATS or d_type is DataType.TEXT for d_type in self.data_types)
+        self.type_ids = bytes(d_type.value[1] for d_type in self.data_types) if self.covered else b""
+
+        # in column order, the in memory value of each stored one
+        self.from_stored = [_DATE_CONVERTERS[d_type][1] if d_type in _DATE_CONVERTERS else d_type.value[3]
+                            for d_type in self.data_types] if self.covered else []
+        # in column order, the struct of each fixed width column, None for TEXT
+        self.unpackers = [struct.Struct(FIXED_FORMATS[d_type]) if d_type in FIXED_FORMATS else None
+                          for d_type in self.data_types] if self.covered else []
+
+        # (struct, getter of its values, to stored values) per run of fixed width
+        # columns, (None, ord of the column, None) for each TEXT column between them
+        self.steps = []
+        run = []
+        for c_ord, d_type in enumerate(self.data_types + [None]):
+            fmt = FIXED_FORMATS.get(d_type)
+            if run and (fmt is None or fmt[0] != FIXED_FORMATS[self.data_types[run[0]]][0]):
+                self.steps.append(self._run_step(run))
+                run = []
+            if fmt is not None:
+                run.append(c_ord)
+            elif d_type is DataType.TEXT:
+                self.steps.append((None, c_ord, None))
+
+    @classmethod
+    @lru_cache(maxsize=None)
+    def for_types(cls, data_types: tuple) -> RecordCodec:
+        return cls(data_types)
+
+    def _run_step(self, run: List[int]) -> tuple:
+        d_types = [self.data_types[c_ord] for c_ord in run]
+        fmt = FIXED_FORMATS[d_types[0]][0] + "".join(FIXED_FORMATS[d_type][1:] for d_type in d_types)
+        getter = itemgetter(*run) if len(run) > 1 else lambda values: (values[run[0]],)
+
+        to_stored = None
+        if any(d_type in _DATE_CONVERTERS for d_type in d_types):
+            to_stored = [_DATE_CONVERTERS[d_type][0] if d_type in _DATE_CONVERTERS else int for d_type in d_types]
+
+        return struct.Struct(fmt), getter, to_stored
+
+    def encode(self, row_id: int, data_values: Sequence) -> bytes:
+        if not self.covered or len(data_values) != self.num_columns or None in data_values:
+            return self.encode_by_value(row_id, data_values)
+
+        try:
+            texts = [data_values[c_ord].encode() for c_ord in self.text_ords]
+            type_ids = bytearray(self.type_ids)
+            for i, (c_ord, text) in enumerate(zip(self.text_ords, texts)):
+                if len(text) > MAX_SHORT_TEXT:
+                    type_ids[c_ord] = LONG_TEXT_ID
+                    texts[i] = TEXT_LENGTH.pack(len(text)) + text
+                else:
+                    type_ids[c_ord] = TEXT_TYPE_ID + len(text)
+
+            texts.reverse()
+            parts = []
+            for packer, getter, to_stored in self.steps:
+                if packer is None:
+                    parts.append(texts.pop())
+                elif to_stored is None:
+                    parts.append(packer.pack(*getter(data_values)))
+                else:
+                    parts.append(packer.pack(*[f(v) for f, v in zip(to_stored, getter(data_values))]))
+        except (AttributeError, TypeError, ValueError, struct.error):
+            return self.encode_by_value(row_id, data_values)
+
+        values = b"".join(parts)
+        return RECORD_HEADER.pack(1 + self.num_columns + len(values), row_id, self.num_columns) + type_ids + values
+
+    def encode_by_value(self, row_id: int, data_values: Sequence) -> bytes:
         acc_list = []
         type_id_list = []
-        for v, typ in zip(self.data_values, self.data_types):
+        for v, typ in zip(data_values, self.data_types):
+            if v is None:
+                typ = DataType.NULL
             acc_list.append(typ.typed_value_to_bytes(v))
             type_id_list.append(typ.get_id_bytes(v))
 
-        dval_bytes = b"".join(acc_list)
-        data_type_bytes = b"".join(type_id_list)
+        payload = b"".join([int_to_byte_stream(self.num_columns, 1), *type_id_list, *acc_list])
+        return b"".join([int_to_byte_stream(len(payload), 2), int_to_byte_stream(row_id, 4), payload])
+
+    def decode(self, buffer, offset: int = 0) -> Record:
+        # the cell is copied out of the buffer, its values are decoded when read
+        payload_size, row_id, num_cols = RECORD_HEADER.unpack_from(buffer, offset)
+        cell = bytes(buffer[offset:offset + RECORD_HEADER.size - 1 + payload_size])
+
+        if num_cols == self.num_columns:
+            return Record(row_id, self, cell=cell)
+        types = cell[RECORD_HEADER.size:RECORD_HEADER.size + num_cols]
+        return Record(row_id, self.for_types(tuple(TYPE_DECODERS[type_id][0] for type_id in types)), cell=cell)
+
+    def decode_values(self, cell: bytes) -> tuple:
+        num_cols = cell[RECORD_HEADER.size - 1]
+        pos = RECORD_HEADER.size
+        type_ids = cell[pos:pos + num_cols]
+
+        if not self.covered or num_cols != self.num_columns or not self._fits(type_ids):
+            return Record.from_byte_stream(cell).data_values
+
+        pos += num_cols
+        stored = []
+        for unpacker, c_ord, _ in self.steps:
+            if unpacker is None:
+                if type_ids[c_ord] == LONG_TEXT_ID:
+                    end = pos + TEXT_LENGTH.size + TEXT_LENGTH.unpack_from(cell, pos)[0]
+                    pos += TEXT_LENGTH.size
+                else:
+                    end = pos + type_ids[c_ord] - TEXT_TYPE_ID
+                stored.append(str(cell[pos:end], "utf-8"))
+                pos = end
+            else:
+                stored.extend(unpacker.unpack_from(cell, pos))
+                pos += unpacker.size
+
+        return tuple([f(v) for f, v in zip(self.from_stored, stored)])
+
+    def decode_column(self, cell: bytes, c_ord: int):
+        num_cols = cell[RECORD_HEADER.size - 1]
+        if not 0 <= c_ord < num_cols:
+            raise IndexError(f"Record has no column {c_ord}")
 
-        return int_to_byte_stream(self.num_columns, 1) + data_type_bytes + dval_bytes
+        types_start = RECORD_HEADER.size
+        type_id = cell[types_start + c_ord]
+        # past the type ids and the values of the columns before it
+        pos = skip_values(cell[types_start:types_start + c_ord], cell, types_start + num_cols)
+
+        if self.covered and num_cols == self.num_columns:
+            unpacker = self.unpackers[c_ord]
+            if unpacker is None and TEXT_TYPE_ID <= type_id < LONG_TEXT_ID:
+                return str(cell[pos:pos + type_id - TEXT_TYPE_ID], "utf-8")
+            if unpacker is not None and type_id == self.type_ids[c_ord]:
+                return self.from_stored[c_ord](unpacker.unpack_from(cell, pos)[0])
+
+        return read_value(type_id, cell, pos)[0]
+
+    def _fits(self, type_ids: bytes) -> bool:
+        # same ids as the schema, any length of text in TEXT columns
+        return type_ids.translate(_TEXT_IDS_AS_ONE) == self.type_ids
+
+
+@total_ordering
+class Record:
+    """
+    A row, its values as a tuple in column order. The column types are those
+    of its schema, the RecordCodec of the table, shared by all of its rows.
+
+    A record read from a page holds its cell and decodes values from it as
+    they are read, one column through value or all of them through
+    data_values, keeping them once decoded. A new record keeps its cell
+    once first encoded. Either is reused by size checks and page writes
+    until the values are changed (update_val).
+    """
+    __slots__ = ("row_id", "schema", "_values", "_cell")
+
+    def __init__(self, row_id: int, schema: RecordCodec, data_values: Sequence = None, cell: bytes = None) -> None:
+        self.row_id = row_id
+        self.schema = schema
+        # a tuple once all decoded, a list with _UNREAD columns before
+        self._values = data_values if data_values is None or type(data_values) is tuple else tuple(data_values)
+        self._cell = cell
+
+    @property
+    def data_values(self) -> tuple:
+        if type(self._values) is not tuple:
+            self._values = self.schema.decode_values(self._cell)
+        return self._values
+
+    @data_values.setter
+    def data_values(self, data_values: Sequence):
+        self._values = tuple(data_values)
+        self._cell = None
+
+    def value(self, c_ord: int):
+        values = self._values
+        if type(values) is tuple:
+            return values[c_ord]
+
+        if values is None:
+            self._values = values = [_UNREAD] * self.schema.num_columns
+        val = values[c_ord]
+        if val is _UNREAD:
+            val = values[c_ord] = self.schema.decode_column(self._cell, c_ord)
+        return val
+
+    @property
+    def num_columns(self) -> int:
+        return self.schema.num_columns
+
+    @property
+    def data_types(self) -> List[DataType]:
+        return self.schema.data_types
+
+    def get_id(self):
+        return self.row_id
 
     def to_byte_stream(self):
-        payload = self._cell_payload_byte_stream()
-        payload_size = len(payload)
-        row_id_byte_stream = int_to_byte_stream(self.row_id, 4)
-        return b''.join([
-            int_to_byte_stream(payload_size, 2),
-            row_id_byte_stream,
-            payload
-        ])
+        if self._cell is None:
+            self._cell = self.schema.encode(self.row_id, self._values)
+        return self._cell
+
+    def byte_size(self) -> int:
+        return len(self.to_byte_stream())
 
     def matches_condition(self, condition: Dict) -> bool:
         """
@@ -74,14 +389,22 @@ class Record:
             "comparator": "=",
             "value": "Mexico"
         }
+        or {"operator": "AND" / "OR", "operands": [condition, ...]}, the
+        operands are tested in order until one decides. A NULL value matches
+        no comparison, negated or not.
         """
-        lval = self.data_values[condition["column_ord"]]
+        if "operator" in condition:
+            matches = (self.matches_condition(operand) for operand in condition["operands"])
+            return all(matches) if condition["operator"] == "AND" else any(matches)
+
+        c_ord = condition["column_ord"]
+        lval = self.row_id if c_ord == ROW_ID_COLUMN else self.value(c_ord)
         rval = condition["value"]
         comp = condition["comparator"]
         if condition["negated"] == "TRUE":
             comp = CONDITION_NEGATED[comp]
 
-        return COMP_FUNCT[comp](lval, rval)
+        return lval is not None and COMP_FUNCT[comp](lval, rval)
 
     def update_val(self, operation: Dict):
         """
@@ -102,7 +425,9 @@ class Record:
         col_name = operation["column_name"]
 
         if isinstance(rval, type_cast):
-            self.data_values[operation["column_ord"]] = type_cast(rval)
+            c_ord = operation["column_ord"]
+            values = self.data_values
+            self.data_values = values[:c_ord] + (type_cast(rval),) + values[c_ord + 1:]
             return self
         else:
             raise TypeError(f"{rval} isn't a valid value for {col_name} of type {type_.value[0]}")
@@ -127,65 +452,103 @@ class Record:
         return (f"{self.data_values}")
 
     @classmethod
-    def from_byte_stream(cls, byte_stream: bytes):
-        raw = io.BytesIO(byte_stream)
-        read_buff = io.BufferedRandom(raw)
-        
-        d_types = []
-        d_vals = []
-
-        payload_size_b = read_buff.read(2)
-        row_id_b = read_buff.read(4)
-        row_id = big_endian_int(row_id_b)
-        
-        num_cols_b = read_buff.read(1)
-        num_cols = big_endian_int(num_cols_b)
-
-        for _ in range(num_cols):
-            type_id_byte = read_buff.read(1)
-            d_type = DataType.from_id_byte(type_id_byte)
-            d_types.append((d_type, big_endian_int(type_id_byte)))
+    def from_byte_stream(cls, byte_stream: bytes, offset: int = 0):
+        """
+        Decodes the record starting at offset, byte_stream can be any buffer
+        (bytes, memoryview, mmap) and values are read from it in place.
+        """
+        _, row_id, num_cols = RECORD_HEADER.unpack_from(byte_stream, offset)
 
+        types_start = offset + RECORD_HEADER.size
+        pos = types_start + num_cols
 
+        d_vals = []
         d_types_clean = []
-        for d_type, type_id_int in d_types:
-            if d_type is DataType.NULL:
-                continue
-            elif d_type is DataType.TEXT:
-                read_len = type_id_int - d_type.value[1]
-            else:
-                read_len = d_type.value[2]
-
-            val_bytes = read_buff.read(read_len)
-            typed_val = d_type.bytes_to_typed_value(val_bytes)
-            d_vals.append(typed_val)
-            d_types_clean.append(d_type)
+        for type_id in byte_stream[types_start:types_start + num_cols]:
+            value, pos = read_value(type_id, byte_stream, pos)
+            d_vals.append(value)
+            d_types_clean.append(TYPE_DECODERS[type_id][0])
 
-        return cls(
-            row_id,
-            num_cols,
-            d_types_clean,
-            d_vals
-        )
+        return cls(row_id, RecordCodec.for_types(tuple(d_types_clean)), tuple(d_vals))
 
     @classmethod
     def filter_update(cls, ls: List[Record], operation: Dict, condition: Dict) -> List[Record]:
-        filter_ = cls.filter_func(condition)
         update_ = cls.record_updater(operation)
-        return [update_(rec) if filter_(rec) else rec for rec in ls]
+        return [update_(rec) if match else rec for rec, match in zip(ls, cls.filter_mask(ls, condition))]
 
     @classmethod
     def filter_delete(cls, ls: List[Record], condition: Dict) -> List[Record]:
-        filter_ = cls.filter_func(condition)
-        return list(filterfalse(filter_, ls))
+        return list(compress(ls, ~cls.filter_mask(ls, condition)))
 
     @classmethod
     def filter_subset_select(cls, ls: List[Record], col_ord_list: List[int], condition: Dict = None) -> List[List]:
-        filter_ = cls.filter_func(condition) if condition else lambda x: True
+        selected = compress(ls, cls.filter_mask(ls, condition)) if condition else ls
+        if col_ord_list and ls and 2 * len(col_ord_list) <= ls[0].num_columns:
+            # only the selected columns are decoded, for more the whole record is decoded at once
+            return [[rec.value(c_ord) for c_ord in col_ord_list] for rec in selected]
+
         columns_filter = itemgetter(*col_ord_list) if col_ord_list else lambda x: tuple(x)
         cf_wrapper = lambda x: list(r) if isinstance((r := columns_filter(x)), tuple) else [r]
+        return [cf_wrapper(rec.data_values) for rec in selected]
+
+    @classmethod
+    def filter_mask(cls, ls: List[Record], condition: Dict) -> np.ndarray:
+        """
+        Boolean array of which records match the condition. A numeric condition
+        column is gathered into one array and compared with a single vectorized
+        op, anything else (text, dates, NULLs) is compared record by record,
+        where a NULL matches no comparator, negated or not.
+        AND / OR operands are tested in order, each only on the records the
+        ones before it left undecided.
+        """
+        if not condition:
+            return np.ones(len(ls), dtype=bool)
+
+        if "operator" in condition:
+            return cls._operator_mask(ls, condition)
+
+        c_ord = condition["column_ord"]
+        rval = condition["value"]
+        comp = condition["comparator"]
+        if condition["negated"] == "TRUE":
+            comp = CONDITION_NEGATED[comp]
+
+        if c_ord == ROW_ID_COLUMN:
+            values = [rec.row_id for rec in ls]
+        else:
+            values = [rec.value(c_ord) for rec in ls]
+
+        if isinstance(rval, np.number):
+            try:
+                column = np.fromiter(values, type(rval), len(ls))
+            except (TypeError, ValueError):
+                pass
+            else:
+                return COMP_FUNCT[comp](column, rval)
+
+        comp_funct = COMP_FUNCT[comp]
+        return np.fromiter((lval is not None and comp_funct(lval, rval) for lval in values), bool, len(ls))
+
+    @classmethod
+    def _operator_mask(cls, ls: List[Record], condition: Dict) -> np.ndarray:
+        is_and = condition["operator"] == "AND"
+        # positions of the records no operand has decided yet
+        undecided = np.arange(len(ls))
+        mask = np.zeros(len(ls), dtype=bool)
+
+        for operand in condition["operands"]:
+            if not len(undecided):
+                break
+            matched = cls.filter_mask([ls[i] for i in undecided], operand)
+            if is_and:
+                undecided = undecided[matched]
+            else:
+                mask[undecided[matched]] = True
+                undecided = undecided[~matched]
 
-        return [cf_wrapper(rec.data_values) for rec in filter(filter_, ls)]
+        if is_and:
+            mask[undecided] = True
+        return mask
 
     @classmethod
     def filter_func(cls, condition: Dict):
@@ -207,17 +570,43 @@ class RouterCell:
         return b"".join((cp_byte_stream, row_id_byte_stream))
 
     @classmethod
-    def from_byte_stream(cls, byte_stream: bytes):
-        raw = io.BytesIO(byte_stream)
-        read_buff = io.BufferedRandom(raw)
+    def from_byte_stream(cls, byte_stream: bytes, offset: int = 0):
+        lc_page_num, row_id = ROUTER_CELL.unpack_from(byte_stream, offset)
+        return cls(row_id, lc_page_num)
 
-        cp_byte_stream = read_buff.read(4)
-        lc_page_num = big_endian_int(cp_byte_stream)
 
-        row_id_b = read_buff.read(4)
-        row_id = big_endian_int(row_id_b)
+@dataclass
+class IndexCell:
+    """
+    Index leaf cell, maps one column value to the row ids holding it.
+    [payload size: 2][type id: 1][value][num row ids: 2][row id: 4] * n
+    """
+    value: Any
+    data_type: DataType
+    row_ids: List[int]
 
-        return cls(row_id, lc_page_num)
+    def get_id(self):
+        return self.value
+
+    def to_byte_stream(self):
+        payload = b"".join([
+            self.data_type.get_id_bytes(self.value),
+            self.data_type.typed_value_to_bytes(self.value),
+            int_to_byte_stream(len(self.row_ids), 2),
+            b"".join(int_to_byte_stream(rid, 4) for rid in self.row_ids)
+        ])
+        return int_to_byte_stream(len(payload), 2) + payload
+
+    @classmethod
+    def from_byte_stream(cls, byte_stream: bytes, offset: int = 0):
+        _, type_id = INDEX_CELL_HEADER.unpack_from(byte_stream, offset)
+        d_type = TYPE_DECODERS[type_id][0]
+        value, pos = read_value(type_id, byte_stream, offset + INDEX_CELL_HEADER.size)
+
+        num_ids, = ROW_ID_COUNT.unpack_from(byte_stream, pos)
+        row_ids = list(struct.unpack_from(f">{num_ids}I", byte_stream, pos + ROW_ID_COUNT.size))
+
+        return cls(value, d_type, row_ids)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,200 @@
+"""
+Secondary index over one column of a table, a BTree keyed on column value
+whose entries carry the row ids holding that value. Saved in rio.db as a
+<table>.<column> blob, a run of index leaf pages in key order, so loading
+is a bulk build.
+"""
+from __future__ import annotations
+import io
+from itertools import groupby
+from operator import itemgetter
+from typing import Any, Iterable, List, Tuple
+import numpy as np
+
+from btree import BTree, DataPointer
+from file_abstractions import DataType, PageHeader, PageType
+from page_writer import IndexLeafPageWriter
+from record import IndexCell, CONDITION_NEGATED
+
+# bytes per page lost to the header, one cell offset, cell size and row id count
+_PAGE_OVERHEAD = 16 + 2 + 2 + 2 + 1
+
+
+def index_key(value: Any):
+    """
+    Index keys are python natives, numpy scalars compare far slower in the tree.
+    """
+    return value.item() if isinstance(value, np.generic) else value
+
+
+class Index:
+
+    def __init__(self, column_name: str, column_ord: int, data_type: DataType) -> None:
+        self.column_name = column_name
+        self.column_ord = column_ord
+        self.data_type = data_type
+        self.btree = BTree()
+        # changed since it was last written out
+        self.dirty = True
+
+    @classmethod
+    def build(cls, column_name: str, column_ord: int, data_type: DataType,
+              value_row_pairs: Iterable[Tuple[Any, int]]) -> Index:
+        """
+        Sort-based bulk build from (value, row_id) pairs in any order.
+        """
+        new_index = cls(column_name, column_ord, data_type)
+        pairs = sorted(
+            ((index_key(v), rid) for v, rid in value_row_pairs if v is not None),
+            key=itemgetter(0)
+        )
+
+        cells = [
+            IndexCell(value, data_type, [rid for _, rid in group])
+            for value, group in groupby(pairs, key=itemgetter(0))
+        ]
+
+        new_index._bulk_load_cells(cells)
+        return new_index
+
+    def _bulk_load_cells(self, cells: List[IndexCell]):
+        self.btree.bulk_load([DataPointer(IndexCell.get_id, cell) for cell in cells])
+
+    def insert(self, value: Any, row_id: int) -> None:
+        if value is None:
+            return
+
+        key = index_key(value)
+        node, idx = self.btree.search(key)
+        self.dirty = True
+
+        if idx is None:
+            self.btree.insert(DataPointer(IndexCell.get_id, IndexCell(key, self.data_type, [row_id])))
+        else:
+            node.keys[idx].data.row_ids.append(row_id)
+
+    def delete(self, value: Any, row_id: int) -> None:
+        if value is None:
+            return
+
+        key = index_key(value)
+        node, idx = self.btree.search(key)
+
+        if idx is None:
+            return
+
+        row_ids = node.keys[idx].data.row_ids
+        if row_id in row_ids:
+            row_ids.remove(row_id)
+            self.dirty = True
+
+        if not row_ids:
+            self.btree.delete(key)
+
+    def clear(self) -> None:
+        self.btree = BTree()
+        self.dirty = True
+
+    def lookup(self, value: Any) -> List[int]:
+        node, idx = self.btree.search(index_key(value))
+        return list(node.keys[idx].data.row_ids) if idx is not None else []
+
+    def row_ids_for(self, condition: dict) -> List[int]:
+        """
+        Row ids that can satisfy the condition, in key order.
+        Returns None for comparators the index can't serve (<>).
+        """
+        comp = condition["comparator"]
+        if condition["negated"] == "TRUE":
+            comp = CONDITION_NEGATED[comp]
+
+        value = index_key(condition["value"])
+
+        if comp == "=":
+            return self.lookup(value)
+        elif comp in {">", ">="}:
+            lo, hi = value, None
+        elif comp in {"<", "<="}:
+            lo, hi = None, value
+        else:
+            return None
+
+        row_ids = []
+        for entry in self.btree.iter_range(lo, hi):
+            if comp in {">", "<"} and entry == value:
+                continue
+            row_ids.extend(entry.data.row_ids)
+
+        return row_ids
+
+    def to_byte_stream(self, page_size: int = 512) -> bytes:
+        pages = []
+        cells, used = [], 16
+
+        for cell in self._page_sized_cells(page_size):
+            cell_size = 2 + len(cell.to_byte_stream())
+            if cells and used + cell_size > page_size:
+                pages.append(cells)
+                cells, used = [], 16
+            cells.append(cell)
+            used += cell_size
+
+        if cells or not pages:
+            pages.append(cells)
+
+        page_bytes = []
+        for pg_no, page_cells in enumerate(pages):
+            head = PageHeader(
+                PageType.index_leaf_page,
+                num_cells=0,
+                data_start=0,
+                right_relatve=pg_no + 1 if pg_no + 1 < len(pages) else 0,
+                parent=0xFFFFFFFF
+            )
+            writer = IndexLeafPageWriter(
+                page_number=pg_no,
+                header=head,
+                records=page_cells,
+                page_size=page_size
+            )
+            page_bytes.append(writer.to_byte_stream())
+
+        return b"".join(page_bytes)
+
+    @staticmethod
+    def max_value_size(page_size: int) -> int:
+        # longest TEXT an index cell (with a row id) fits a page with, past its 2 byte length
+        return page_size - _PAGE_OVERHEAD - 4 - 2
+
+    def _page_sized_cells(self, page_size: int):
+        # a value held by many rows is split over consecutive cells of the same key
+        for entry in self.btree.iter_range():
+            cell: IndexCell = entry.data
+            value_size = len(self.data_type.typed_value_to_bytes(cell.value))
+            per_cell = max(1, (page_size - _PAGE_OVERHEAD - value_size) // 4)
+
+            for i in range(0, len(cell.row_ids), per_cell):
+                yield IndexCell(cell.value, self.data_type, cell.row_ids[i:i + per_cell])
+
+    @classmethod
+    def from_byte_stream(cls, byte_stream: bytes, column_name: str, column_ord: int,
+                         data_type: DataType, page_size: int = 512) -> Index:
+        read_buff = io.BufferedRandom(io.BytesIO(byte_stream))
+        cells: List[IndexCell] = []
+        pg_no = 0
+
+        while page_n := read_buff.read(page_size):
+            page = IndexLeafPageWriter.from_byte_stream(page_n, pg_no)
+            for cell in page.records:
+                cell.value = index_key(cell.value)
+                if cells and cells[-1].value == cell.value:
+                    cells[-1].row_ids.extend(cell.row_ids)
+                else:
+                    cell.data_type = data_type
+                    cells.append(cell)
+            pg_no += 1
+
+        new_index = cls(column_name, column_ord, data_type)
+        new_index._bulk_load_cells(cells)
+        new_index.dirty = False
+        return new_index
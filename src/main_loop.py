@@ -1,15 +1,20 @@
 import os
+import re
 import traceback
 from typing import Dict
 
 import pandas as pd
 from table import Table
+from pager import BUFFER_POOL, PATCH_SEP, patch_members
+from database_file import DatabaseFile, KIND_BLOB, fsync_dir
+from wal import WAL
 from utils.utils import splash_screen, SEP_LINE, blockPrint, enablePrint
 from utils.settings import Settings
 from utils.help import help
 from utils.internal_queries import internal_parse_dict_cdata, internal_parse_dict_tdata, update_tdata_dict
 
-import query_parser as qp
+import fast_parser as fp
+import command_switcher
 from command_switcher import switch_and_delegate
 from utils.create_database import (create_riobase_columns, 
                                    create_riobase_tables, 
@@ -25,6 +30,14 @@ TBL_FILE_EXT = ".tbl"
 IDX_FILE_EXT = ".ndx"
 DATABASE_FOLDER = "rio.db"
 DATABASE_ARCHIVE = "rio.db.zip"
+WAL_FILE = f"{DATABASE_FOLDER}.wal"
+CONVERT_FILE = f"{DATABASE_FOLDER}.new"
+# lsn of the last checkpoint in zip archives
+CHECKPOINT_MEMBER = "checkpoint.lsn"
+# init db; or init db page size <bytes>; for a database of larger pages
+INIT_DB = re.compile(r"init db(?: page size (\d+))?;")
+
+database: DatabaseFile = None
 
 Settings.set_prompt("riodb> ")
 Settings.set_page_size(512)
@@ -37,6 +50,7 @@ def repl():
     in_memory_indices = {}
     
     load_db(in_memory_tables, in_memory_indices)
+    command_switcher.checkpoint_hook = checkpoint_if_due
 
     while not Settings.is_exit():
         print("\n")
@@ -69,13 +83,17 @@ def query_delegator(usr_input: str, tables: Dict, indices: Dict):
 
     if usr_input.lower() == "exit;":
         save_to_disk(tables, indices)
+        WAL.close()
+        open_database().close()
         Settings.set_exit(True)
         return
 
     elif usr_input.lower() == "clear;":
         os.system("clear")
 
-    elif usr_input.lower() == "init db;":
+    elif (init := INIT_DB.fullmatch(usr_input.lower())) is not None:
+        if init.group(1):
+            set_page_size(int(init.group(1)))
         create_database(tables, indices)
 
     elif usr_input.lower() == "save;":
@@ -84,9 +102,34 @@ def query_delegator(usr_input: str, tables: Dict, indices: Dict):
     elif usr_input.lower() == "help;":
         print(help())
 
+    elif usr_input.lower() == "show buffer pool;":
+        for stat, val in BUFFER_POOL.stats().items():
+            print(f"{stat}: {val}")
+
     else:
-        parse_dict = qp.statement.parse_string(usr_input)[0]
+        parse_dict = fp.parse(usr_input)
         switch_and_delegate(parse_dict, tables, indices)
+        checkpoint_if_due(tables, indices)
+
+
+def checkpoint_if_due(tables: Dict, indices: Dict):
+    """
+    Saves once the log is long enough or enough changed pages are held in memory.
+    """
+    if WAL.needs_checkpoint(open_database().dirty_pages):
+        save_to_disk(tables, indices)
+
+
+def set_page_size(page_size: int):
+    """
+    Page size of a database without tables yet, a power of two from 512 bytes
+    to 64 KiB. Larger pages suit tables that are mostly scanned and long values.
+    """
+    database = open_database()
+    if database.directory:
+        raise ValueError("rio.db already holds tables, its page size can't be changed.")
+    Settings.set_page_size(page_size)
+    database.set_page_size(page_size)
 
 
 def create_database(tables: Dict, indices: Dict):
@@ -95,6 +138,8 @@ def create_database(tables: Dict, indices: Dict):
     switch_and_delegate(create_riobase_columns, tables, indices)
     
     for entry in fill_riobase_tables:
+        # the page size the database is created with
+        entry["value_list"][2] = Settings.get_page_size()
         try:
             switch_and_delegate(entry, tables, indices)
         except:
@@ -110,114 +155,211 @@ def create_database(tables: Dict, indices: Dict):
 
 
 def save_to_disk(tables: Dict[str, Table], indices: Dict):
-    #TODO: repeat process for indices...
-
-    # create the archive file if it doesn't exist
-    # else make exisiting one as a backup.
-    create_db_archive()
-
-    # check if it is a valid zip file
-    is_zipfile(DATABASE_FOLDER)
+    """
+    Checkpoint, the changed pages are written to the database file along with
+    the lsn of the last logged statement they hold, then the write-ahead log is emptied.
+    """
 
-    # open database folder, save all tables as files.
-    with ZipFile(DATABASE_FOLDER, "a") as database:
+    # record counts go into the catalog first, it is saved like any other table,
+    # the checkpoint covers these so they aren't logged
+    with WAL.suspended():
         for k, tab in tables.items():
             if k not in {"riobase_tables", "riobase_columns"}:
-                fname = f"{k}.tbl"
-                rec_count = tab.record_count
-                parse_dict = update_tdata_dict(k, rec_count)
-                switch_and_delegate(parse_dict, tables, indices)
-                database.writestr(fname, tab.to_byte_stream())
-                
-        for k, tab in tables.items():
-            if k in {"riobase_tables", "riobase_columns"}:
-                fname = f"{k}.tbl"
-                rec_count = tab.record_count
-                parse_dict = update_tdata_dict(k, rec_count)
-                switch_and_delegate(parse_dict, tables, indices)
-                database.writestr(fname, tab.to_byte_stream())
+                switch_and_delegate(update_tdata_dict(k, tab.record_count), tables, indices)
 
+        for k in ["riobase_tables", "riobase_columns"]:
+            if k in tables:
+                switch_and_delegate(update_tdata_dict(k, tables[k].record_count), tables, indices)
 
-def create_db_archive():
+    database = open_database()
+
+    for k, tab in tables.items():
+        # tables created since the last save still have pages of their own
+        pager = tab.bptree.pager
+        if getattr(pager, "database", None) is not database:
+            tab.move_to(database, k)
+        tab.bptree.flush()
+
+    saved = {f"{k}.{col}": index for k, idx in indices.items() for col, index in idx.items()}
+
+    for name in database.names(KIND_BLOB):
+        if name not in saved:
+            database.remove(name)
+
+    for name, index in saved.items():
+        if index.dirty or name not in database.directory:
+            database.write_blob(name, index.to_byte_stream(database.page_size))
+            index.dirty = False
+
+    database.checkpoint(WAL.next_lsn - 1)
+
+    if WAL.is_open:
+        WAL.truncate()
+
+
+def open_database() -> DatabaseFile:
+    global database
+    if database is None:
+        database = DatabaseFile.open(DATABASE_FOLDER, Settings.get_page_size())
+        Settings.set_page_size(database.page_size)
+    return database
+
+
+def convert_zip_database(zip_path: str, out_path: str, page_size: int = 512):
+    """
+    One-shot copy of a zip archive rio.db (a <table>.tbl member per table, with
+    patches and <table>.<column>.ndx copies appended by later saves) into a
+    database file of the current format.
+    """
+    converted = DatabaseFile.open(out_path, page_size)
+    lsn = 0
+
+    with ZipFile(zip_path, "r") as archive:
+        for member in archive.namelist():
+            if PATCH_SEP in member:
+                continue
+
+            latest = ([member] + patch_members(archive, member))[-1]
+
+            if member.endswith(TBL_FILE_EXT):
+                blockPrint()
+                table = Table.from_zip_member(archive, member, page_size, update=False)
+                enablePrint()
+                table.move_to(converted, member[:-len(TBL_FILE_EXT)])
+                table.bptree.flush()
+                BUFFER_POOL.drop(table.bptree.pager)
+
+            elif member.endswith(IDX_FILE_EXT):
+                converted.write_blob(member[:-len(IDX_FILE_EXT)], archive.read(latest))
+
+            elif member == CHECKPOINT_MEMBER:
+                lsn = int.from_bytes(archive.read(latest), "big")
+
+    converted.checkpoint(lsn)
+    converted.close()
+
+
+def upgrade_database():
+    """
+    A zip archive rio.db is converted, and kept as rio.db.zip.
+    """
+    if os.path.exists(CONVERT_FILE):
+        # finished if the archive was already moved out of the way
+        if os.path.exists(DATABASE_FOLDER):
+            os.remove(CONVERT_FILE)
+        else:
+            os.replace(CONVERT_FILE, DATABASE_FOLDER)
 
-    if os.path.exists(DATABASE_FOLDER):
-        os.rename(DATABASE_FOLDER, f"{DATABASE_FOLDER}.bkp")
-        
-    x = ZipFile(DATABASE_FOLDER, "x")
-    x.close()
-    
-        
-def load_db(tables: Dict, indices: Dict):
-    
-    # check if it is a valid zip file
     if os.path.exists(DATABASE_FOLDER) and is_zipfile(DATABASE_FOLDER):
-        with ZipFile(DATABASE_FOLDER, "r") as database:
-            
-            table_of_tables_bytes = database.read("riobase_tables.tbl")
-            blockPrint()
-            table_of_tables = Table.from_byte_stream(table_of_tables_bytes, 512, 2, riobase_tables_cdata, "riobase_tables")
-            enablePrint()
-            tables["riobase_tables"] = table_of_tables
-            
-            table_of_columns_bytes = database.read("riobase_columns.tbl")
+        print("Converting rio.db to the paged file format...")
+        convert_zip_database(DATABASE_FOLDER, CONVERT_FILE, Settings.get_page_size())
+        os.replace(DATABASE_FOLDER, DATABASE_ARCHIVE)
+        os.replace(CONVERT_FILE, DATABASE_FOLDER)
+        fsync_dir(DATABASE_FOLDER)
+
+
+def replay_wal(tables: Dict, indices: Dict, lsn: int) -> int:
+    """
+    Runs the logged statements after the checkpoint lsn again, returns how many ran.
+    """
+    replayed = 0
+
+    with WAL.suspended():
+        for rec_lsn, parse_dict in WAL.read_records():
+            if rec_lsn <= lsn:
+                continue
             blockPrint()
-            table_of_columns = Table.from_byte_stream(table_of_columns_bytes, 512, 11, riobase_columns_cdata, "riobase_columns")
+            try:
+                switch_and_delegate(parse_dict, tables, indices)
+            except Exception as e:
+                enablePrint()
+                print(f"Log record {rec_lsn} failed to replay: {e}")
             enablePrint()
-            tables["riobase_columns"] = table_of_columns
-            
-            # get record cound of tot
-            pdict = qp.statement.parse_string("select record_count from riobase_tables where table_name = 'riobase_tables';")[0]
-            pdict["ret_mode"] = True
-            table_rec_count = switch_and_delegate(pdict, tables, indices)
-            
-            pdict = qp.statement.parse_string("select record_count from riobase_tables where table_name = 'riobase_columns';")[0]
-            pdict["ret_mode"] = True
-            col_rec_count = switch_and_delegate(pdict, tables, indices)
-            
-            tables["riobase_tables"].record_count = table_rec_count[-1][-1]
-            tables["riobase_columns"].record_count = col_rec_count[-1][-1]
-            
-            
-            #get all table names
-            pdict = qp.statement.parse_string("show tables;")[0]
-            pdict["ret_mode"] = True
-            table_names = switch_and_delegate(pdict, tables, indices)
-            for tname_l in table_names:
-                tname = tname_l[-1]
-                if tname not in tables:
-                    tname = tname.lower()
-        
-                    cdata = internal_parse_dict_cdata(tname)
-                    cdata["ret_mode"] = True
-                    cdata_list = switch_and_delegate(cdata, tables, indices)            
-                    cdata_list.sort(key=lambda x: x[2])
-                    
-                    column_data_init = {
-                        "column_names": [rec[0] for rec in cdata_list],
-                        "data_types": [rec[1] for rec in cdata_list],
-                        "nullability": [rec[3] for rec in cdata_list],
-                        "column_keys": [rec[4] for rec in cdata_list]
-                    }
-                    
-                    tdata = internal_parse_dict_tdata(tname)
-                    tdata["ret_mode"] = True
-                    output = switch_and_delegate(tdata, tables, indices)
-                    
-                    pg_size = 512
-                    rec_count = 0
-                    
-                    if output:
-                        pg_size, rec_count = output[0]
-                    
-                    tbytes = database.read(f"{tname}.tbl")
-                    blockPrint()
-                    new_table = Table.from_byte_stream(tbytes, pg_size, rec_count, column_data_init)
-                    enablePrint()        
-                    tables[tname] = new_table
-        
-    
-    
-     
+            replayed += 1
+
+    return replayed
+
+
+def load_db(tables: Dict, indices: Dict):
+
+    upgrade_database()
+    database = open_database()
+
+    if "riobase_tables" in database.directory:
+
+        blockPrint()
+        table_of_tables = Table.from_database_file(database, "riobase_tables", 2, riobase_tables_cdata, "riobase_tables")
+        enablePrint()
+        tables["riobase_tables"] = table_of_tables
+
+        blockPrint()
+        table_of_columns = Table.from_database_file(database, "riobase_columns", 11, riobase_columns_cdata, "riobase_columns")
+        enablePrint()
+        tables["riobase_columns"] = table_of_columns
+
+        # get record cound of tot
+        pdict = fp.parse("select record_count from riobase_tables where table_name = 'riobase_tables';")
+        pdict["ret_mode"] = True
+        table_rec_count = switch_and_delegate(pdict, tables, indices)
+
+        pdict = fp.parse("select record_count from riobase_tables where table_name = 'riobase_columns';")
+        pdict["ret_mode"] = True
+        col_rec_count = switch_and_delegate(pdict, tables, indices)
+
+        tables["riobase_tables"].record_count = table_rec_count[-1][-1]
+        tables["riobase_columns"].record_count = col_rec_count[-1][-1]
+
+
+        #get all table names
+        pdict = fp.parse("show tables;")
+        pdict["ret_mode"] = True
+        table_names = switch_and_delegate(pdict, tables, indices)
+        for tname_l in table_names:
+            tname = tname_l[-1]
+            if tname not in tables:
+                tname = tname.lower()
+
+                cdata = internal_parse_dict_cdata(tname)
+                cdata["ret_mode"] = True
+                cdata_list = switch_and_delegate(cdata, tables, indices)
+                cdata_list.sort(key=lambda x: x[2])
+
+                column_data_init = {
+                    "column_names": [rec[0] for rec in cdata_list],
+                    "data_types": [rec[1] for rec in cdata_list],
+                    "nullability": [rec[3] for rec in cdata_list],
+                    "column_keys": [rec[4] for rec in cdata_list]
+                }
+
+                tdata = internal_parse_dict_tdata(tname)
+                tdata["ret_mode"] = True
+                output = switch_and_delegate(tdata, tables, indices)
+
+                rec_count = 0
+
+                if output:
+                    _, rec_count = output[0]
+
+                blockPrint()
+                new_table = Table.from_database_file(database, tname, rec_count, column_data_init)
+                enablePrint()
+                tables[tname] = new_table
+
+        # indices are stored as <table>.<column> blobs
+        for name in database.names(KIND_BLOB):
+            tname, cname = name.split(".", 1)
+            if tname in tables:
+                tables[tname].load_index(cname, database.read_blob(name))
+                indices[tname] = tables[tname].indexes
+
+    # statements since the last checkpoint are run again, and checkpointed
+    WAL.open(WAL_FILE)
+    WAL.next_lsn = database.checkpoint_lsn + 1
+
+    if replayed := replay_wal(tables, indices, database.checkpoint_lsn):
+        print(f"Recovered {replayed} statements from the write-ahead log.")
+        save_to_disk(tables, indices)
+
 
 if __name__ == "__main__":
     repl()
\ No newline at end of file
@@ -0,0 +1,343 @@
+"""
+Page level storage for the B+ trees.
+
+A Pager hands out the fixed-size pages of one table by page number (tables
+in rio.db get theirs from a database_file.FilePager instead), the BufferPool
+keeps a bounded set of decoded pages (BPlusNodes) in memory, fetching on a
+miss and evicting the least recently used page, writing it back through its
+pager first if it was modified.
+"""
+from __future__ import annotations
+import io
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Tuple
+from zipfile import ZipFile, ZIP_STORED
+
+from utils.settings import Settings
+
+# local file header: fixed part, then file name and extra field
+_ZIP_LOCAL_HEADER_LEN = 30
+# <member>~<n> holds pages of <member> written by the n-th incremental save
+PATCH_SEP = "~"
+
+
+def zip_member_region(database: ZipFile, member: str) -> Tuple[int, int]:
+    """
+    (offset, size) of a member's bytes within the archive file, or None if
+    the member is compressed and can't be read in place.
+    """
+    info = database.getinfo(member)
+    if info.compress_type != ZIP_STORED:
+        return None
+
+    with open(database.filename, "rb") as archive:
+        archive.seek(info.header_offset)
+        local_header = archive.read(_ZIP_LOCAL_HEADER_LEN)
+
+    name_len = int.from_bytes(local_header[26:28], "little")
+    extra_len = int.from_bytes(local_header[28:30], "little")
+
+    return info.header_offset + _ZIP_LOCAL_HEADER_LEN + name_len + extra_len, info.file_size
+
+
+def patch_members(database: ZipFile, member: str) -> List[str]:
+    prefix = member + PATCH_SEP
+    patches = [name for name in database.namelist() if name.startswith(prefix)]
+    return sorted(patches, key=lambda name: int(name[len(prefix):]))
+
+
+class Pager:
+    """
+    Pages of one table on their own, the root is page 0. Clean pages are read
+    from a region of a file (or a byte string), pages written since are held here.
+
+    Zip archives from before rio.db was a single paged file hold a table as a
+    member with all its pages, followed by patch members holding only the pages
+    changed by each later save: [page count 4] then [page_no 4][page] per page.
+    The newest copy of a page wins.
+
+    codec translates between page bytes and nodes, decode(page_bytes, page_no, pager)
+    and encode(node, page_size, pager), through the pager it may read and write
+    pages of its own (overflow chains). Pagers without one hold their nodes
+    directly and are never paged out.
+    """
+
+    root_page = 0
+
+    def __init__(self, page_size: int = 512, codec=None) -> None:
+        self.page_size = page_size
+        self.codec = codec
+        self.page_count = 0
+        self.free_pages: List[int] = []
+        # only used without a codec
+        self.nodes: Dict[int, object] = {}
+
+        self._file = None
+        self._base_offset = 0
+        self._file_pages = 0
+        self._written: Dict[int, bytes] = {}
+
+        # zip member the pages were attached from, and page_no -> offset of patched pages
+        self.member: str = None
+        self._archive = None
+        self._patches: Dict[int, int] = {}
+
+    @classmethod
+    def from_bytes(cls, byte_stream: bytes, page_size: int = 512, codec=None) -> Pager:
+        pager = cls(page_size, codec)
+        pager._attach(io.BytesIO(byte_stream), 0, len(byte_stream) // page_size)
+        return pager
+
+    @classmethod
+    def from_zip_member(cls, database: ZipFile, member: str, page_size: int = 512, codec=None) -> Pager:
+        pager = cls(page_size, codec)
+        pager.attach_zip_member(database, member)
+        return pager
+
+    def attach_zip_member(self, database: ZipFile, member: str):
+        """
+        Points the pager at the member's pages and their patches, any pages
+        held for writing must already be saved there.
+        """
+        archive = open(database.filename, "rb")
+
+        if (region := zip_member_region(database, member)) is not None:
+            offset, size = region
+            self._attach(archive, offset, size // self.page_size)
+        else:
+            self._attach(io.BytesIO(database.read(member)), 0, database.getinfo(member).file_size // self.page_size)
+            self._archive = archive
+
+        self.member = member
+        entry_len = 4 + self.page_size
+
+        for name in patch_members(database, member):
+            if (region := zip_member_region(database, name)) is None:
+                raise ValueError(f"Page patch {name} is compressed.")
+
+            offset, size = region
+            archive.seek(offset)
+            self.page_count = max(self.page_count, int.from_bytes(archive.read(4), "big"))
+
+            for entry in range(offset + 4, offset + size, entry_len):
+                archive.seek(entry)
+                self._patches[int.from_bytes(archive.read(4), "big")] = entry + 4
+
+    def _attach(self, file_obj, base_offset: int, n_pages: int):
+        self.close()
+        self._file = file_obj
+        self._base_offset = base_offset
+        self._file_pages = n_pages
+        self._written.clear()
+        self.page_count = max(self.page_count, n_pages)
+
+    @property
+    def has_pages(self) -> bool:
+        return self.page_count > 0
+
+    def read_page(self, page_no: int) -> bytes:
+        if page_no in self._written:
+            return self._written[page_no]
+
+        if page_no in self._patches:
+            archive = self._archive or self._file
+            archive.seek(self._patches[page_no])
+            return archive.read(self.page_size)
+
+        if page_no < self._file_pages:
+            self._file.seek(self._base_offset + page_no * self.page_size)
+            return self._file.read(self.page_size)
+
+        raise KeyError(f"Page {page_no} has never been written.")
+
+    def write_page(self, page_no: int, page_bytes: bytes):
+        self._written[page_no] = page_bytes
+
+    def allocate_page(self) -> int:
+        if self.free_pages:
+            return self.free_pages.pop()
+
+        self.page_count += 1
+        return self.page_count - 1
+
+    def free_page(self, page_no: int):
+        self.nodes.pop(page_no, None)
+        self.free_pages.append(page_no)
+        if self.codec is not None:
+            self.write_page(page_no, bytes(self.page_size))
+
+    def reset(self, stale_pages: List[int] = ()):
+        """
+        Drops every page, stale ones included, only the root page stays allocated.
+        """
+        self.page_count = 1
+        self.free_pages = []
+        self.nodes = {}
+        self._file_pages = 0
+        self._written.clear()
+        self._patches.clear()
+        self.member = None
+
+    def drop(self, pages: List[int] = ()):
+        self.reset()
+        self.close()
+
+    def iter_pages(self) -> Iterator[bytes]:
+        for page_no in range(self.page_count):
+            yield self.read_page(page_no)
+
+    def close(self):
+        for file_obj in [self._file, self._archive]:
+            if file_obj is not None:
+                file_obj.close()
+        self._file = self._archive = None
+        self._patches = {}
+
+
+class BufferPool:
+    """
+    LRU cache of decoded pages shared by all trees, keyed by (pager, page_no).
+    Frames fetched inside hold() are pinned until the outermost hold exits,
+    so tree operations never see a node they are changing paged out under them.
+    """
+
+    def __init__(self, capacity: int = None) -> None:
+        # None -> Settings.get_buffer_pool_pages()
+        self._capacity = capacity
+        self.frames: OrderedDict[Tuple[Pager, int], object] = OrderedDict()
+        self.dirty = set()
+
+        self._hold_depth = 0
+        self._held = set()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.write_backs = 0
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity if self._capacity is not None else Settings.get_buffer_pool_pages()
+
+    @capacity.setter
+    def capacity(self, val: int):
+        self._capacity = val
+        self._evict()
+
+    def fetch(self, pager: Pager, page_no: int):
+        if pager.codec is None:
+            return pager.nodes[page_no]
+
+        key = (pager, page_no)
+
+        if (node := self.frames.get(key)) is not None:
+            self.hits += 1
+            self.frames.move_to_end(key)
+        else:
+            self.misses += 1
+            node = pager.codec.decode(pager.read_page(page_no), page_no, pager)
+            self.frames[key] = node
+
+        if self._hold_depth:
+            self._held.add(key)
+        else:
+            self._evict()
+
+        return node
+
+    def add(self, pager: Pager, node):
+        """
+        Registers a node for a newly allocated page, it is dirty until written back.
+        """
+        if pager.codec is None:
+            pager.nodes[node.page_no] = node
+            return
+
+        key = (pager, node.page_no)
+        self.frames[key] = node
+        self.frames.move_to_end(key)
+        self.dirty.add(key)
+
+        if self._hold_depth:
+            self._held.add(key)
+        else:
+            self._evict()
+
+    def mark_dirty(self, pager: Pager, node):
+        if pager.codec is None:
+            return
+
+        key = (pager, node.page_no)
+        if key not in self.frames:
+            self.add(pager, node)
+        else:
+            self.dirty.add(key)
+
+    def discard(self, pager: Pager, page_no: int):
+        key = (pager, page_no)
+        self.frames.pop(key, None)
+        self.dirty.discard(key)
+        self._held.discard(key)
+
+    def drop(self, pager: Pager):
+        """
+        Forgets every frame of the pager without writing anything back.
+        """
+        for key in [key for key in self.frames if key[0] is pager]:
+            self.discard(*key)
+
+    def flush(self, pager: Pager = None):
+        """
+        Writes back the dirty frames (of one pager, or all), they stay cached.
+        """
+        for key in [key for key in self.dirty if pager is None or key[0] is pager]:
+            self._write_back(key)
+
+    def _write_back(self, key):
+        pager, page_no = key
+        pager.write_page(page_no, pager.codec.encode(self.frames[key], pager.page_size, pager))
+        self.dirty.discard(key)
+        self.write_backs += 1
+
+    def _evict(self):
+        if self._hold_depth:
+            return
+
+        capacity = self.capacity
+        while len(self.frames) > capacity:
+            key = next(iter(self.frames))
+            if key in self.dirty:
+                self._write_back(key)
+            del self.frames[key]
+            self.evictions += 1
+
+    @contextmanager
+    def hold(self):
+        self._hold_depth += 1
+        try:
+            yield self
+        finally:
+            self._hold_depth -= 1
+            if not self._hold_depth:
+                self._held.clear()
+                self._evict()
+
+    def reset_stats(self):
+        self.hits = self.misses = self.evictions = self.write_backs = 0
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "capacity": self.capacity,
+            "resident": len(self.frames),
+            "dirty": len(self.dirty),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "write_backs": self.write_backs,
+        }
+
+
+BUFFER_POOL = BufferPool()
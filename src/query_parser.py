@@ -2,17 +2,20 @@ import json
 from pyparsing import (
     CaselessKeyword,
     CaselessLiteral,
+    Forward,
     Group,
     Literal,
     Opt,
     Regex,
     Suppress,
     Word,
+    ZeroOrMore,
     alphanums,
     alphas,
     delimited_list,
     one_of,
     quoted_string,
+    remove_quotes,
 )
 
 RE_RUN_TESTS = False
@@ -68,6 +71,56 @@ def table_creation_semantics(parse_list):
         "column_list": columns_list
     } 
 
+def select_semantics(plist):
+
+    cmd, distinct, columns, t_name, condition, row_range, outfile = plist[0:7]
+
+    x = columns.as_list()
+    aggregates = [col for col in x if isinstance(col, dict)]
+
+    select_dict = {
+        "command": cmd,
+        "column_name_list": [] if "*" in x or aggregates else x,
+        "table_name": t_name,
+        "condition": condition
+    }
+
+    # only present when given, so plain selects parse as before
+    if aggregates:
+        select_dict["aggregate_list"] = aggregates
+    if distinct:
+        select_dict["distinct"] = True
+    select_dict.update(row_range)
+    select_dict.update(outfile)
+
+    return select_dict
+
+def negate_condition(condition):
+    # NOT pushed down to the predicates, AND and OR swap places
+    if "operator" in condition:
+        return {
+            "operator": "OR" if condition["operator"] == "AND" else "AND",
+            "operands": [negate_condition(operand) for operand in condition["operands"]]
+        }
+
+    return dict(condition, negated="FALSE" if condition["negated"] == "TRUE" else "TRUE")
+
+def condition_semantics(operator):
+    # a lone operand as it is, nested operands of the same operator flattened
+    def semantics(plist):
+        if len(plist) == 1:
+            return plist[0]
+
+        operands = []
+        for operand in plist:
+            if operand.get("operator") == operator:
+                operands.extend(operand["operands"])
+            else:
+                operands.append(operand)
+        return {"operator": operator, "operands": operands}
+
+    return semantics
+
 ###################################################
 ################ Special Characters ###############
 ###################################################
@@ -82,6 +135,11 @@ VERBS = ["select", "create", "drop", "show", "insert", "delete", "update", "set"
 ADJECTIVES = ["not", "unique", "primary", "key"]
 NOUNS = ["tables", "table", "index", "values"]
 PREPOSITIONS = ["from", "into", "where"]
+MODIFIERS = ["distinct", "limit", "offset"]
+CONJUNCTIONS = ["and", "or"]
+PREPARED = ["prepare", "execute", "using"]
+BULK = ["copy", "with", "header"]
+EXPORT = ["outfile", "format", "csv", "json"]
 
 
 SELECT, CREATE, DROP, SHOW, INSERT, DELETE = split_mapper_ck("SELECT, CREATE, DROP, SHOW, INSERT, DELETE")
@@ -89,6 +147,14 @@ UPDATE, NOT, UNIQUE, PRIMARY, KEY, TABLES = split_mapper_ck("UPDATE, NOT, UNIQUE
 TABLE, INDEX, VALUES, FROM, INTO, WHERE, SET = split_mapper_ck("TABLE, INDEX, VALUES, FROM, INTO, WHERE, SET")
 NULL, TINYINT, SMALLINT, INT, BIGINT, LONG = split_mapper_ck("NULL, TINYINT, SMALLINT, INT, BIGINT, LONG")
 FLOAT, DOUBLE, YEAR, TIME, DATETIME, DATE, TEXT = split_mapper_ck("FLOAT, DOUBLE, YEAR, TIME, DATETIME, DATE, TEXT")
+DISTINCT, LIMIT, OFFSET = split_mapper_ck("DISTINCT, LIMIT, OFFSET")
+AND, OR = split_mapper_ck("AND, OR")
+# not keywords either, they only ever start a statement or follow its name
+PREPARE, EXECUTE, USING = split_mapper_ck("PREPARE, EXECUTE, USING")
+COPY, WITH, HEADER = split_mapper_ck("COPY, WITH, HEADER")
+OUTFILE, FORMAT, CSV, JSON = split_mapper_ck("OUTFILE, FORMAT, CSV, JSON")
+# not keywords, a column may still be called count, the parenthesis tells them apart
+COUNT, SUM, MIN, MAX, AVG = split_mapper_ck("COUNT, SUM, MIN, MAX, AVG")
 
 # Keywords
 data_type = (NULL | TINYINT | SMALLINT | INT | BIGINT | LONG | FLOAT | DOUBLE | YEAR
@@ -97,7 +163,8 @@ data_type = (NULL | TINYINT | SMALLINT | INT | BIGINT | LONG | FLOAT | DOUBLE |
 data_type.set_name("data type")
 
 keyword = (SELECT | CREATE | DROP | SHOW | INSERT | DELETE | UPDATE | NOT | UNIQUE | PRIMARY 
-            | KEY | TABLES | TABLE | INDEX | VALUES | FROM | INTO | WHERE | SET | data_type)
+            | KEY | TABLES | TABLE | INDEX | VALUES | FROM | INTO | WHERE | SET | DISTINCT
+            | LIMIT | OFFSET | AND | OR | data_type)
 
 keyword.set_name("keyword")
 
@@ -196,10 +263,16 @@ string_literal.set_name("string")
 # Null is an empty string <- should take no memory in record body
 NULL.set_parse_action(lambda: "")
 
+# ? stands for a value given when a prepared statement is executed
+PARAMETER = "parameter"
+parameter = Literal("?").set_parse_action(lambda: {PARAMETER: "?"})
+parameter.set_name("parameter")
+
 literal_value = (
     numeric_literal
     | string_literal
     | NULL
+    | parameter
 )
 
 literal_value.set_name("value literal")
@@ -210,7 +283,11 @@ literal_value.set_name("value literal")
 
 #INSERT INTO TABLE (column_list) table_name VALUES (value1,value2,value3, ...);
 
-value_list = Suppress(VALUES) + LPAREN + delimited_list(literal_value) + RPAREN
+value_tuple = Group(LPAREN + delimited_list(literal_value) + RPAREN)
+value_tuple.set_name("parenthesized column values")
+
+# VALUES (value1, value2, ...)[, (value1, value2, ...), ...]
+value_list = Suppress(VALUES) + delimited_list(value_tuple)
 value_list.set_name("list of column values")
 
 column_list = LPAREN + delimited_list(identifier) + RPAREN
@@ -222,12 +299,24 @@ insert_row_stmt = (Group(INSERT + INTO + TABLE).set_parse_action(lambda ls: " ".
                    + value_list.set_parse_action(lambda x: [x])
                    + STMT_TERMINATOR)
 
-insert_row_stmt.set_parse_action(lambda plist: {
-    "command": plist[0],
-    "column_name_list": plist[1].as_list(),
-    "table_name": plist[2],
-    "value_list": plist[3].as_list()
-})
+def insertion_semantics(plist):
+    rows = plist[3].as_list()
+
+    insert_dict = {
+        "command": plist[0],
+        "column_name_list": plist[1].as_list(),
+        "table_name": plist[2]
+    }
+
+    # one row as before, several as a list of them
+    if len(rows) == 1:
+        insert_dict["value_list"] = rows[0]
+    else:
+        insert_dict["value_lists"] = rows
+
+    return insert_dict
+
+insert_row_stmt.set_parse_action(insertion_semantics)
 
 #---------------- DELETE RECORD ------------------#
 
@@ -248,7 +337,21 @@ predicate.set_parse_action(lambda plist: {
     "value": plist[3]
 })
 
-where_clause = Suppress(WHERE) + predicate
+# predicates joined by AND and OR, AND binding tighter, in parentheses as needed:
+# a lone predicate is its dict as before, otherwise {"operator": "AND", "operands": [...]}
+condition = Forward()
+
+condition_group = (Opt(NOT).set_parse_action(lambda x: bool(x)) + LPAREN + condition + RPAREN)
+condition_group.set_parse_action(lambda plist: negate_condition(plist[1]) if plist[0] else plist[1])
+
+conjunction = (predicate | condition_group) + ZeroOrMore(Suppress(AND) + (predicate | condition_group))
+conjunction.set_parse_action(condition_semantics("AND"))
+
+condition <<= conjunction + ZeroOrMore(Suppress(OR) + conjunction)
+condition.set_parse_action(condition_semantics("OR"))
+condition.set_name("condition")
+
+where_clause = Suppress(WHERE) + condition
 
 # DELETE FROM TABLE table_name [WHERE condition];
 delete_record_stmt = (DELETE + Suppress(FROM + TABLE) 
@@ -288,22 +391,92 @@ update_record_stmt.set_parse_action(lambda plist: {
 
 #---------------- SIMPLE SELECT ------------------#
 
+# COUNT(*), SUM(column) ...
+aggregate = (COUNT | SUM | MIN | MAX | AVG) + LPAREN + (Literal("*") | identifier) + RPAREN
+aggregate.set_name("aggregate function")
+
+aggregate.set_parse_action(lambda plist: {
+    "function": plist[0],
+    "column_name": plist[1]
+})
+
 select_clause = (SELECT 
-                + Group(Literal("*") | delimited_list(identifier))
+                + Opt(DISTINCT).set_parse_action(lambda x: bool(x))
+                + Group(Literal("*") | delimited_list(aggregate) | delimited_list(identifier))
                 )
 
+row_count = Regex(r"\d+").set_parse_action(lambda toks: int(toks[0]))
+row_count.set_name("row count")
+
+# LIMIT n [OFFSET m]
+limit_clause = Suppress(LIMIT) + row_count + Opt(Suppress(OFFSET) + row_count)
+
+limit_clause.set_parse_action(lambda plist: {
+    "limit": plist[0],
+    "offset": plist[1] if len(plist) > 1 else 0
+})
+
+file_path = quoted_string.copy().set_parse_action(remove_quotes)
+file_path.set_name("quoted file path")
+
+# INTO OUTFILE "file" [FORMAT CSV | JSON]
+outfile_clause = Suppress(INTO + OUTFILE) + file_path + Opt(Suppress(FORMAT) + (CSV | JSON), default="CSV")
+
+outfile_clause.set_parse_action(lambda plist: {
+    "outfile": plist[0],
+    "outfile_format": plist[1]
+})
 
 select_statement = (select_clause 
                     + Suppress(FROM)
                     + identifier
                     + Opt(where_clause).set_parse_action(lambda plist: plist or {})
+                    + Opt(limit_clause).set_parse_action(lambda plist: plist or {})
+                    + Opt(outfile_clause).set_parse_action(lambda plist: plist or {})
                     + STMT_TERMINATOR)
 
-select_statement.set_parse_action(lambda plist: {
+select_statement.set_parse_action(select_semantics)
+
+#---------------- PREPARED STATEMENTS ------------------#
+# PREPARE name FROM "statement with ? in place of values";
+# EXECUTE name USING value1, value2, ...;
+
+statement_text = quoted_string.copy().set_parse_action(remove_quotes)
+statement_text.set_name("quoted statement")
+
+prepare_stmt = PREPARE + identifier + Suppress(FROM) + statement_text + STMT_TERMINATOR
+
+prepare_stmt.set_parse_action(lambda plist: {
     "command": plist[0],
-    "column_name_list": [] if "*" in (x := plist[1].as_list()) else x,
-    "table_name": plist[2],
-    "condition": plist[3]
+    "statement_name": plist[1],
+    "statement": plist[2]
+})
+
+execute_stmt = (EXECUTE + identifier
+                + Opt(Suppress(USING) + delimited_list(literal_value)).set_parse_action(lambda x: [x])
+                + STMT_TERMINATOR)
+
+execute_stmt.set_parse_action(lambda plist: {
+    "command": plist[0],
+    "statement_name": plist[1],
+    "parameter_list": plist[2].as_list()
+})
+
+#---------------- BULK LOAD ------------------#
+# COPY table_name [(column_list)] FROM "file.csv" [WITH HEADER];
+
+copy_stmt = (COPY + identifier
+             + Opt(column_list).set_parse_action(lambda x: [x])
+             + Suppress(FROM) + file_path
+             + Opt(WITH + HEADER).set_parse_action(lambda x: bool(x))
+             + STMT_TERMINATOR)
+
+copy_stmt.set_parse_action(lambda plist: {
+    "command": plist[0],
+    "table_name": plist[1],
+    "column_name_list": plist[2].as_list(),
+    "file_path": plist[3],
+    "header": plist[4]
 })
 
 ###########################################################
@@ -315,7 +488,9 @@ show_table_stmt.set_parse_action(
 )
 
 statement = (create_table_stmt | drop_table_stmt | create_index_stmt | insert_row_stmt
-             | delete_record_stmt | update_record_stmt | select_statement | show_table_stmt)
+             | delete_record_stmt | update_record_stmt | select_statement | show_table_stmt
+             | prepare_stmt | execute_stmt | copy_stmt)
+
 
 
 ###########################################################
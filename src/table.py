@@ -1,36 +1,52 @@
 from __future__ import annotations
+import csv
 import datetime as dt
-import io
 import traceback
-from typing import Any, Dict, List
+from itertools import compress, islice
+from operator import itemgetter
+from typing import Any, Dict, Iterator, List, Tuple
+from zipfile import ZipFile
 import numpy as np
-import math
+import struct
 
 from bplus_tree import BPlusNode, BPlusTree
-from file_abstractions import Record, DataType
+from file_abstractions import Record, RecordCodec, DataType, CONDITION_NEGATED, RECORD_HEADER, ROW_ID_COLUMN
 from btree import DataPointer
-from header import PageHeader, big_endian_int
-from page_writer import LeafPageWriter, InternalPageWriter
-from enums import PageType
-from record import RouterCell
+from index import Index, index_key
+from pager import Pager
+from database_file import DatabaseFile
+from page_writer import TablePageCodec, max_local_cell, tree_degree
+from enums import MAX_TEXT_BYTES, PageType
+from utils.settings import Settings
 
 COL_DATA_KEYS = {"column_names", "data_types", "nullability", "column_keys"}
+AGGREGATE_FUNCTIONS = {"COUNT", "SUM", "MIN", "MAX", "AVG"}
+# whether a column with all its values within [lo, hi] can have one the comparison holds for
+ZONE_TESTS = {
+    "=": lambda lo, hi, val: lo <= val <= hi,
+    "<>": lambda lo, hi, val: not lo == hi == val,
+    "<": lambda lo, hi, val: lo < val,
+    "<=": lambda lo, hi, val: lo <= val,
+    ">": lambda lo, hi, val: hi > val,
+    ">=": lambda lo, hi, val: hi >= val
+}
+# an index serves part of a condition only when it's expected to match at most this fraction of rows
+INDEX_SELECTIVITY = 0.2
 class Table:
 
-    def __init__(self, page_size = 512) -> None:
+    def __init__(self, page_size = 512, pager: Pager = None) -> None:
         """
-        16 byte page header; 496 bytes left
-        6 * (2 + max_rec_size) = 496
-        max_rec_size = floor(496 / 6) - 2
+        Records as long as the 2 byte payload size allows, what doesn't fit on
+        a leaf goes to overflow pages (page_writer.max_local_cell). The tree's
+        degree grows with the page size, see page_writer.tree_degree.
         """
-    
-        page_space = page_size - 16
-        self.max_rec_size = math.floor(page_space/6) - 2
+        self.max_rec_size = RECORD_HEADER.size - 1 + 0xFFFF
 
         print(f"\n\nFor a page size of {page_size} bytes, the max"
-              f" allowed record size is {self.max_rec_size} bytes.\n\n")
+              f" allowed record size is {self.max_rec_size} bytes, records over"
+              f" {max_local_cell(page_size)} bytes continue on overflow pages.\n\n")
 
-        self.bptree = BPlusTree()
+        self.bptree = BPlusTree(tree_degree(page_size), pager=pager or Pager(page_size, TablePageCodec()))
         self.column_data = {
             "column_names": [],
             "data_types": [],
@@ -41,6 +57,9 @@ class Table:
         self.page_size = page_size
         self.name = ""
         self.recently_deleted = set()
+        self.indexes: Dict[str, Index] = {}
+        # column ord -> {value: row_id} for every UNI/PRI column, built on first use
+        self.unique_values: Dict[int, Dict[Any, int]] = None
 
     @classmethod
     def create_table(cls, create_op: Dict, page_size=512) -> Table:
@@ -83,6 +102,11 @@ class Table:
 
         return new_table
 
+    @property
+    def schema(self) -> RecordCodec:
+        # the column types every record of the table refers to
+        return self.bptree.pager.codec.records
+
     def update_metadata(self, column_data: Dict, record_count: int, name: str):
         # TODO: set up methods for retrieving info
         if COL_DATA_KEYS.difference(set(column_data.keys())) == set():
@@ -91,6 +115,10 @@ class Table:
                 column_data["data_types"] = list(map(DataType.from_type_name, column_data["data_types"])) 
             self.record_count = record_count
             self.name = name
+            self.unique_values = None
+            # pages are decoded by the codec of the schema from now on
+            self.bptree.pager.codec = TablePageCodec(column_data["data_types"])
+            self._use_zone_maps()
 
         else:
             print("Missing column data, update failed.")
@@ -104,38 +132,42 @@ class Table:
     def from_byte_stream(cls, byte_stream: bytes, 
                          page_size: int = 512, rec_count: int = 0, 
                          cdata: Dict = {}, name: str = "", update = True) -> Table:
-        """
-        currently -> simple implementation: insert one at a time
-        TODO: future -> better implementation: bulk load OR use file page nos.
-        """
-        raw = io.BytesIO(byte_stream)
-        read_buff = io.BufferedRandom(raw)
-
-        #nodes = []
-        page_n = read_buff.read(page_size)
-        pg_no = 0
-        dps: List[DataPointer] = []
+        return cls.open(
+            Pager.from_bytes(byte_stream, page_size, TablePageCodec()),
+            page_size, rec_count, cdata, name, update
+        )
 
-        while page_n:
-            pg_type = big_endian_int(page_n[:1])
+    @classmethod
+    def from_zip_member(cls, database: ZipFile, member: str, 
+                        page_size: int = 512, rec_count: int = 0, 
+                        cdata: Dict = {}, name: str = "", update = True) -> Table:
+        return cls.open(
+            Pager.from_zip_member(database, member, page_size, TablePageCodec()),
+            page_size, rec_count, cdata, name, update
+        )
 
-            if pg_type == 13:
-                node = LeafPageWriter.from_byte_stream(page_n, pg_no)
-                leaf = node.to_bpnode()
-                dps.extend(leaf.keys)
-            else:
-                #node = InternalPageWriter.from_byte_stream(page_n, pg_no)
-                pass
+    @classmethod
+    def from_database_file(cls, database: DatabaseFile, table_name: str,
+                           rec_count: int = 0, cdata: Dict = {},
+                           name: str = "", update = True) -> Table:
+        return cls.open(
+            database.pager(table_name, TablePageCodec()),
+            database.page_size, rec_count, cdata, name, update
+        )
 
-            #nodes.append(node)
-            pg_no+=1
-            page_n = read_buff.read(512)
+    @classmethod
+    def open(cls, pager: Pager, 
+             page_size: int = 512, rec_count: int = 0, 
+             cdata: Dict = {}, name: str = "", update = True) -> Table:
+        """
+        Opens the tree stored in the pager's pages, nothing past the root is
+        read until a query reaches it. Files from before pages were numbered
+        pre-order from the root are rebuilt from their leaf records instead.
+        """
+        new_table = cls(page_size=page_size, pager=pager)
 
-        new_table = cls(page_size=page_size)
-            
-        dps.sort(key=DataPointer.get_id)
-        for dp in dps:
-            new_table.bptree.insert(dp)
+        if new_table._is_legacy_layout():
+            new_table._rebuild_tree()
 
         if update:
             new_table.update_metadata(
@@ -146,86 +178,48 @@ class Table:
             
         return new_table
 
-    def to_byte_stream(self) -> bytes:
-        # converting a table to byte stream
-        # all aspects of writing the table file header and page-file offsets
-        # ordering the pages for de-serialization later
-        # saving the file to disk
-        # TODO: add logging and backup mechanism for failure protection
+    def _is_legacy_layout(self) -> bool:
+        # the old writer reversed a post-order walk, so page 1 held the root's last child
+        # where the current layout has its first one
+        root = self.bptree.root
+        if root.is_leaf or not root.keys:
+            return False
 
-        page_list = []
-
-        self._recurse_to_bytes(self.bptree.root, 0, 0xFFFFFFFF, page_list)
-
-        return b"".join(reversed(page_list))
-
-    def _recurse_to_bytes(self, node: BPlusNode, page_num: int, parent_page_num: int, page_bytes_list: list, right_relative: int = 0):
-        # root node condition.
-        if node.is_leaf:
-        
-            head = PageHeader(
-                PageType.table_leaf_page,
-                num_cells=0,
-                data_start=0,
-                right_relatve=right_relative,
-                parent=parent_page_num
-            )
+        first_child = self.bptree._node(root.child_pages[0])
+        return bool(first_child.keys) and not first_child.keys[0] < root.keys[0]
 
+    def _rebuild_tree(self):
+        pager = self.bptree.pager
+        dps: List[DataPointer] = []
 
-            writer = LeafPageWriter(
-                page_number=page_num,
-                header=head,
-                records=[rec.data for rec in node.keys],
-                page_size=self.page_size
-            )
+        for pg_no, page in enumerate(pager.iter_pages()):
+            if page[0] == PageType.table_leaf_page:
+                dps.extend(pager.codec.decode(page, pg_no, pager).keys)
 
-            page_bytes_list.append(writer.to_byte_stream())
-            # we added one page to the list...
-            # TODO: verify
-            return page_num + 1
-        
-            
-        # post-order recursion, call children left to right 
-        # and they append to the page bytes list
-        else:
+        dps.sort(key=DataPointer.get_id)
+        self.bptree.bulk_load(dps)
 
-            n_children = len(node.pointers)
-            my_page_no = page_num
-            ccpno = my_page_no + 1
-            my_cpnos = []
+    def to_byte_stream(self) -> bytes:
+        """
+        Page n of the table starts at n * page_size, the root is page 0.
+        """
+        self.bptree.flush()
+        return b"".join(self.bptree.pager.iter_pages())
 
-            for i, child in enumerate(node.pointers):
-                my_cpnos.append(ccpno)
-                if i == n_children-1:
-                    ccpno = self._recurse_to_bytes(child, ccpno, my_page_no, page_bytes_list, 0)
-                else:
-                    ccpno = self._recurse_to_bytes(child, ccpno, my_page_no, page_bytes_list, ccpno+1)
-
-            head = PageHeader(
-                PageType.table_interior_page,
-                0,
-                0,
-                my_cpnos[-1],
-                parent_page_num
-            )
+    def move_to(self, database: DatabaseFile, table_name: str):
+        """
+        Copies the records into a tree of the database file's pages, which the
+        table uses from then on.
+        """
+        dps: List[DataPointer] = list(self.bptree.scan())
 
-            r_cells =[]
-            for pno, rid in zip(my_cpnos[:-1], node.keys):
-                r_cells.append(RouterCell(rid, pno))
-
-            writer = InternalPageWriter(
-                my_page_no,
-                head,
-                [],
-                r_cells,
-                my_cpnos[-1],
-                self.page_size
-            )
+        old_tree = self.bptree
+        self.bptree = BPlusTree(tree_degree(database.page_size), database.pager(table_name, old_tree.pager.codec),
+                                pool=old_tree.pool)
+        self._use_zone_maps()
+        self.bptree.bulk_load(dps)
+        old_tree.drop()
 
-            page_bytes_list.append(writer.to_byte_stream(parent_page_num))
-                
-            return ccpno
-          
     @staticmethod
     def read_table(tfile: str):
         fb = None
@@ -238,19 +232,15 @@ class Table:
         """
         A record information dictionary of the form 
         { "column_name_list": [ ... ], , "value_list": [ ... ]}
+
+        A "col_ord_list" already filled in by resolve_columns is used as is.
         """
-        insert_dict["col_ord_list"] = self._column_name_list_to_ord(insert_dict["column_name_list"])
+        if "col_ord_list" not in insert_dict:
+            insert_dict["col_ord_list"] = self._column_name_list_to_ord(insert_dict["column_name_list"])
         # input validation against column info in table 
         # create a record and insert.
         # self.bptree.insert(record)
-        insertion_values = []
-        all_columns = self._column_name_list_to_ord()
-
-        for i in all_columns:
-            if i in insert_dict["col_ord_list"]:
-                insertion_values.append(insert_dict["value_list"][i])
-            else:
-                insertion_values.append(b"")
+        insertion_values = self._insertion_values(insert_dict["col_ord_list"], insert_dict["value_list"])
 
         try:
             self._validate_insert_types(insertion_values)
@@ -259,21 +249,109 @@ class Table:
             # TODO: print(traceback.format_exception_only(e.__class__, e)[-1])
             return
         
-        insertion_record = Record(
-            self.record_count,
-            np.uint8(len(all_columns)),
-            self.column_data["data_types"],
-            insertion_values
-        )
+        insertion_record = Record(self.record_count, self.schema, insertion_values)
 
         if not self._validate_record_size(insertion_record):
             raise OverflowError(f"Record with values {insertion_values} exceeds maximum permissible record byte size of {self.max_rec_size}")
 
-        ptr_to_record = DataPointer[Record](Record.get_id, insertion_record)
+        ptr_to_record = DataPointer(Record.get_id, insertion_record)
         self.bptree.insert(ptr_to_record)
+        self._index_record(insertion_record)
+
         self.record_count += 1
         return self.record_count
 
+    def insert_many(self, insert_dict: Dict) -> int:
+        """
+        Several rows in one go, of the form
+        { "column_name_list": [ ... ], "value_lists": [[ ... ], [ ... ], ...]}
+
+        Values are validated a column at a time and uniqueness is checked for
+        the whole batch at once, then the rows get the next row ids in order
+        and are appended at the right edge of the tree. If any row is
+        rejected none of them are inserted.
+        """
+        if "col_ord_list" not in insert_dict:
+            insert_dict["col_ord_list"] = self._column_name_list_to_ord(insert_dict["column_name_list"])
+
+        rows = [self._insertion_values(insert_dict["col_ord_list"], value_list)
+                for value_list in insert_dict["value_lists"]]
+        if not rows:
+            return self.record_count
+
+        try:
+            columns = self._validate_insert_columns([list(column) for column in zip(*rows)])
+            schema = self.schema
+            records = [Record(self.record_count + i, schema, values) for i, values in enumerate(zip(*columns))]
+            # the cell encoded here is the one the page gets written with
+            for rec in records:
+                if not self._validate_record_size(rec):
+                    raise OverflowError(f"Record with values {rec.data_values} exceeds maximum"
+                                        f" permissible record byte size of {self.max_rec_size}")
+        except Exception as e:
+            traceback.print_exc()
+            return
+
+        self.bptree.append(DataPointer(Record.get_id, rec) for rec in records)
+        for rec in records:
+            self._index_record(rec)
+
+        self.record_count += len(records)
+        return self.record_count
+
+    def copy_from(self, file_path: str, column_name_list: List[str] = None, header: bool = False) -> int:
+        """
+        Loads a CSV file, a chunk of rows at a time (Settings.get_copy_chunk_rows),
+        each chunk inserted with insert_many, so only one chunk is ever held.
+        Fields are converted to the column types, empty ones are NULL.
+        Returns the number of rows copied.
+        """
+        copied = 0
+        for insert_dict in self.copy_chunks(file_path, column_name_list, header):
+            self.copy_chunk(insert_dict, copied)
+            copied += len(insert_dict["value_lists"])
+        return copied
+
+    def copy_chunks(self, file_path: str, column_name_list: List[str] = None,
+                    header: bool = False) -> Iterator[Dict]:
+        """
+        The rows of a CSV file as insert_many dictionaries of up to
+        Settings.get_copy_chunk_rows() rows each, the fields of every row
+        going to the given columns (all of them, in table order, by default).
+        A header row is skipped.
+        """
+        column_name_list = column_name_list or self.column_data["column_names"]
+        col_ord_list = self._column_name_list_to_ord(column_name_list)
+
+        with open(file_path, newline="", encoding="utf-8") as csv_file:
+            reader = csv.reader(csv_file)
+            if header:
+                next(reader, None)
+
+            while value_lists := list(islice(reader, Settings.get_copy_chunk_rows())):
+                for value_list in value_lists:
+                    if len(value_list) != len(col_ord_list):
+                        raise ValueError(f"{len(value_list)} fields in a row of {file_path} "
+                                         f"for {len(col_ord_list)} columns: {value_list}")
+
+                yield {
+                    "column_name_list": column_name_list,
+                    "col_ord_list": col_ord_list,
+                    "value_lists": value_lists
+                }
+
+    def copy_chunk(self, insert_dict: Dict, copied: int) -> int:
+        # insert_many reports a rejected row and returns None, a copy stops there
+        if self.insert_many(insert_dict) is None:
+            raise ValueError(f"Copy into {self.name} stopped, a row among the {len(insert_dict['value_lists'])} "
+                             f"after the first {copied} was rejected. {copied} rows were copied.")
+        return self.record_count
+
+    def _insertion_values(self, col_ord_list: List[int], value_list: List[Any]) -> List[Any]:
+        # a value for every column in table order, b"" for those not given
+        given = dict(zip(col_ord_list, value_list))
+        return [given.get(i, b"") for i in range(len(self.column_data["column_names"]))]
+
     def update(self, update_op: Dict, condition: Dict) -> None:
         """
         Where operation and condition are of the form...
@@ -289,8 +367,8 @@ class Table:
         """
 
 
-        if condition and "column_ord" not in condition:
-            condition["column_ord"] = self._column_name_to_ord(condition["column_name"])
+        if condition:
+            self._resolve_condition(condition)
         
         if update_op and "column_ord" not in update_op:
             update_op["column_ord"] = self._column_name_to_ord(update_op["column_name"])
@@ -301,43 +379,47 @@ class Table:
             print(traceback.format_exception_only(e.__class__, e)[-1])
             return
 
+        upd_ord = update_op["column_ord"]
+        upd_tracked = self._is_tracked_column(upd_ord)
+
         # check if an index exists for the condition col (name/ord)
-        if False:
-            # TODO: Change condition.
-            # find the row-id/s to be updated from index
-            # call the search method on each id
-            # if a returned node has more than one id remove the others from list
-            # update the record.
-            raise NotImplementedError
+        if (row_ids := self._index_row_ids(condition)) is not None:
+            # only the records the index found can match, update those in place.
+            # their leaves stay in the buffer pool until they are marked dirty.
+            with self.bptree.pool.hold():
+                self._update_records(self._locate_records(row_ids), update_op, condition, upd_tracked)
 
         else:
-            # once leaf found, apply update/s
-            current_leaf = self._find_first_record()
-
-            keys_to_update = []
-            record_refs_agg = []
+            # let each batch of records decide whether the update is necessary.
+            for run in self._condition_runs(condition):
+                self._update_records(run, update_op, condition, upd_tracked)
+        
+        return
 
-            # let the leaf decide whether the update is necessary.
-            while current_leaf:
-                record_refs = [key.data for key in current_leaf.keys]
+    def _update_records(self, located: List[Tuple[BPlusNode, Record]], update_op: Dict, 
+                        condition: Dict, upd_tracked: bool):
+        upd_ord = update_op["column_ord"]
+        record_refs = [rec for _, rec in located]
+        old_vals = [rec.value(upd_ord) for rec in record_refs]
 
-                updated_refs = Record.filter_update(record_refs, update_op, condition)
+        updated_refs = Record.filter_update(record_refs, update_op, condition)
 
-                for rec in updated_refs:
-                    if not self._validate_record_size(rec):
-                        raise OverflowError(f"Record with values {rec.data_values} exceeds maximum"
-                                            f" permissible record byte size of {self.max_rec_size}")
+        for rec in updated_refs:
+            if not self._validate_record_size(rec):
+                raise OverflowError(f"Record with values {rec.data_values} exceeds maximum"
+                                    f" permissible record byte size of {self.max_rec_size}")
 
-                keys_to_update.extend(current_leaf.keys)
-                record_refs_agg.extend(updated_refs)
+        if upd_tracked:
+            self._reindex_updated(upd_ord, updated_refs, old_vals)
 
-                # keep applying update to each leaf by calling leaf.next!
-                current_leaf = current_leaf.next
+        # only pages holding a changed record need writing back
+        changed = {}
+        for (leaf, _), rec, old_val in zip(located, updated_refs, old_vals):
+            if rec.value(upd_ord) != old_val:
+                changed[id(leaf)] = leaf
 
-            for key, rec in zip(keys_to_update, record_refs_agg):
-                    key.data = rec
-        
-        return
+        for leaf in changed.values():
+            self.bptree.leaf_changed(leaf)
 
     def delete(self, condition: Dict = None):
         """
@@ -347,12 +429,15 @@ class Table:
         "column_ord": 1, "comparator": "=", "value": 0 }
         """
         
-        if condition and "column_ord" not in condition:
-            condition["column_ord"] = self._column_name_to_ord(condition["column_name"])
+        if condition:
+            self._resolve_condition(condition)
         
         # if no condition, clear all records.
         if condition is None:
-            self.bptree = BPlusTree()
+            self.bptree.clear()
+            for index in self.indexes.values():
+                index.clear()
+            self.unique_values = None
             return
         
         try:
@@ -361,35 +446,31 @@ class Table:
             print(traceback.format_exception_only(e.__class__, e)[-1])
             return
 
-        if False:
-            pass
-            # TODO: index methods ...
-        else:
-            current_leaf = self._find_first_record()
+        records_to_delete = {}
 
-            ids_to_delete = set()
+        if (candidates := self._index_lookup(condition)) is not None:
+            retained_id_set = {ref.get_id() for ref in Record.filter_delete(candidates, condition)}
 
-            while current_leaf:
-                record_refs = [key.data for key in current_leaf.keys]
-                record_id_set = set(key.id for key in current_leaf.keys)
+            for rec in candidates:
+                if rec.get_id() not in retained_id_set:
+                    records_to_delete[rec.get_id()] = rec
+        else:
+            for run in self._condition_runs(condition):
+                record_refs = [rec for _, rec in run]
 
                 updated_refs = Record.filter_delete(record_refs, condition)
 
                 retained_id_set = {ref.get_id():ref for ref in updated_refs}
                 
-                for id in record_id_set:
-                    if id not in retained_id_set:
-                        ids_to_delete.add(id) 
-
-                """for key in current_leaf.keys:
-                    if key.id in retained_id_set:
-                        key.data = retained_id_set[key.id]"""
-                # keep applying update to each leaf by calling leaf.next!
-                current_leaf = current_leaf.next
-
-            for id in ids_to_delete:
-                self.bptree.delete(id)
-                self.recently_deleted.add(id)
+                for rec in record_refs:
+                    if rec.get_id() not in retained_id_set:
+                        records_to_delete[rec.get_id()] = rec
+
+
+        for id, rec in records_to_delete.items():
+            self.bptree.delete(id)
+            self.recently_deleted.add(id)
+            self._unindex_record(rec)
         
         return
 
@@ -403,37 +484,272 @@ class Table:
         condition = { "negated": "FALSE", "column_name": "MiddleInt", 
         "column_ord": 1, "comparator": "=", "value": 0 }
 
+        "distinct", "limit" and "offset" are optional too, see iter_select.
+
         Returns: A list of list containing the values selected. 
         """
-        col_ord_list = self._column_name_list_to_ord(selection_dict["column_name_list"])
+        selections = list(self.iter_select(selection_dict))
+        return selections, selection_dict["column_name_list"] or self.column_data["column_names"]
+
+    def iter_select(self, selection_dict: Dict) -> Iterator[List]:
+        """
+        Same selection as select, but rows are produced one at a time in row id
+        order as the scan reaches them, the whole result is never held. Duplicate
+        rows are kept unless "distinct" is set, "offset" rows are skipped and the
+        scan stops as soon as "limit" rows were produced.
+        """
+        if "col_ord_list" in selection_dict:
+            col_ord_list = selection_dict["col_ord_list"]
+        else:
+            col_ord_list = self._column_name_list_to_ord(selection_dict["column_name_list"])
         condition = selection_dict["condition"]
         
-        if  condition and "column_ord" not in condition:
-            condition["column_ord"] = self._column_name_to_ord(condition["column_name"])
+        if condition:
+            self._resolve_condition(condition)
             
         if condition:
             self._validate_condition(condition) 
 
-        selections = set()
+        rows = self._selected_rows(col_ord_list, condition)
+
+        if selection_dict.get("distinct"):
+            rows = self._distinct_rows(rows)
+
+        offset = selection_dict.get("offset") or 0
+        limit = selection_dict.get("limit")
+        return islice(rows, offset, None if limit is None else offset + limit)
 
-        if False:
-            #TODO: Implement keys...
-            pass
+    def _selected_rows(self, col_ord_list: List[int], condition: Dict) -> Iterator[List]:
+        for records in self._matching_records(condition):
+            yield from Record.filter_subset_select(records, col_ord_list)
+
+    def _matching_records(self, condition: Dict) -> Iterator[List[Record]]:
+        # batches of the records satisfying the (validated) condition, in row id order
+        if (row_ids := self._index_row_ids(condition)) is not None:
+            # one row id at a time, so a limit cuts the lookups short too
+            batches = ([rec for _, rec in self._locate_records([rid])] for rid in sorted(row_ids))
         else:
-            current_leaf = self._find_first_record()
+            batches = ([rec for _, rec in run if rec.row_id not in self.recently_deleted]
+                       for run in self._condition_runs(condition))
 
-            while current_leaf:
-                record_refs = [key.data for key in current_leaf.keys if key.id not in self.recently_deleted]
-                
-                sels = Record.filter_subset_select(record_refs, col_ord_list, condition)
-                
-                for sel in sels:
-                    selections.add(tuple(sel))
-                
-                current_leaf = current_leaf.next
+        for record_refs in batches:
+            yield list(compress(record_refs, Record.filter_mask(record_refs, condition))) if condition else record_refs
 
-        selections = [list(sel) for sel in selections]
-        return selections, selection_dict["column_name_list"] or self.column_data["column_names"]
+    def aggregate(self, selection_dict: Dict) -> Tuple[List[List], List[str]]:
+        """
+        selection_dict as for select, plus
+        "aggregate_list": [{"function": "COUNT", "column_name": "*"}, ...]
+        with COUNT, SUM, MIN, MAX or AVG of a column, COUNT(*) or rowid.
+
+        Every aggregate is folded into running totals as one scan goes over the
+        matching records, no rows are built. With no condition COUNT(*) is the
+        tree's entry count and MIN/MAX(rowid) come from its edge leaves, so a
+        statement of only those reads no more than two leaves. NULLs are skipped,
+        an aggregate over no values is NULL (COUNT is 0).
+
+        Returns: [[one value per aggregate]] and their headers, like select.
+        """
+        aggregates = selection_dict["aggregate_list"]
+        condition = selection_dict["condition"]
+        plan = [(agg["function"].upper(), self._aggregate_column(agg)) for agg in aggregates]
+        headers = [f"{agg['function'].upper()}({agg['column_name']})" for agg in aggregates]
+
+        if condition:
+            self._resolve_condition(condition)
+
+        if condition:
+            self._validate_condition(condition)
+
+        if not condition and all(self._is_tree_metadata(function, c_ord) for function, c_ord in plan):
+            values = [self._tree_metadata(function) for function, _ in plan]
+        else:
+            values = self._fold_aggregates(plan, self._matching_records(condition))
+
+        offset = selection_dict.get("offset") or 0
+        limit = selection_dict.get("limit")
+        return [values][offset:None if limit is None else offset + limit], headers
+
+    def _aggregate_column(self, agg: Dict):
+        # None for *, ROW_ID_COLUMN for the row id, otherwise the column ord
+        function, column_name = agg["function"].upper(), agg["column_name"]
+
+        if function not in AGGREGATE_FUNCTIONS:
+            raise NameError(f"{function} isn't an aggregate function.")
+
+        if column_name == "*":
+            if function != "COUNT":
+                raise ValueError(f"Only COUNT can be taken of *, not {function}.")
+            return None
+
+        if column_name.lower() == ROW_ID_COLUMN and column_name not in self.column_data["column_names"]:
+            return ROW_ID_COLUMN
+
+        c_ord = self._column_name_to_ord(column_name)
+        typ = self.column_data["data_types"][c_ord]
+        if function in {"SUM", "AVG"} and not self._is_numeric_type(typ):
+            raise TypeError(f"Can't take {function} of column {column_name} of type {typ.value[0]}.")
+
+        return c_ord
+
+    @staticmethod
+    def _is_numeric_type(typ: DataType) -> bool:
+        return typ.value[3] is not None and issubclass(typ.value[3], np.number)
+
+    @staticmethod
+    def _is_tree_metadata(function: str, c_ord) -> bool:
+        return (c_ord is None and function == "COUNT") or (c_ord == ROW_ID_COLUMN and function in {"MIN", "MAX"})
+
+    def _tree_metadata(self, function: str):
+        if function == "COUNT":
+            return self.bptree.count()
+
+        leaf = self.bptree.leftmost_leaf() if function == "MIN" else self.bptree.rightmost_leaf()
+        if not leaf.keys:
+            return None
+        return leaf.keys[0].id if function == "MIN" else leaf.keys[-1].id
+
+    def _fold_aggregates(self, plan: List[Tuple[str, Any]], batches: Iterator[List[Record]]) -> List:
+        counts = [0] * len(plan)
+        totals = [0] * len(plan)
+        bests = [None] * len(plan)
+        types = self.column_data["data_types"]
+
+        for records in batches:
+            for i, (function, c_ord) in enumerate(plan):
+                if c_ord is None:
+                    counts[i] += len(records)
+                    continue
+
+                if c_ord == ROW_ID_COLUMN:
+                    vals, dtype = [rec.row_id for rec in records], np.int64
+                else:
+                    vals = [v for rec in records if (v := rec.value(c_ord)) is not None]
+                    dtype = types[c_ord].value[3] if self._is_numeric_type(types[c_ord]) else None
+
+                if not vals:
+                    continue
+                counts[i] += len(vals)
+
+                if function in {"SUM", "AVG"}:
+                    # summed wide, a column's own type would overflow
+                    wide = np.float64 if issubclass(dtype, np.floating) else np.int64
+                    totals[i] += np.fromiter(vals, wide, len(vals)).sum().item()
+
+                elif function in {"MIN", "MAX"}:
+                    pick = min if function == "MIN" else max
+                    if dtype is not None:
+                        column = np.fromiter(vals, dtype, len(vals))
+                        batch_best = column.min() if function == "MIN" else column.max()
+                    else:
+                        batch_best = pick(vals)
+                    bests[i] = batch_best if bests[i] is None else pick(bests[i], batch_best)
+
+        values = []
+        for (function, _), count, total, best in zip(plan, counts, totals, bests):
+            if function == "COUNT":
+                values.append(count)
+            elif function == "SUM":
+                values.append(total if count else None)
+            elif function == "AVG":
+                values.append(total / count if count else None)
+            else:
+                values.append(best)
+
+        return values
+
+    def _condition_runs(self, condition: Dict) -> Iterator[List[Tuple[BPlusNode, Record]]]:
+        # the runs a (validated) condition's matches can be in
+        return self._record_runs(self._zone_filter(condition), *self._row_id_range(condition))
+
+    def _record_runs(self, zone_filter=None, lo: int = None, hi: int = None) -> Iterator[List[Tuple[BPlusNode, Record]]]:
+        """
+        (leaf, record) for every record in row id order, in runs of whole leaves
+        so conditions are tested a batch at a time. The first run is one leaf and
+        each one after doubles, up to Settings.get_scan_batch_rows() records, so
+        a scan that stops early hasn't read far ahead. Leaves the zone_filter
+        rules out are passed over without being read, lo and hi bound the row ids.
+        """
+        run, run_rows = [], 1
+        for leaf, entries in self.bptree.scan_leaves(lo, hi, zone_filter=zone_filter):
+            run.extend((leaf, key.data) for key in entries)
+            if len(run) >= run_rows:
+                yield run
+                run, run_rows = [], min(run_rows * 2, Settings.get_scan_batch_rows())
+
+        if run:
+            yield run
+
+    def _use_zone_maps(self):
+        zone_columns = TablePageCodec.zone_columns(
+            self.column_data["data_types"], self.page_size, self.bptree.max_ptr_degree()
+        )
+        if zone_columns:
+            self.bptree.use_zone_maps(zone_columns, self._leaf_zone)
+
+    def _leaf_zone(self, entries: List[DataPointer]) -> tuple:
+        # (min, max) of each zone column, None where a value is NULL, NaN or missing
+        zone = []
+        for c_ord, _ in self.bptree.zone_columns:
+            try:
+                values = [entry.data.value(c_ord) for entry in entries]
+                if not values or any(val is None or val != val for val in values):
+                    zone.append(None)
+                else:
+                    zone.append((min(values), max(values)))
+            except (IndexError, TypeError):
+                zone.append(None)
+
+        return tuple(zone)
+
+    def _zone_filter(self, condition: Dict):
+        """
+        For a (validated) condition on a zone map column, the test of a zone
+        telling whether its subtree can hold a matching record. None otherwise.
+        An AND is tested on the operands that have one, an OR only when all do.
+        """
+        if not condition:
+            return None
+
+        if "operator" in condition:
+            tests = [self._zone_filter(operand) for operand in condition["operands"]]
+            if condition["operator"] == "AND":
+                tests = [test for test in tests if test is not None]
+                return (lambda zone: all(test(zone) for test in tests)) if tests else None
+            if None in tests:
+                return None
+            return lambda zone: any(test(zone) for test in tests)
+
+        if condition["value"] is None:
+            return None
+
+        zone_ords = [c_ord for c_ord, _ in self.bptree.zone_columns]
+        if condition["column_ord"] not in zone_ords:
+            return None
+
+        pos = zone_ords.index(condition["column_ord"])
+        val = condition["value"]
+        test = ZONE_TESTS[self._effective_comparator(condition)]
+
+        return lambda zone: zone[pos] is None or test(*zone[pos], val)
+
+    @staticmethod
+    def _distinct_rows(rows: Iterator[List]) -> Iterator[List]:
+        seen = set()
+        for row in rows:
+            if (key := tuple(map(index_key, row))) not in seen:
+                seen.add(key)
+                yield row
+
+    def resolve_columns(self, statement: Dict):
+        """
+        Fills in the ordinals of the columns an insertion or selection names,
+        its "col_ord_list" and the "column_ord" of every predicate, for a
+        statement run many times without looking them up again.
+        """
+        statement["col_ord_list"] = self._column_name_list_to_ord(statement.get("column_name_list", []))
+
+        if statement.get("condition"):
+            self._resolve_condition(statement["condition"])
 
     def _column_name_list_to_ord(self, name_list: List[str] = []) -> List[int]:
 
@@ -472,6 +788,60 @@ class Table:
             
         return True
 
+    def _validate_insert_columns(self, columns: List[List[Any]]) -> List[List[Any]]:
+        """
+        Same checks as _validate_insert_types for a batch of rows given as
+        lists of column values, numeric columns are converted with one array
+        operation each and uniqueness is checked once for all the rows.
+        """
+        names = self.column_data["column_names"]
+        types = self.column_data["data_types"]
+        nullables = self.column_data["nullability"]
+        col_role = self.column_data["column_keys"]
+
+        for i, (typ, is_null, role, values) in enumerate(zip(types, nullables, col_role, columns)):
+            columns[i] = self._validate_column(i, typ, is_null, role, values, names)
+
+        unique_values = self._unique_values()
+        for c_ord, seen in unique_values.items():
+            batch = set()
+            for val in columns[c_ord]:
+                if val is None:
+                    continue
+                if (key := index_key(val)) in seen or key in batch:
+                    raise ValueError(f"Column {names[c_ord]} has a uniqueness constraint, and value {val} already exists.")
+                batch.add(key)
+
+        return columns
+
+    def _validate_column(self, i, typ, is_null, role, values, names) -> List[Any]:
+        typ_string, type_class = typ.value[0], typ.value[3]
+
+        if typ_string in {"TINYINT", "SMALLINT", "INT", "BIGINT", "LONG"}:
+            convert, bounds = int, np.iinfo(type_class)
+        elif typ_string in {"FLOAT", "DOUBLE"}:
+            convert, bounds = float, np.finfo(type_class)
+        else:
+            convert = None
+
+        # NULLs and values that don't convert get the checks (and errors) of a single row
+        try:
+            if convert is None or any(val is None or val == b"" or val == "" for val in values):
+                raise ValueError
+            # ints stay python ints until they're in bounds, an array of them past int64
+            # would be floats and wrap around on the cast
+            numbers = np.array([convert(val) for val in values], dtype=object if convert is int else None)
+        except (TypeError, ValueError):
+            return [self._validate_property_value_tuple(i, typ, is_null, role, val, names, True) for val in values]
+
+        # NaN is out of bounds too, as for a single row
+        out_of_bounds = ~np.asarray((numbers >= bounds.min) & (numbers <= bounds.max), dtype=bool)
+        if out_of_bounds.any():
+            val = values[int(np.argmax(out_of_bounds))]
+            raise ValueError(f"Column {names[i]} of type {typ_string} can't have the value {val}.")
+
+        return list(numbers.astype(type_class))
+
     def _validate_property_value_tuple(self, i, typ, is_null, role, val, names, skip_uni=False):
         if val is None or val == b"" or val == "":
             if is_null == "YES":
@@ -542,7 +912,7 @@ class Table:
 
             elif typ_string == "TEXT":
                 pred = (isinstance(val, str)
-                        and len(val) <= 115)
+                        and len(val.encode()) <= MAX_TEXT_BYTES)
                 new_val = val
 
         except ValueError:
@@ -551,34 +921,43 @@ class Table:
         if not pred:
             raise ValueError(f"Column {names[i]} of type {typ_string} can't have the value {val}.")
 
+        if typ_string == "TEXT" and names[i] in self.indexes and len(val.encode()) > Index.max_value_size(self.page_size):
+            raise ValueError(f"Column {names[i]} is indexed, its values can't be longer than"
+                             f" {Index.max_value_size(self.page_size)} bytes.")
+
         if (role == "UNI" or role == "PRI") and not skip_uni:
-            found, _ = self.select({
-                "condition": {
-                    "negated": "FALSE",
-                    "column_name": names[i],
-                    "column_ord": i,
-                    "comparator": "=",
-                    "value": new_val
-                },
-                "column_name_list": [names[i]],
-            })
-
-            if found:
+            if index_key(new_val) in self._unique_values().get(i, ()):
                 raise ValueError(f"Column {names[i]} has a uniqueness constraint, and value {val} already exists.")
 
         return new_val
 
     def _validate_condition(self, condition: Dict) -> bool:
         """
-        Function has side-effect, modifies the dictionary.
+        Function has side-effect, modifies the dictionary. Every predicate of an
+        AND / OR is validated, then its operands are put in the order they're
+        best tested in.
         """
+        if "operator" in condition:
+            for operand in condition["operands"]:
+                self._validate_condition(operand)
+            self._order_operands(condition)
+            return True
 
         names = self.column_data["column_names"]
         types = self.column_data["data_types"]
         nullables = self.column_data["nullability"]
         col_role = self.column_data["column_keys"]
 
-        c_ord = condition.get("column_ord", self._column_name_to_ord(condition["column_name"]))
+        if "column_ord" not in condition:
+            condition["column_ord"] = self._condition_column_ord(condition["column_name"])
+        c_ord = condition["column_ord"]
+
+        if c_ord == ROW_ID_COLUMN:
+            try:
+                condition["value"] = np.int64(condition["value"])
+            except (TypeError, ValueError):
+                raise ValueError(f"{ROW_ID_COLUMN} can't be compared to {condition['value']}.")
+            return True
 
         typ = types[c_ord]
         is_null = nullables[c_ord]
@@ -591,6 +970,125 @@ class Table:
 
         return True
 
+    @staticmethod
+    def _predicates(condition: Dict) -> Iterator[Dict]:
+        if "operator" in condition:
+            for operand in condition["operands"]:
+                yield from Table._predicates(operand)
+        else:
+            yield condition
+
+    @staticmethod
+    def _effective_comparator(predicate: Dict) -> str:
+        comp = predicate["comparator"]
+        return CONDITION_NEGATED[comp] if predicate["negated"] == "TRUE" else comp
+
+    def _resolve_condition(self, condition: Dict):
+        # the column_ord of every predicate, before values are validated
+        for predicate in self._predicates(condition):
+            if "column_ord" not in predicate:
+                predicate["column_ord"] = self._condition_column_ord(predicate["column_name"])
+
+    def _condition_column_ord(self, col_name: str):
+        if col_name not in self.column_data["column_names"] and col_name.lower() == ROW_ID_COLUMN:
+            return ROW_ID_COLUMN
+        return self._column_name_to_ord(col_name)
+
+    def _order_operands(self, condition: Dict):
+        """
+        Operands of an AND go cheapest per row ruled out first, those of an OR
+        cheapest per row let through first, so whichever decides a record most
+        often for the least work is tested on the most records.
+        """
+        is_and = condition["operator"] == "AND"
+
+        def rank(operand):
+            selectivity, cost = self._estimate(operand)
+            return cost / max(1 - selectivity if is_and else selectivity, 1e-9)
+
+        condition["operands"].sort(key=rank)
+
+    def _estimate(self, condition: Dict) -> Tuple[float, float]:
+        """
+        (fraction of rows expected to match, relative cost of testing a record)
+        for a validated condition. Equality matches one row on a PRI/UNI column
+        or the row id and is counted through an index where there is one, ranges
+        on numeric columns and the row id are measured against the min and max,
+        from the root's zone maps or the edge leaves, anything else is a guess.
+        Numeric columns are tested vectorized, the rest record by record.
+        """
+        if "operator" in condition:
+            estimates = [self._estimate(operand) for operand in condition["operands"]]
+            cost = sum(cost for _, cost in estimates)
+            misses = np.prod([1 - selectivity for selectivity, _ in estimates])
+            if condition["operator"] == "AND":
+                return np.prod([selectivity for selectivity, _ in estimates]), cost
+            return 1 - misses, cost
+
+        rows = max(self.bptree.count(), 1)
+        c_ord, val = condition["column_ord"], condition["value"]
+        comp = self._effective_comparator(condition)
+
+        if c_ord == ROW_ID_COLUMN:
+            unique, cost = True, 1.0
+            bounds = (self._tree_metadata("MIN"), self._tree_metadata("MAX")) if rows > 1 else None
+        else:
+            unique = self.column_data["column_keys"][c_ord] in {"PRI", "UNI"}
+            cost = 1.0 if self._is_numeric_type(self.column_data["data_types"][c_ord]) else 3.0
+            bounds = self._column_bounds().get(c_ord)
+
+        if unique:
+            equal = 1 / rows
+        elif comp in {"=", "<>"} and (index := self._condition_index(dict(condition, comparator="="))):
+            # one search gives the exact number
+            equal = len(index.lookup(val)) / rows
+        else:
+            equal = 0.1
+
+        if comp == "=":
+            return equal, cost
+        if comp == "<>":
+            return 1 - equal, cost
+        if bounds is None or val is None or bounds[0] == bounds[1]:
+            return 1 / 3, cost
+
+        lo, hi = map(float, bounds)
+        below = min(max((float(val) - lo) / (hi - lo), 0.0), 1.0)
+        return (below if comp in {"<", "<="} else 1 - below), cost
+
+    def _column_bounds(self) -> Dict[int, Tuple[Any, Any]]:
+        # column ord -> (min, max) of the zone map columns with a known zone
+        zone = self.bptree.zone()
+        if zone is None:
+            return {}
+        return {c_ord: bounds for (c_ord, _), bounds in zip(self.bptree.zone_columns, zone) if bounds is not None}
+
+    def _row_id_range(self, condition: Dict) -> Tuple[int, int]:
+        """
+        (lo, hi) the row ids of records matching the (validated) condition lie
+        within, from its predicates on the row id or those of its conjuncts.
+        None where open.
+        """
+        lo = hi = None
+        if not condition:
+            return lo, hi
+
+        conjuncts = condition["operands"] if condition.get("operator") == "AND" else [condition]
+        for predicate in conjuncts:
+            if "operator" in predicate or predicate["column_ord"] != ROW_ID_COLUMN:
+                continue
+            comp = self._effective_comparator(predicate)
+            val = int(predicate["value"])
+
+            if comp in {"=", ">=", ">"}:
+                bound = val + 1 if comp == ">" else val
+                lo = bound if lo is None else max(lo, bound)
+            if comp in {"=", "<=", "<"}:
+                bound = val - 1 if comp == "<" else val
+                hi = bound if hi is None else min(hi, bound)
+
+        return lo, hi
+
     def _validate_update_types(self, update_op: Dict) -> bool:
         """
         Function has side-effect, modifies the dictionary.
@@ -615,20 +1113,175 @@ class Table:
         return True
 
     def _validate_record_size(self, rec: Record) -> bool:
-        return len(rec.to_byte_stream()) <= self.max_rec_size
+        try:
+            return rec.byte_size() <= self.max_rec_size
+        except (struct.error, OverflowError):
+            # a payload past what its 2 byte size holds doesn't encode at all
+            return False
 
-    def _find_first_record(self) -> BPlusNode:
-        # search from uid min (0) up until the last assigned number
-        # at least one of them should be in the table if the table is not empty
-        for uid in range(self.record_count):
-            if uid not in self.recently_deleted:
-                node, idx = self.bptree._search(self.bptree.root, uid)
-                if node and idx is not None:
-                    return node
+    def create_index(self, column_name: str) -> Index:
+        """
+        Builds a secondary index on the column from the current rows, sorting
+        the (value, row_id) pairs once rather than inserting them one by one.
+        """
+        if column_name in self.indexes:
+            raise ValueError(f"Index on column {column_name} of table {self.name} already exists!")
+
+        c_ord = self._column_name_to_ord(column_name)
+        pairs = [(key.data.value(c_ord), key.id) for key in self.bptree.scan()]
+
+        max_size = Index.max_value_size(self.page_size)
+        if any(isinstance(val, str) and len(val.encode()) > max_size for val, _ in pairs):
+            raise ValueError(f"Column {column_name} has values longer than the {max_size} bytes an index can hold.")
+
+        new_index = Index.build(column_name, c_ord, self.column_data["data_types"][c_ord], pairs)
+        self.indexes[column_name] = new_index
+        return new_index
+
+    def load_index(self, column_name: str, byte_stream: bytes) -> Index:
+        c_ord = self._column_name_to_ord(column_name)
+        loaded = Index.from_byte_stream(
+            byte_stream,
+            column_name,
+            c_ord,
+            self.column_data["data_types"][c_ord],
+            self.page_size
+        )
+        self.indexes[column_name] = loaded
+        return loaded
+
+    def _index_lookup(self, condition: Dict) -> List[Record]:
+        """
+        Records that may satisfy the condition, found through the index on the
+        condition column. None when no index exists or it can't serve the comparator.
+        """
+        if (row_ids := self._index_row_ids(condition)) is None:
+            return None
+
+        return [rec for _, rec in self._locate_records(row_ids)]
+
+    def _index_row_ids(self, condition: Dict) -> List[int]:
+        """
+        Row ids of the records that can satisfy the (validated) condition, found
+        through indexes, or None when a scan is the way. A lone predicate uses
+        the index on its column whenever there's one. An AND looks up the
+        indexed conjunct expected to match the fewest rows, if that's at most
+        INDEX_SELECTIVITY of them and fewer than its row id range holds. An OR
+        needs an index for each operand, the row ids found are merged.
+        """
+        if not condition:
+            return None
+
+        if "operator" not in condition:
+            index = self._condition_index(condition)
+            return None if index is None else index.row_ids_for(condition)
+
+        if self._estimate(condition)[0] > INDEX_SELECTIVITY:
+            return None
+
+        if condition["operator"] == "OR":
+            row_ids = set()
+            for operand in condition["operands"]:
+                if (found := self._index_row_ids(operand)) is None:
+                    return None
+                row_ids.update(found)
+            return list(row_ids)
+
+        indexed = [op for op in condition["operands"] if "operator" not in op and self._condition_index(op)]
+        if not indexed:
+            return None
+
+        best, selectivity = min(((op, self._estimate(op)[0]) for op in indexed), key=itemgetter(1))
+        ranged = [self._estimate(op)[0] for op in condition["operands"]
+                  if "operator" not in op and op["column_ord"] == ROW_ID_COLUMN
+                  and self._effective_comparator(op) != "<>"]
+        if selectivity > INDEX_SELECTIVITY or (ranged and min(ranged) <= selectivity):
+            return None
+
+        return self._condition_index(best).row_ids_for(best)
+
+    def _condition_index(self, predicate: Dict) -> Index:
+        # the index on the predicate's column, when it can serve the comparator
+        if predicate["column_ord"] == ROW_ID_COLUMN:
+            return None
+
+        if self._effective_comparator(predicate) == "<>":
+            return None
+
+        return self.indexes.get(self.column_data["column_names"][predicate["column_ord"]])
+
+    def _locate_records(self, row_ids: List[int]) -> List[Tuple[BPlusNode, Record]]:
+        located = []
+        for rid in row_ids:
+            node, idx = self.bptree._search(self.bptree.root, rid)
+            if idx is not None:
+                located.append((node, node.keys[idx].data))
+
+        return located
+
+    def _unique_values(self) -> Dict[int, Dict[Any, int]]:
+        """
+        Hash map per UNI/PRI column so a uniqueness check is a dictionary probe
+        instead of a select over the whole table. Built by one scan the first
+        time a constraint is checked, so opening a table doesn't read every page.
+        """
+        if self.unique_values is not None:
+            return self.unique_values
+
+        unique_values = {
+            c_ord: {} for c_ord, role in enumerate(self.column_data["column_keys"])
+            if role in {"UNI", "PRI"}
+        }
+
+        if unique_values:
+            for key in self.bptree.scan():
+                for c_ord, seen in unique_values.items():
+                    if (val := key.data.value(c_ord)) is not None:
+                        seen[index_key(val)] = key.id
+
+        self.unique_values = unique_values
+        return unique_values
+
+    def _is_tracked_column(self, c_ord: int) -> bool:
+        return (c_ord in (self.unique_values or ())
+                or self.column_data["column_names"][c_ord] in self.indexes)
+
+    def _index_record(self, rec: Record):
+        for index in self.indexes.values():
+            index.insert(rec.value(index.column_ord), rec.get_id())
+
+        for c_ord, seen in (self.unique_values or {}).items():
+            if (val := rec.value(c_ord)) is not None:
+                seen[index_key(val)] = rec.get_id()
+
+    def _unindex_record(self, rec: Record):
+        for index in self.indexes.values():
+            index.delete(rec.value(index.column_ord), rec.get_id())
+
+        for c_ord, seen in (self.unique_values or {}).items():
+            if (val := rec.value(c_ord)) is not None:
+                seen.pop(index_key(val), None)
+
+    def _reindex_updated(self, c_ord: int, records: List[Record], old_vals: List[Any]):
+        index = self.indexes.get(self.column_data["column_names"][c_ord])
+        seen = (self.unique_values or {}).get(c_ord)
+
+        for rec, old_val in zip(records, old_vals):
+            new_val = rec.value(c_ord)
+            if new_val == old_val:
+                continue
+
+            if index:
+                index.delete(old_val, rec.get_id())
+                index.insert(new_val, rec.get_id())
+
+            if seen is not None:
+                if old_val is not None:
+                    seen.pop(index_key(old_val), None)
+                if new_val is not None:
+                    seen[index_key(new_val)] = rec.get_id()
 
-        return None
 
-    
 if __name__ == "__main__":
 
     data_values=[
@@ -13,7 +13,7 @@ riobase_columns_cdata= {
 
 riobase_tables_cdata = {
             "column_names": ["rowid", "table_name", "page_size", "record_count"],
-            "data_types": ["INT", "TEXT", "SMALLINT", "INT"],
+            "data_types": ["INT", "TEXT", "INT", "INT"],
             "nullability": ["NO", "NO", "NO", "NO"],
             "column_keys": ["UNI", "UNI", "", ""]
         }
@@ -42,7 +42,7 @@ create_riobase_tables = {
         "column_name": "page_size",
         "column_key": "",
         "is_nullable": "NO",
-        "data_type": "SMALLINT",
+        "data_type": "INT",
         "ordinal_position": 3,
         "table_name": "riobase_tables"
     },
@@ -216,7 +216,7 @@ fill_riobase_columns = [
             3,
             "riobase_tables",
             "page_size",
-            "SMALLINT",
+            "INT",
             3,
             "NO",
             ""
@@ -1,11 +1,15 @@
 def help():
     help = ["\nclear  : Clear terminal screen",
             "insert : Insert data into a particular table",
+            "copy   : Load the rows of a CSV file into a table",
             "create : create a new table in the database",
-            "select : Query data from the database",
+            "select : Query data from the database, INTO OUTFILE writes it to a file",
             "update : Update data in the tables",
             "delete : Delete data from a table",
             "drop   : Delete table from database",
+            "show buffer pool : Page cache hits, misses and evictions",
+            "prepare : Parse a statement once, ? in place of its values",
+            "execute : Run a prepared statement with the values given",
             "exit   : Exit davisbase RioDB"  
     ]
     return "\n".join(help)
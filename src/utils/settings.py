@@ -11,6 +11,15 @@ class Settings(objectless):
     _copyright = "©2021 Rio DB Group"
     _is_exit = False
     _page_size = 512
+    _buffer_pool_pages = 4096
+    _scan_batch_rows = 1024
+    _copy_chunk_rows = 10000
+    _export_buffer_bytes = 1 << 20
+    _wal_sync_policy = "group"
+    _wal_group_commit_size = 32
+    _wal_group_commit_ms = 10
+    _wal_checkpoint_bytes = 4 * 1024 * 1024
+    _wal_checkpoint_dirty_pages = 8192
 
     @classmethod
     def is_exit(cls) -> bool:
@@ -50,8 +59,84 @@ class Settings(objectless):
 
     @classmethod
     def set_page_size(cls, val: int) -> None:
+        if not 512 <= val <= 65536 or val & (val - 1):
+            raise ValueError(f"Unsupported page size {val}, use a power of two from 512 to 65536")
         cls._page_size = val
 
+    @classmethod
+    def get_buffer_pool_pages(cls) -> int:
+        return cls._buffer_pool_pages
+
+    @classmethod
+    def set_buffer_pool_pages(cls, val: int) -> None:
+        cls._buffer_pool_pages = val
+
+    @classmethod
+    def get_scan_batch_rows(cls) -> int:
+        return cls._scan_batch_rows
+
+    @classmethod
+    def set_scan_batch_rows(cls, val: int) -> None:
+        cls._scan_batch_rows = val
+
+    @classmethod
+    def get_copy_chunk_rows(cls) -> int:
+        return cls._copy_chunk_rows
+
+    @classmethod
+    def set_copy_chunk_rows(cls, val: int) -> None:
+        cls._copy_chunk_rows = val
+
+    @classmethod
+    def get_export_buffer_bytes(cls) -> int:
+        return cls._export_buffer_bytes
+
+    @classmethod
+    def set_export_buffer_bytes(cls, val: int) -> None:
+        cls._export_buffer_bytes = val
+
+    @classmethod
+    def get_wal_sync_policy(cls) -> str:
+        return cls._wal_sync_policy
+
+    @classmethod
+    def set_wal_sync_policy(cls, val: str) -> None:
+        if val not in {"always", "group", "off"}:
+            raise ValueError(f"Unknown wal sync policy {val}, use always, group or off")
+        cls._wal_sync_policy = val
+
+    @classmethod
+    def get_wal_group_commit_size(cls) -> int:
+        return cls._wal_group_commit_size
+
+    @classmethod
+    def set_wal_group_commit_size(cls, val: int) -> None:
+        cls._wal_group_commit_size = val
+
+    @classmethod
+    def get_wal_group_commit_ms(cls) -> float:
+        return cls._wal_group_commit_ms
+
+    @classmethod
+    def set_wal_group_commit_ms(cls, val: float) -> None:
+        cls._wal_group_commit_ms = val
+
+    @classmethod
+    def get_wal_checkpoint_bytes(cls) -> int:
+        return cls._wal_checkpoint_bytes
+
+    @classmethod
+    def set_wal_checkpoint_bytes(cls, val: int) -> None:
+        cls._wal_checkpoint_bytes = val
+
+    @classmethod
+    def get_wal_checkpoint_dirty_pages(cls) -> int:
+        return cls._wal_checkpoint_dirty_pages
+
+    @classmethod
+    def set_wal_checkpoint_dirty_pages(cls, val: int) -> None:
+        cls._wal_checkpoint_dirty_pages = val
+
     @staticmethod
     def line(rep_s: str, n_reps: int) -> str:
         return "".join([rep_s]*n_reps)
@@ -0,0 +1,37 @@
+import csv
+import json
+from itertools import islice
+from typing import Iterable, List
+
+from utils.settings import Settings
+
+def _plain(val):
+    # numpy scalars as the python numbers they hold, dates and times as text
+    return val.item() if hasattr(val, "item") else str(val)
+
+def table_export(rows: Iterable[List], columns: List[str], file_path: str, file_format: str = "CSV") -> int:
+    """
+    Writes rows to a file as they come, CSV with a header line or JSON Lines
+    (an object per row keyed by column name). Rows are written a batch at a
+    time through a buffer of Settings.get_export_buffer_bytes(), the whole
+    result is never held. Returns the number of rows written.
+    """
+    written = 0
+    batch_rows = Settings.get_scan_batch_rows()
+    rows = iter(rows)
+
+    with open(file_path, "w", newline="", encoding="utf-8",
+              buffering=Settings.get_export_buffer_bytes()) as out:
+        if file_format.upper() == "JSON":
+            encoder = json.JSONEncoder(default=_plain)
+            write = lambda batch: out.writelines(encoder.encode(dict(zip(columns, row))) + "\n" for row in batch)
+        else:
+            writer = csv.writer(out)
+            writer.writerow(columns)
+            write = writer.writerows
+
+        while batch := list(islice(rows, batch_rows)):
+            write(batch)
+            written += len(batch)
+
+    return written
@@ -0,0 +1,178 @@
+"""
+Write-ahead log of the statements that changed the database since the last
+checkpoint (save), replayed on startup so nothing is lost between saves.
+
+Each record is [payload length 4][crc32 4][lsn 8][payload], the payload is
+the statement's parse dictionary as compact JSON. A torn record at the end
+of the file (crash mid write) is cut off when the log is read.
+"""
+from __future__ import annotations
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from typing import Dict, Iterator, Tuple
+
+from utils.settings import Settings
+
+RECORD_HEADER = struct.Struct(">IIQ")
+
+SYNC_ALWAYS = "always"
+SYNC_GROUP = "group"
+SYNC_OFF = "off"
+
+
+class WriteAheadLog:
+    """
+    Appends go straight to the file, fsyncs follow the sync policy in Settings:
+    always - every commit is synced before it returns
+    group  - commits are synced together, once wal_group_commit_size of them are
+             waiting or wal_group_commit_ms after the first of them, whichever is first
+    off    - only checkpoints sync
+    """
+
+    def __init__(self) -> None:
+        self.path: str = None
+        self.next_lsn = 1
+        self.size = 0
+
+        self.commits = 0
+        self.syncs = 0
+
+        self._fd = None
+        self._unsynced = 0
+        self._first_unsynced = None
+        self._timer: threading.Timer = None
+        self._lock = threading.Lock()
+        self._suspended = 0
+
+    @property
+    def is_open(self) -> bool:
+        return self._fd is not None
+
+    def open(self, path: str) -> None:
+        self.close()
+        self.path = path
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+        self.size = os.fstat(self._fd).st_size
+
+    def close(self) -> None:
+        if self._fd is None:
+            return
+        self.sync()
+        os.close(self._fd)
+        self._fd = None
+
+    def read_records(self) -> Iterator[Tuple[int, Dict]]:
+        """
+        (lsn, record) in log order. The log is cut at the first record that is
+        incomplete or fails its checksum, and next_lsn moves past the last good one.
+        """
+        with open(self.path, "rb") as log:
+            data = log.read()
+
+        pos = 0
+        while pos + RECORD_HEADER.size <= len(data):
+            length, crc, lsn = RECORD_HEADER.unpack_from(data, pos)
+            body = data[pos + 8:pos + RECORD_HEADER.size + length]
+
+            if len(body) != 8 + length or zlib.crc32(body) != crc:
+                break
+
+            self.next_lsn = max(self.next_lsn, lsn + 1)
+            yield lsn, json.loads(body[8:])
+            pos += RECORD_HEADER.size + length
+
+        if pos != len(data):
+            os.ftruncate(self._fd, pos)
+            self.size = pos
+
+    def append(self, record: Dict) -> int:
+        """
+        Logs one committed statement, returns its lsn.
+        """
+        payload = json.dumps(record, separators=(",", ":"), default=str).encode("utf-8")
+
+        with self._lock:
+            lsn = self.next_lsn
+            body = lsn.to_bytes(8, "big") + payload
+            os.write(self._fd, RECORD_HEADER.pack(len(payload), zlib.crc32(body), lsn) + payload)
+
+            self.next_lsn += 1
+            self.size += RECORD_HEADER.size + len(payload)
+            self.commits += 1
+            self._unsynced += 1
+            if self._first_unsynced is None:
+                self._first_unsynced = time.monotonic()
+
+        self._commit()
+        return lsn
+
+    def _commit(self):
+        policy = Settings.get_wal_sync_policy()
+
+        if policy == SYNC_ALWAYS:
+            self.sync()
+
+        elif policy == SYNC_GROUP:
+            window = Settings.get_wal_group_commit_ms() / 1000
+            waited = time.monotonic() - self._first_unsynced
+
+            if self._unsynced >= Settings.get_wal_group_commit_size() or waited >= window:
+                self.sync()
+            elif self._timer is None:
+                # the rest of the group gets synced when the window closes
+                self._timer = threading.Timer(window - waited, self.sync)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def sync(self) -> None:
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+            if self._fd is None or not self._unsynced:
+                return
+
+            os.fsync(self._fd)
+            self.syncs += 1
+            self._unsynced = 0
+            self._first_unsynced = None
+
+    def truncate(self) -> None:
+        """
+        Empties the log once a checkpoint holds everything in it, lsns keep counting up.
+        """
+        self.sync()
+        with self._lock:
+            os.ftruncate(self._fd, 0)
+            os.fsync(self._fd)
+            self.size = 0
+
+    def needs_checkpoint(self, dirty_pages: int = 0) -> bool:
+        # pages written back wait in memory for the checkpoint too, not only the log
+        return self.is_open and (self.size >= Settings.get_wal_checkpoint_bytes()
+                                 or dirty_pages > Settings.get_wal_checkpoint_dirty_pages())
+
+    @property
+    def is_logging(self) -> bool:
+        return self.is_open and not self._suspended
+
+    @contextmanager
+    def suspended(self):
+        """
+        Nothing is logged inside, for statements run on behalf of a logged one,
+        replayed ones and those a checkpoint already covers.
+        """
+        self._suspended += 1
+        try:
+            yield self
+        finally:
+            self._suspended -= 1
+
+
+WAL = WriteAheadLog()
@@ -0,0 +1,106 @@
+import os
+import random
+import sys
+import unittest
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../src")
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../src/file_abstractions")
+
+from bplus_tree import BPlusNode, BPlusTree
+
+
+def leaf_chain(tree: BPlusTree):
+    node = tree.root
+    while not node.is_leaf:
+        node = tree._node(node.child_pages[0])
+
+    leaves = []
+    while node:
+        leaves.append(node)
+        node = tree.next_leaf(node)
+    return leaves
+
+
+def leaf_depths(tree: BPlusTree, node: BPlusNode, depth=0):
+    if node.is_leaf:
+        return {depth}
+    return set().union(*(leaf_depths(tree, tree._node(pg), depth + 1) for pg in node.child_pages))
+
+
+class BPlusTreeTests(unittest.TestCase):
+
+    def test_bulk_load_shape(self):
+        for fill in [1.0, 0.6]:
+            for n in [0, 1, 5, 6, 13, 250]:
+                tree = BPlusTree()
+                tree.bulk_load(range(n), fill_factor=fill)
+                leaves = leaf_chain(tree)
+
+                self.assertEqual([k for leaf in leaves for k in leaf.keys], list(range(n)))
+                self.assertEqual(len(leaf_depths(tree, tree.root)), 1)
+                for left, right in zip(leaves, leaves[1:]):
+                    self.assertEqual(right.page_no, left.page_no + 1)
+
+    def test_bulk_loaded_tree_accepts_inserts(self):
+        tree = BPlusTree()
+        tree.bulk_load(range(0, 200, 2))
+        for k in range(1, 200, 2):
+            tree.insert(k)
+
+        self.assertEqual([k for leaf in leaf_chain(tree) for k in leaf.keys], list(range(200)))
+
+    def test_append_packs_leaves_at_the_right_edge(self):
+        tree = BPlusTree()
+        for k in range(10):
+            tree.insert(k)
+        start = 10
+        for n in [1, 2, 7, 300, 4, 2676]:
+            tree.append(range(start, start + n))
+            start += n
+        # not past the last key, inserted one by one
+        tree.append([5.5, 3000])
+
+        leaves = leaf_chain(tree)
+        self.assertEqual([k for leaf in leaves for k in leaf.keys], sorted(list(range(3001)) + [5.5]))
+        self.assertIs(tree.rightmost_leaf(), leaves[-1])
+        self.assertEqual(len(leaf_depths(tree, tree.root)), 1)
+        self.assertTrue(all(tree.min_ptr_degree() <= len(leaf.keys) <= tree.max_ptr_degree() - 1 for leaf in leaves))
+        # far fewer leaves than the half full ones inserts leave
+        self.assertLess(len(leaves), 3000 / 4)
+
+        def check_parents(node):
+            for page_no in node.child_pages:
+                child = tree._node(page_no)
+                self.assertEqual(child.parent_page, node.page_no)
+                if not child.is_leaf:
+                    check_parents(child)
+        check_parents(tree.root)
+
+        for k in range(0, 3000, 3):
+            tree.delete(k)
+        self.assertEqual(list(tree.scan(2990)), [2990, 2992, 2993, 2995, 2996, 2998, 2999, 3000])
+
+    def test_scans_follow_inserts_and_deletes(self):
+        random.seed(4)
+        tree = BPlusTree()
+        keys = list(range(300))
+        random.shuffle(keys)
+        for k in keys:
+            tree.insert(k)
+        for k in keys[:220]:
+            tree.delete(k)
+
+        remaining = sorted(keys[220:])
+        leaves = leaf_chain(tree)
+        self.assertIs(tree.leftmost_leaf(), leaves[0])
+        self.assertIs(tree.rightmost_leaf(), leaves[-1])
+
+        self.assertEqual(list(tree.scan()), remaining)
+        self.assertEqual(list(tree.scan(reverse=True)), remaining[::-1])
+        for lo, hi in [(None, 150), (40, None), (97, 211), (500, None), (None, -1), (120, 120)]:
+            expected = [k for k in remaining if (lo is None or k >= lo) and (hi is None or k <= hi)]
+            self.assertEqual(list(tree.scan(lo, hi)), expected)
+            self.assertEqual(list(tree.scan(lo, hi, reverse=True)), expected[::-1])
+
+
+if __name__ == "__main__":
+    unittest.main()
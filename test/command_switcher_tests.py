@@ -0,0 +1,150 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../src")
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../src/file_abstractions")
+sys.path.append(os.path.dirname(os.path.realpath(__file__)))
+
+import fast_parser as fp
+from command_switcher import PreparedStatement, switch_and_delegate
+from table import Table
+from utils.settings import Settings
+from utils.utils import blockPrint, enablePrint
+from wal import WAL
+from table_fixtures import make_table
+
+
+class PreparedStatementTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tables = {"t": make_table(0)}
+        self.indices = {}
+
+    def test_cached_parse_is_a_fresh_copy(self):
+        first = fp.parse("SELECT a FROM t WHERE b = 'x  y';")
+        first["condition"]["value"] = 0
+        again = fp.parse("  SELECT a   FROM t\n WHERE b = 'x  y'; ")
+        self.assertEqual(again["condition"]["value"], "x  y")
+
+    def test_prepared_statements_skip_the_parser(self):
+        insert = PreparedStatement("INSERT INTO TABLE (a, b, c) t VALUES (?, ?, ?);", self.tables, self.indices)
+        select = PreparedStatement("SELECT a, b FROM t WHERE c = ? AND a >= ?", self.tables, self.indices)
+        count = PreparedStatement("SELECT COUNT(*), MAX(a) FROM t WHERE b <> ?;", self.tables, self.indices)
+        self.assertEqual((insert.parameter_count, select.parameter_count), (3, 2))
+
+        blockPrint()
+        with mock.patch.object(fp, "parse", side_effect=AssertionError):
+            for i in range(100):
+                insert.execute([i, f"row{i % 7}", i % 3])
+            rows, names = select.execute([1, 90])
+            counted, _ = count.execute(["row0"])
+        enablePrint()
+
+        self.assertEqual(names, ["a", "b"])
+        self.assertEqual([[int(a), b] for a, b in rows], [[a, f"row{a % 7}"] for a in range(90, 100) if a % 3 == 1])
+        self.assertEqual(counted, [[100 - 15, 99]])
+        self.assertRaises(ValueError, select.execute, [1])
+
+        # planned again against the table now under that name
+        self.tables["t"] = make_table(0)
+        self.assertEqual(select.execute([1, 0]), ([], ["a", "b"]))
+
+    def test_executed_statements_are_logged_with_their_values(self):
+        tmp = tempfile.TemporaryDirectory()
+        WAL.open(os.path.join(tmp.name, "rio.db.wal"))
+        try:
+            blockPrint()
+            switch_and_delegate(fp.parse("PREPARE ins FROM \"INSERT INTO TABLE (a, b, c) t VALUES (?, 'x', ?)\";"),
+                                self.tables, self.indices)
+            switch_and_delegate(fp.parse("EXECUTE ins USING 5, 6;"), self.tables, self.indices)
+            switch_and_delegate(fp.parse("EXECUTE ins USING 7, 8;"), self.tables, self.indices)
+            enablePrint()
+            records = [rec for _, rec in WAL.read_records()]
+        finally:
+            WAL.close()
+            tmp.cleanup()
+
+        self.assertEqual(records, [
+            {"column_name_list": ["a", "b", "c"], "table_name": "t", "value_list": ["5", "x", "6"],
+             "command": "INSERT INTO TABLE"},
+            {"column_name_list": ["a", "b", "c"], "table_name": "t", "value_list": ["7", "x", "8"],
+             "command": "INSERT INTO TABLE"}
+        ])
+
+        # replayed like any other logged statement
+        self.tables["t"] = make_table(0)
+        blockPrint()
+        for rec in records:
+            switch_and_delegate(rec, self.tables, self.indices)
+        enablePrint()
+        rows, _ = self.tables["t"].select({"column_name_list": ["a", "c"], "condition": {}})
+        self.assertEqual([[int(v) for v in row] for row in rows], [[5, 6], [7, 8]])
+
+
+
+class CopyTests(unittest.TestCase):
+
+    def test_copy_is_logged_as_inserts(self):
+        tables = {"t": make_table(0)}
+        tmp = tempfile.TemporaryDirectory()
+        path = os.path.join(tmp.name, "rows.csv")
+        with open(path, "w") as f:
+            f.writelines(f"{a},row{a},{a % 3}\n" for a in range(25))
+
+        chunk_rows = Settings.get_copy_chunk_rows()
+        Settings.set_copy_chunk_rows(10)
+        WAL.open(os.path.join(tmp.name, "rio.db.wal"))
+        try:
+            blockPrint()
+            switch_and_delegate(fp.parse(f"COPY t FROM '{path}';"), tables, {})
+            enablePrint()
+            records = [rec for _, rec in WAL.read_records()]
+        finally:
+            WAL.close()
+            Settings.set_copy_chunk_rows(chunk_rows)
+            tmp.cleanup()
+
+        # a chunk per record, replayed without the file
+        self.assertEqual([(rec["command"], len(rec["value_lists"])) for rec in records],
+                         [("INSERT INTO TABLE", 10), ("INSERT INTO TABLE", 10), ("INSERT INTO TABLE", 5)])
+        tables["t"] = make_table(0)
+        blockPrint()
+        for rec in records:
+            switch_and_delegate(rec, tables, {})
+        enablePrint()
+        rows, _ = tables["t"].select({"column_name_list": ["a", "b"], "condition": {}})
+        self.assertEqual([[int(a), b] for a, b in rows], [[a, f"row{a}"] for a in range(25)])
+
+
+class ExportTests(unittest.TestCase):
+
+    def test_select_into_outfile(self):
+        tables = {"t": make_table(0)}
+        tables["t"].insert_many({"column_name_list": ["a", "b", "c"],
+                                 "value_lists": [[a, f"row, {a}", a % 3] for a in range(3000)]})
+        tmp = tempfile.TemporaryDirectory()
+        csv_path, json_path = os.path.join(tmp.name, "out.csv"), os.path.join(tmp.name, "out.jsonl")
+        try:
+            blockPrint()
+            with mock.patch("command_switcher.table_format_print", side_effect=AssertionError):
+                switch_and_delegate(fp.parse(f"SELECT * FROM t WHERE c = 1 INTO OUTFILE '{csv_path}';"), tables, {})
+                select = PreparedStatement(f"SELECT c, a FROM t WHERE a >= ? INTO OUTFILE '{json_path}' FORMAT JSON",
+                                           tables, {})
+                written = select.execute([2998])
+            enablePrint()
+            with open(csv_path) as f:
+                csv_lines = f.read().splitlines()
+            with open(json_path) as f:
+                json_lines = f.read().splitlines()
+        finally:
+            tmp.cleanup()
+
+        self.assertEqual(csv_lines, ["a,b,c"] + [f'{a},"row, {a}",1' for a in range(1, 3000, 3)])
+        self.assertEqual(written, 2)
+        self.assertEqual(json_lines, ['{"c": 1, "a": 2998}', '{"c": 2, "a": 2999}'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+import os
+import sys
+import tempfile
+import unittest
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../src")
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../src/file_abstractions")
+sys.path.append(os.path.dirname(os.path.realpath(__file__)))
+
+from database_file import DatabaseFile, KIND_BLOB, KIND_TABLE
+from pager import BufferPool
+from table import Table
+from utils.utils import blockPrint, enablePrint
+from table_fixtures import CDATA, all_rows, fill, insert_rows, row
+
+
+class DatabaseFileTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "rio.db")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def reopen(self, database):
+        database.close()
+        return DatabaseFile.open(self.path)
+
+    def test_tables_and_blobs_survive_reopen(self):
+        database = DatabaseFile.open(self.path, 512)
+        fill(database, "t", range(200))
+        fill(database, "u", range(0, 60, 3))
+        database.write_blob("t.a", b"index bytes" * 100)
+        database.checkpoint(7)
+
+        database = self.reopen(database)
+        self.assertEqual(database.checkpoint_lsn, 7)
+        self.assertEqual(sorted(database.names(KIND_TABLE)), ["t", "u"])
+        self.assertEqual(database.read_blob("t.a"), b"index bytes" * 100)
+
+        blockPrint()
+        t = Table.from_database_file(database, "t", 200, dict(CDATA), "t")
+        u = Table.from_database_file(database, "u", 60, dict(CDATA), "u")
+        enablePrint()
+        # from the leaf page headers, before anything is decoded
+        self.assertEqual(t.bptree.count(), 200)
+        # the zone maps of column a came back with the interior pages
+        root = t.bptree.root
+        self.assertEqual(t.bptree.child_zone(root, root.child_pages[0])[0][0], 0)
+        self.assertEqual(t.bptree.child_zone(root, root.child_pages[-1])[0][1], 199)
+        self.assertEqual(all_rows(t), [tuple(row(a)) for a in range(200)])
+        self.assertEqual(all_rows(u), [tuple(row(a)) for a in range(0, 60, 3)])
+        self.assertEqual(os.path.getsize(self.path), database.page_count * 512)
+        database.close()
+
+    def test_directory_overflows_page_zero(self):
+        database = DatabaseFile.open(self.path, 512)
+        names = [f"table_with_a_long_name_{i}" for i in range(40)]
+        for name in names:
+            database.write_blob(name, name.encode())
+        database.checkpoint(1)
+
+        database = self.reopen(database)
+        self.assertEqual(database.names(KIND_BLOB), names)
+        self.assertEqual([database.read_blob(name) for name in names], [name.encode() for name in names])
+        database.close()
+
+    def test_pages_decode_in_place_from_the_map(self):
+        database = DatabaseFile.open(self.path, 512)
+        table = fill(database, "t", range(50))
+        database.checkpoint(1)
+        leaf_no = next(p for p in range(1, database.page_count) if database.read_page(p)[0] == 13)
+
+        page = database.read_page(leaf_no)
+        self.assertIsInstance(page, memoryview)
+        codec = table.bptree.pager.codec
+        self.assertEqual(codec.decode(page, leaf_no).keys, codec.decode(bytes(page), leaf_no).keys)
+        database.close()
+
+    def test_checkpoint_writes_only_changed_pages(self):
+        database = DatabaseFile.open(self.path, 512)
+        table = fill(database, "t", range(300))
+        database.checkpoint(1)
+
+        insert_rows(table, [300])
+        table.bptree.flush()
+        # the leaf the row went to, maybe a split and its parent, plus the header
+        self.assertLess(database.dirty_pages, 6)
+        database.checkpoint(2)
+        self.assertEqual(database.dirty_pages, 0)
+        database.close()
+
+    def test_freed_pages_are_reused(self):
+        database = DatabaseFile.open(self.path, 512)
+        table = fill(database, "t", range(300))
+        database.checkpoint(1)
+        pages = database.page_count
+
+        table.bptree.drop()
+        fill(database, "u", range(300))
+        database.checkpoint(2)
+
+        database = self.reopen(database)
+        self.assertEqual(database.page_count, pages)
+        self.assertEqual(database.names(KIND_TABLE), ["u"])
+        database.close()
+
+    def test_unfinished_checkpoint_is_rolled_back(self):
+        database = DatabaseFile.open(self.path, 512)
+        fill(database, "t", range(100))
+        database.checkpoint(1)
+        before = open(self.path, "rb").read()
+
+        table = fill(database, "u", range(100))
+        table.bptree.flush()
+        database._write_header()
+        database._write_journal()
+        # pages overwritten and the file grown, then the process stops
+        for page_no, page in database._written.items():
+            os.pwrite(database._fd, b"\xff" * len(page), page_no * 512)
+
+        database = self.reopen(database)
+        self.assertEqual(open(self.path, "rb").read(), before)
+        self.assertEqual(database.checkpoint_lsn, 1)
+        self.assertFalse(os.path.exists(database.journal_path))
+        database.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import json
+import os
+import sys
+import unittest
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../src")
+
+from pyparsing import ParseException
+import fast_parser as fp
+import query_parser as qp
+import query_test_cases as qtc
+
+
+class FastParserTests(unittest.TestCase):
+
+    def test_query_test_cases(self):
+        cases = [
+            (qtc.create_table_test_case, qtc.create_table_test_result),
+            (qtc.create_default_table_test_case, qtc.create_default_table_test_result),
+            (qtc.create_index_test_case, qtc.create_index_test_result),
+            (qtc.drop_table_test_case, qtc.drop_table_test_result),
+            (qtc.insert_row_test_case, qtc.insert_row_test_result),
+            (qtc.delete_row_test_case, qtc.delete_row_test_result),
+            (qtc.delete_row_compound_test_case, qtc.delete_row_compound_test_result),
+            (qtc.delete_row_test_case_no_cond, qtc.delete_row_test_result_no_cond),
+            (qtc.update_row_test_case, qtc.update_row_test_result),
+            (qtc.select_test_case1, qtc.select_test_result1),
+            (qtc.select_test_case2, qtc.select_test_result2),
+        ]
+        for case, result in cases:
+            self.assertEqual(json.dumps(fp.Parser(case).statement(), indent="  "), result)
+
+    def test_same_dictionaries_as_pyparsing(self):
+        statements = [
+            "show tables;",
+            "select * from t;",
+            "SELECT DISTINCT a, count FROM t WHERE NOT a>=-1.5e3 LIMIT 007 OFFSET 3;",
+            "SELECT COUNT(*), sum(b), MAX(rowid) FROM t WHERE (a = 1 OR b <> 'x') AND NOT (c < 2 AND d > ?);",
+            "SELECT a FROM t WHERE a = 1 AND (b = 2 AND (c = 3 OR d = 4)) OR NOT (e = 5 OR f = 6);",
+            "INSERT INTO TABLE t VALUES (NULL, 'it''s', \"say \"\"hi\"\"\", +.5, ?);",
+            "INSERT INTO TABLE (a, b) t VALUES (1, 'x'), (2, NULL), (?, ?);",
+            "UPDATE t SET a=NULL WHERE b<>'';",
+            "CREATE TABLE x (a INT PRIMARY KEY, b TEXT NOT NULL UNIQUE, n NULL, c DATETIME, d DATE UNIQUE NOT NULL);",
+            "PREPARE p FROM \"SELECT a FROM t WHERE b = 'x' AND a > ?\";",
+            "EXECUTE p USING 1, 'two', NULL;",
+            "execute p;",
+            "COPY t FROM 'rows.csv';",
+            "SELECT a, b FROM t WHERE a > 1 LIMIT 5 INTO OUTFILE 'out.csv';",
+            "select count(*) from t into outfile \"out.jsonl\" format Json;",
+            "copy t (b, a) from \"/tmp/rows, 2.csv\" with header;",
+            "DROP TABLE t; anything after the statement $",
+        ]
+        for text in statements:
+            self.assertEqual(json.dumps(fp.Parser(text).statement()),
+                             json.dumps(qp.statement.parse_string(text)[0]), text)
+
+    def test_errors_come_from_pyparsing(self):
+        for text in ["SELECT FROM t;", "SELECT a FROM t WHERE select = 1;", "SELECT a FROM t LIMIT 5OFFSET 2;",
+                     "CREATE TABLE davisbase_tables2 (a INT);", "SELECT count(*), a FROM t;",
+                     "CREATE TABLE t (a INT UNIQUE UNIQUE UNIQUE UNIQUE);", "DELETE FROM TABLE t"]:
+            self.assertRaises(ValueError, lambda: fp.Parser(text).statement())
+            self.assertRaises(ParseException, fp.parse_statement, text)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import os
+import random
+import sys
+import unittest
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../src")
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../src/file_abstractions")
+
+from btree import BTree
+from enums import DataType
+from index import Index
+
+
+class IndexTests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        random.seed(7)
+        self.pairs = [(random.randint(0, 50), rid) for rid in range(400)]
+        self.index = Index.build("MiddleInt", 1, DataType.INT, self.pairs)
+        return super().setUp()
+
+    def expected(self, pred):
+        return sorted(rid for v, rid in self.pairs if pred(v))
+
+    def test_bulk_load_keeps_btree_invariants(self):
+        for n in [0, 1, 5, 6, 11, 12, 97, 1000]:
+            tree = BTree()
+            tree.bulk_load(range(n))
+            self.assertEqual(list(tree.iter_range()), list(range(n)))
+
+            keys = list(range(n))
+            random.shuffle(keys)
+            for k in keys:
+                tree.delete(k)
+            self.assertEqual(list(tree.iter_range()), [])
+
+    def test_point_and_range_lookups(self):
+        cond = lambda comp, val, neg="FALSE": {"negated": neg, "comparator": comp, "value": val}
+
+        self.assertEqual(sorted(self.index.row_ids_for(cond("=", 10))), self.expected(lambda v: v == 10))
+        self.assertEqual(sorted(self.index.row_ids_for(cond(">", 40))), self.expected(lambda v: v > 40))
+        self.assertEqual(sorted(self.index.row_ids_for(cond("<=", 3))), self.expected(lambda v: v <= 3))
+        self.assertEqual(sorted(self.index.row_ids_for(cond(">=", 5, "TRUE"))), self.expected(lambda v: v < 5))
+        self.assertIsNone(self.index.row_ids_for(cond("<>", 5)))
+
+    def test_maintenance(self):
+        self.index.delete(self.pairs[0][0], 0)
+        self.index.insert(99, 0)
+        self.assertNotIn(0, self.index.lookup(self.pairs[0][0]))
+        self.assertEqual(self.index.lookup(99), [0])
+
+    def test_byte_stream_round_trip(self):
+        # small pages force the long row id lists to span several cells
+        b_stream = self.index.to_byte_stream(64)
+        self.assertEqual(len(b_stream) % 64, 0)
+
+        loaded = Index.from_byte_stream(b_stream, "MiddleInt", 1, DataType.INT, 64)
+        for value in range(51):
+            self.assertEqual(loaded.lookup(value), self.index.lookup(value))
+
+
+if __name__ == "__main__":
+    unittest.main()
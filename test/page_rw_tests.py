@@ -1,13 +1,15 @@
+import datetime as dt
 import gc
 import io
 import os
 import sys
 import unittest
 import numpy as np
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../src")
 sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../src/file_abstractions")
 
-from record import Record
-from page_writer import LeafPageWriter
+from record import Record, RecordCodec, RouterCell
+from page_writer import LeafPageWriter, InternalPageWriter
 from enums import DataType
 from header import PageHeader
 
@@ -18,17 +20,16 @@ class FileAbstractDevTests(unittest.TestCase):
         self.output = io.BytesIO()
         self.perm_record = Record(
             row_id=1,
-            num_columns=np.uint8(3),
-            data_types=[
+            schema=RecordCodec.for_types((
                 DataType.TEXT,
                 DataType.INT,
                 DataType.TEXT
-            ],
-            data_values=[
+            )),
+            data_values=(
                 "asdasda",
                 10,
                 "scsc"
-            ]
+            )
         )
         return super().setUp()
 
@@ -81,6 +82,56 @@ class FileAbstractDevTests(unittest.TestCase):
         x = LeafPageWriter.from_byte_stream(b_stream, 1)
         self.assertEqual(x, y)
 
+    def bytes_to_internal_node_test(self):
+        y = InternalPageWriter(
+            0,
+            keys=[RouterCell(10, 1), RouterCell(20, 2)],
+            last_child_pg=3
+        )
+        b_stream = y.to_byte_stream(0xFFFFFFFF)
+        x = InternalPageWriter.from_byte_stream(b_stream, 0)
+        node = x.to_bpnode()
+        self.assertEqual(node.keys, [10, 20])
+        self.assertEqual(x.child_page_numbers(), [1, 2, 3])
+
+    def record_codec_test(self):
+        types = [DataType.INT, DataType.TEXT, DataType.FLOAT, DataType.SMALLINT, DataType.DATE, DataType.TEXT,
+                 DataType.TIME, DataType.DOUBLE]
+        codec = RecordCodec(types)
+        values = [np.int32(-7), "héllo", np.float32(1.5), np.int16(300), dt.date(2021, 3, 4), "",
+                  dt.time(13, 45, 30), np.double(-2.25)]
+
+        # same cell as value by value, and back
+        cell = codec.encode(5, values)
+        self.assertEqual(cell, codec.encode_by_value(5, values))
+        decoded = codec.decode(b"\x00" + cell, 1)
+        self.assertEqual((decoded.row_id, decoded.data_values), (5, tuple(values)))
+        self.assertIs(decoded.schema, codec)
+        self.assertIsInstance(decoded.data_values[3], np.int16)
+
+        # a column at a time, written back as read until changed
+        lazy = codec.decode(cell)
+        self.assertEqual([lazy.value(6), lazy.value(1), lazy.value(7)], [values[6], values[1], values[7]])
+        self.assertIs(lazy.to_byte_stream(), lazy.to_byte_stream())
+        lazy.update_val({"column_ord": 0, "column_name": "a", "value": np.int32(8)})
+        self.assertEqual(lazy.to_byte_stream(), codec.encode(5, [np.int32(8)] + values[1:]))
+
+        # a new record is encoded once, size checks and page writes reuse it
+        fresh = Record(7, codec, values)
+        self.assertEqual(fresh.byte_size(), len(cell))
+        self.assertIs(fresh.to_byte_stream(), fresh.to_byte_stream())
+
+        # NULLs keep their place
+        values[1] = values[3] = None
+        self.assertEqual(codec.decode(codec.encode(6, values)).value(4), values[4])
+        decoded = codec.decode(codec.encode(6, values))
+        self.assertEqual(decoded.data_values, tuple(values))
+        self.assertIs(decoded.schema, codec)
+
+        # one schema per list of types, shared by the records of every table having it
+        self.assertIs(RecordCodec.for_types(tuple(types)), RecordCodec.for_types(tuple(types)))
+        self.assertFalse(hasattr(decoded, "__dict__"))
+
 if __name__ == "__main__":
     suite = unittest.TestSuite()
     suite.addTest(FileAbstractDevTests("header_to_bytes_test"))
@@ -89,5 +140,7 @@ if __name__ == "__main__":
     suite.addTest(FileAbstractDevTests("bytes_to_header_test"))
     suite.addTest(FileAbstractDevTests("bytes_to_record_test"))
     suite.addTest(FileAbstractDevTests("bytes_to_page_test"))
+    suite.addTest(FileAbstractDevTests("bytes_to_internal_node_test"))
+    suite.addTest(FileAbstractDevTests("record_codec_test"))
     runner = unittest.TextTestRunner()
     runner.run(suite)
\ No newline at end of file
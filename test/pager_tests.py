@@ -0,0 +1,58 @@
+import os
+import random
+import sys
+import unittest
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../src")
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../src/file_abstractions")
+sys.path.append(os.path.dirname(os.path.realpath(__file__)))
+
+from pager import BufferPool
+from table import Table
+from utils.utils import blockPrint, enablePrint
+from table_fixtures import CDATA, all_rows, make_table, row
+
+
+class PagerTests(unittest.TestCase):
+
+    def test_small_pool_pages_out_and_back(self):
+        pool = BufferPool(capacity=8)
+        table = make_table(300, pool)
+        self.assertLessEqual(len(pool.frames), 8)
+        self.assertGreater(pool.evictions, 0)
+
+        random.seed(5)
+        gone = set(random.sample(range(300), 120))
+        for a in gone:
+            table.delete({"negated": "FALSE", "column_name": "a", "comparator": "=", "value": a})
+        table.update({"column_name": "b", "value": "big"},
+                     {"negated": "FALSE", "column_name": "a", "comparator": ">", "value": 250})
+
+        expected = [(a, "big", a % 3) if a > 250 else tuple(row(a)) for a in range(300) if a not in gone]
+        self.assertEqual(all_rows(table), expected)
+
+        blockPrint()
+        loaded = Table.from_byte_stream(table.to_byte_stream(), 512, table.record_count, dict(CDATA), "t")
+        enablePrint()
+        self.assertEqual(all_rows(loaded), expected)
+
+    def test_hit_and_miss_counters(self):
+        pool = BufferPool(capacity=4)
+        table = make_table(60, pool)
+        table.bptree.flush()
+
+        pool.reset_stats()
+        all_rows(table)
+        misses = pool.misses
+        self.assertGreater(misses, 0)
+
+        # a pool big enough for the whole table serves the second scan from memory
+        pool.capacity = 1000
+        all_rows(table)
+        pool.reset_stats()
+        all_rows(table)
+        self.assertEqual(pool.misses, 0)
+        self.assertGreater(pool.hits, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -87,6 +87,38 @@ delete_row_test_result = """{
   }
 }"""
 
+delete_row_compound_test_case = """
+DELETE FROM TABLE example_table
+WHERE age >= 18 AND NOT (name = 'joe' OR city <> 'Dallas');"""
+
+delete_row_compound_test_result = """{
+  "command": "DELETE",
+  "table_name": "example_table",
+  "condition": {
+    "operator": "AND",
+    "operands": [
+      {
+        "negated": "FALSE",
+        "column_name": "age",
+        "comparator": ">=",
+        "value": "18"
+      },
+      {
+        "negated": "TRUE",
+        "column_name": "name",
+        "comparator": "=",
+        "value": "joe"
+      },
+      {
+        "negated": "TRUE",
+        "column_name": "city",
+        "comparator": "<>",
+        "value": "Dallas"
+      }
+    ]
+  }
+}"""
+
 delete_row_test_case_no_cond = "DELETE FROM TABLE example_table;"
 
 delete_row_test_result_no_cond = """{
@@ -56,6 +56,11 @@ class parsingTest(unittest.TestCase):
         res_jstr = json.dumps(res[0], indent="  ")
         self.assertEqual(res_jstr, qtc.delete_row_test_result)
 
+    def test_row_deletion_compound_where(self):
+        res = qp.delete_record_stmt.parse_string(qtc.delete_row_compound_test_case)
+        res_jstr = json.dumps(res[0], indent="  ")
+        self.assertEqual(res_jstr, qtc.delete_row_compound_test_result)
+
     def test_row_updates(self):
         res = qp.update_record_stmt.parse_string(qtc.update_row_test_case)
         res_jstr = json.dumps(res[0], indent="  ")
@@ -0,0 +1,60 @@
+"""
+Bytes per row held in memory by a table's leaves: records decoded from their
+cells, each behind a DataPointer in a leaf BPlusNode, 40 to a node.
+
+    python row_memory_benchmark.py [rows]
+
+1M rows of (INT, TEXT, FLOAT, SMALLINT, DATE), measured with tracemalloc:
+dataclass records with a list of types each, DataPointers keeping their
+extractor and nodes with a __dict__ took 525 bytes/row, slotted records
+sharing the table's RecordCodec as their schema, with tuple values, take 388.
+Most of what's left are the values themselves (numpy scalars, str, date).
+
+Records now keep their cell and decode values as they are read: 156 bytes/row
+while unread, 396 once every value was read (cell and values both kept).
+"""
+import datetime as dt
+import gc
+import os
+import sys
+import tracemalloc
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../src")
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../src/file_abstractions")
+
+import numpy as np
+from bplus_tree import BPlusNode
+from btree import DataPointer
+from enums import DataType
+from record import Record, RecordCodec
+
+KEYS_PER_LEAF = 40
+
+
+def leaves(codec: RecordCodec, cells: list) -> list:
+    nodes = []
+    for i, cell in enumerate(cells):
+        if i % KEYS_PER_LEAF == 0:
+            nodes.append(BPlusNode(True, 0, len(nodes)))
+        nodes[-1].keys.append(DataPointer(Record.get_id, codec.decode(cell)))
+    return nodes
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    codec = RecordCodec.for_types((DataType.INT, DataType.TEXT, DataType.FLOAT, DataType.SMALLINT, DataType.DATE))
+    cells = [codec.encode(i, (np.int32(i), f"row {i % 1000}", np.float32(i / 2), np.int16(i % 300),
+                              dt.date(2021, 1, 1 + i % 28)))
+             for i in range(rows)]
+
+    gc.collect()
+    tracemalloc.start()
+    nodes = leaves(codec, cells)
+    size, _ = tracemalloc.get_traced_memory()
+    print(f"{rows} rows in {len(nodes)} leaves: {size / rows:.1f} bytes/row")
+
+    for node in nodes:
+        for entry in node.keys:
+            entry.data.data_values
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"every value read: {size / rows:.1f} bytes/row")
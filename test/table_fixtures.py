@@ -0,0 +1,58 @@
+"""
+Tables the tests share, a is the primary key, row(a) the values inserted for it.
+"""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../src")
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../src/file_abstractions")
+
+from bplus_tree import BPlusTree
+from pager import Pager
+from page_writer import TablePageCodec
+from table import Table
+from utils.utils import blockPrint, enablePrint
+
+CDATA = {
+    "column_names": ["a", "b", "c"],
+    "data_types": ["INT", "TEXT", "INT"],
+    "nullability": ["NO", "NO", "NO"],
+    "column_keys": ["PRI", "", ""]
+}
+
+
+def row(a):
+    return [a, f"row{a % 7}", a % 3]
+
+
+def insert_rows(table, rows):
+    blockPrint()
+    for a in rows:
+        table.insert({"column_name_list": ["a", "b", "c"], "value_list": row(a)})
+    enablePrint()
+    return table
+
+
+def make_table(n_rows, pool=None):
+    # pages of its own, cached in pool instead of the shared buffer pool if given
+    blockPrint()
+    table = Table(512)
+    if pool is not None:
+        table.bptree = BPlusTree(pager=Pager(512, TablePageCodec()), pool=pool)
+    table.update_metadata(dict(CDATA), 0, "t")
+    enablePrint()
+    return insert_rows(table, range(n_rows))
+
+
+def fill(database, name, rows):
+    # a table in the database file, its pages written back to it
+    blockPrint()
+    table = Table.from_database_file(database, name, 0, dict(CDATA), name)
+    enablePrint()
+    insert_rows(table, rows)
+    table.bptree.flush()
+    return table
+
+
+def all_rows(table):
+    rows, _ = table.select({"column_name_list": [], "condition": {}})
+    return sorted((int(a), b, int(c)) for a, b, c in rows)
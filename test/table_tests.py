@@ -0,0 +1,366 @@
+import os
+import sys
+import tempfile
+import unittest
+import numpy as np
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../src")
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../src/file_abstractions")
+sys.path.append(os.path.dirname(os.path.realpath(__file__)))
+
+from record import COMP_FUNCT as COMP, Record
+from table import Table
+from utils.settings import Settings
+from utils.utils import blockPrint, enablePrint
+from table_fixtures import CDATA, make_table
+
+
+def select(table, columns=(), condition=None, **extra):
+    return [[v if v is None or isinstance(v, str) else int(v) for v in row]
+            for row in table.iter_select({"column_name_list": list(columns), "condition": condition or {}, **extra})]
+
+
+class SelectTests(unittest.TestCase):
+
+    def setUp(self):
+        self.table = make_table(200)
+
+    def test_rows_keep_duplicates_and_row_order(self):
+        self.assertEqual(select(self.table, ["c"]), [[i % 3] for i in range(200)])
+        self.assertEqual(select(self.table, ["c"], distinct=True), [[0], [1], [2]])
+        self.assertEqual(select(self.table, ["b", "c"], distinct=True),
+                         [[f"row{i % 7}", i % 3] for i in range(21)])
+
+    def test_limit_and_offset_stop_the_scan(self):
+        cond = {"negated": "FALSE", "column_name": "c", "comparator": "=", "value": 1}
+        self.assertEqual(select(self.table, ["a"], dict(cond), limit=4, offset=2), [[7], [10], [13], [16]])
+        self.assertEqual(select(self.table, ["a"], limit=0), [])
+
+        rows = self.table.iter_select({"column_name_list": ["a"], "condition": {}, "limit": 3})
+        fetched = self.table.bptree.pool.misses + self.table.bptree.pool.hits
+        self.assertEqual(len(list(rows)), 3)
+        # only the first leaf was read
+        self.assertEqual(self.table.bptree.pool.misses + self.table.bptree.pool.hits - fetched, 1)
+
+    def test_index_lookup_comes_back_in_row_order(self):
+        self.table.create_index("c")
+        cond = {"negated": "FALSE", "column_name": "c", "comparator": ">=", "value": 1}
+        rows = select(self.table, ["a"], cond, limit=5)
+        self.assertEqual(rows, [[1], [2], [4], [5], [7]])
+
+    def test_batched_conditions_match_record_by_record(self):
+        batch = Settings.get_scan_batch_rows()
+        Settings.set_scan_batch_rows(16)
+        try:
+            records = [key.data for key in self.table.bptree.scan()]
+            for column, value in [("c", 1), ("a", 57), ("b", "row3")]:
+                for comp in ["=", "<>", "<", ">", "<=", ">="]:
+                    for negated in ["FALSE", "TRUE"]:
+                        cond = {"negated": negated, "column_name": column, "comparator": comp, "value": value}
+                        rows = select(self.table, ["a"], dict(cond))
+
+                        self.table._validate_condition(cond)
+                        cond["column_ord"] = self.table._column_name_to_ord(column)
+                        expected = [[int(rec.row_id)] for rec in records if rec.matches_condition(cond)]
+                        self.assertEqual(rows, expected, cond)
+                        self.assertEqual(Record.filter_mask(records, cond).sum(), len(expected))
+        finally:
+            Settings.set_scan_batch_rows(batch)
+
+    def test_zone_maps_skip_leaves(self):
+        tree = self.table.bptree
+        cond = {"negated": "FALSE", "column_name": "a", "comparator": ">=", "value": 190}
+        fetched = tree.pool.hits + tree.pool.misses
+        self.assertEqual(select(self.table, ["a"], cond), [[a] for a in range(190, 200)])
+        self.assertLess(tree.pool.hits + tree.pool.misses - fetched, 12)
+
+        for a in range(0, 200, 4):
+            self.table.update({"column_name": "c", "value": a + 1000},
+                              {"negated": "FALSE", "column_name": "a", "comparator": "=", "value": a})
+        self.table.delete({"negated": "FALSE", "column_name": "a", "comparator": "<", "value": 30})
+        self.table.delete({"negated": "TRUE", "column_name": "c", "comparator": "<>", "value": 1})
+        for a in range(200, 260):
+            self.table.insert({"column_name_list": ["a", "b", "c"], "value_list": [a, "new", a % 5]})
+
+        def subtree_zone(node):
+            if node.is_leaf:
+                return self.table._leaf_zone(node.keys)
+            for page_no in node.child_pages:
+                self.assertEqual(tree.child_zone(node, page_no), subtree_zone(tree._node(page_no)))
+            return tree._zone(node)
+        subtree_zone(tree.root)
+
+        rows = {a: (1000 + a if a % 4 == 0 else a % 3) for a in range(30, 200)}
+        rows = {a: c for a, c in rows.items() if c != 1} | {a: a % 5 for a in range(200, 260)}
+        for comp, value in [(">", 1100), ("=", 4), ("<=", 2), ("<>", 0)]:
+            cond = {"negated": "FALSE", "column_name": "c", "comparator": comp, "value": value}
+            expected = [[a] for a, c in sorted(rows.items()) if COMP[comp](c, value)]
+            self.assertEqual(select(self.table, ["a"], cond), expected)
+
+    def test_compound_conditions(self):
+        def pred(column, comp, value, negated="FALSE"):
+            return {"negated": negated, "column_name": column, "comparator": comp, "value": value}
+
+        def both(*operands):
+            return {"operator": "AND", "operands": list(operands)}
+
+        def either(*operands):
+            return {"operator": "OR", "operands": list(operands)}
+
+        rows = [(a, f"row{a % 7}", a % 3) for a in range(200)]
+        cases = [
+            (both(pred("c", "=", 1), pred("a", "<", 40)), lambda a, b, c: c == 1 and a < 40),
+            (either(pred("b", "=", "row3"), pred("a", ">=", 195)), lambda a, b, c: b == "row3" or a >= 195),
+            (both(pred("a", ">", 150, "TRUE"), either(pred("c", "<>", 0), pred("b", "<", "row2"))),
+             lambda a, b, c: a <= 150 and (c != 0 or b < "row2")),
+            (both(pred("rowid", ">=", 20), pred("rowid", "<", 30), pred("c", "=", 2)),
+             lambda a, b, c: 20 <= a < 30 and c == 2),
+        ]
+        self.table.create_index("c")
+        for condition, expected in cases:
+            self.assertEqual(select(self.table, ["a"], condition), [[a] for a, b, c in rows if expected(a, b, c)])
+
+        # c = 1 matches a third of the rows, a scan beats the index
+        cond = both(pred("c", "=", 1), pred("a", "<", 40))
+        self.table._validate_condition(cond)
+        self.assertIsNone(self.table._index_row_ids(cond))
+        self.assertEqual(cond["operands"][0]["column_name"], "a")
+
+        pool = self.table.bptree.pool
+        fetched = pool.hits + pool.misses
+        self.assertEqual(select(self.table, ["a"], both(pred("rowid", "<", 5), pred("b", "<>", "x"))), [[a] for a in range(5)])
+        self.assertLess(pool.hits + pool.misses - fetched, 12)
+
+        self.table.delete(either(pred("c", "=", 0), pred("a", "<", 100)))
+        self.table.update({"column_name": "b", "value": "odd"}, both(pred("c", "=", 1), pred("a", ">", 150)))
+        self.assertEqual(select(self.table, ["a", "b"], pred("c", "<>", 0)),
+                         [[a, "odd" if a > 150 and a % 3 == 1 else f"row{a % 7}"] for a in range(100, 200) if a % 3])
+
+    def test_insert_many(self):
+        self.table.create_index("c")
+        rows = [[a, f"row{a % 7}", a % 3] for a in range(200, 1200)]
+        blockPrint()
+        self.assertEqual(self.table.insert_many({"column_name_list": ["a", "b", "c"], "value_lists": rows}), 1200)
+        # a duplicate primary key, in the batch or already in the table, rejects the whole batch
+        for dup in [[1300, "x", 0], [5, "x", 0]]:
+            batch = {"column_name_list": ["a", "b", "c"], "value_lists": [[1300, "x", 0], dup]}
+            self.assertIsNone(self.table.insert_many(batch))
+        self.assertIsNone(self.table.insert_many({"column_name_list": ["a", "b", "c"], "value_lists": [[1300, "x", 2 ** 40]]}))
+        enablePrint()
+
+        self.assertEqual(self.table.record_count, 1200)
+        self.assertEqual([int(key.id) for key in self.table.bptree.scan()], list(range(1200)))
+        self.assertEqual(select(self.table, ["a", "b", "c"]), [[a, f"row{a % 7}", a % 3] for a in range(1200)])
+        self.assertIsInstance(next(self.table.bptree.scan(1100)).data.data_values[0], np.int32)
+
+        cond = {"negated": "FALSE", "column_name": "a", "comparator": ">=", "value": 1190}
+        self.assertEqual(select(self.table, ["a"], cond), [[a] for a in range(1190, 1200)])
+        cond = {"negated": "FALSE", "column_name": "c", "comparator": "=", "value": 1}
+        self.assertEqual(len(self.table._index_row_ids(dict(cond, column_ord=2, value=np.int32(1)))), 400)
+
+    def test_insert_many_bigint_bounds(self):
+        table = Table(512)
+        blockPrint()
+        table.update_metadata({"column_names": ["a", "b", "c"], "data_types": ["INT", "BIGINT", "BIGINT"],
+                               "nullability": ["NO", "NO", "NO"], "column_keys": ["PRI", "", "UNI"]}, 0, "t")
+        # past int64 either way, next to values in range
+        for big in [2 ** 63, -2 ** 63 - 1]:
+            for column in [1, 2]:
+                rows = [[1, 5, 5], [2, 6, 6]]
+                rows[1][column] = big
+                self.assertIsNone(table.insert_many({"column_name_list": ["a", "b", "c"], "value_lists": rows}))
+        rows = [[1, 2 ** 63 - 1, -2 ** 63], [2, 5, 5]]
+        self.assertEqual(table.insert_many({"column_name_list": ["a", "b", "c"], "value_lists": rows}), 2)
+        enablePrint()
+        self.assertEqual(select(table, ["a", "b", "c"]), rows)
+
+    def test_copy_from(self):
+        tmp = tempfile.TemporaryDirectory()
+        path = os.path.join(tmp.name, "rows.csv")
+        with open(path, "w") as f:
+            f.write("c,a,b\n")
+            f.writelines(f'{a % 3},{a},"row, {a % 7}"\n' for a in range(200, 2700))
+
+        chunk_rows = Settings.get_copy_chunk_rows()
+        Settings.set_copy_chunk_rows(1000)
+        try:
+            self.assertEqual(self.table.copy_from(path, ["c", "a", "b"], header=True), 2500)
+            self.assertEqual(select(self.table, ["a", "b", "c"], {"negated": "FALSE", "column_name": "a",
+                                                                  "comparator": ">=", "value": 2698}),
+                             [[2698, "row, 3", 1], [2699, "row, 4", 2]])
+
+            # chunks before the rejected one stay
+            with open(path, "w") as f:
+                f.writelines(f"{a},x,0\n" for a in range(3000, 4500))
+                f.write("4500,x,not a number\n")
+            blockPrint()
+            self.assertRaises(ValueError, self.table.copy_from, path)
+            enablePrint()
+            self.assertEqual(self.table.record_count, 3700)
+
+            with open(path, "w") as f:
+                f.write("5000,x\n")
+            self.assertRaises(ValueError, self.table.copy_from, path)
+        finally:
+            Settings.set_copy_chunk_rows(chunk_rows)
+            tmp.cleanup()
+
+    def test_aggregates(self):
+        def aggregate(*aggs, condition=None):
+            rows, headers = self.table.aggregate({
+                "aggregate_list": [{"function": f, "column_name": c} for f, c in aggs],
+                "condition": condition or {}
+            })
+            return rows[0]
+
+        for a in range(0, 200, 10):
+            self.table.delete({"negated": "FALSE", "column_name": "a", "comparator": "=", "value": a})
+        live = [a for a in range(200) if a % 10]
+
+        pool = self.table.bptree.pool
+        fetched = pool.hits + pool.misses
+        self.assertEqual(aggregate(("COUNT", "*"), ("MIN", "rowid"), ("MAX", "rowid")), [len(live), 1, 199])
+        # the edge leaves only
+        self.assertLessEqual(pool.hits + pool.misses - fetched, 2)
+
+        self.assertEqual(aggregate(("SUM", "c"), ("AVG", "a"), ("MIN", "b"), ("MAX", "a"), ("COUNT", "b")),
+                         [sum(a % 3 for a in live), sum(live) / len(live), "row0", 199, len(live)])
+
+        cond = {"negated": "FALSE", "column_name": "c", "comparator": "=", "value": 2}
+        matching = [a for a in live if a % 3 == 2]
+        self.assertEqual(aggregate(("COUNT", "*"), ("SUM", "a"), ("MAX", "rowid"), condition=cond),
+                         [len(matching), sum(matching), max(matching)])
+
+        cond = {"negated": "FALSE", "column_name": "a", "comparator": ">", "value": 500}
+        self.assertEqual(aggregate(("COUNT", "*"), ("SUM", "a"), ("MIN", "b"), condition=cond), [0, None, None])
+        self.assertRaises(TypeError, aggregate, ("SUM", "b"))
+
+
+class UniqueTests(unittest.TestCase):
+
+    def setUp(self):
+        self.table = make_table(100)
+        self.table.create_index("a")
+
+    def insert(self, a):
+        blockPrint()
+        count = self.table.insert({"column_name_list": ["a", "b", "c"], "value_list": [a, "new", 0]})
+        enablePrint()
+        return count
+
+    @staticmethod
+    def key(a):
+        return {"negated": "FALSE", "column_name": "a", "comparator": "=", "value": a}
+
+    def test_deleted_key_can_be_inserted_again(self):
+        self.assertIsNone(self.insert(5))
+        self.table.delete(self.key(5))
+        self.assertEqual(self.insert(5), 101)
+        self.assertIsNone(self.insert(5))
+        self.assertEqual(select(self.table, ["a", "b"], self.key(5)), [[5, "new"]])
+
+    def test_key_updated_to_a_free_value(self):
+        self.table.update({"column_name": "a", "value": 500}, self.key(7))
+        # the old value is free again, the new one taken
+        self.assertEqual(self.insert(7), 101)
+        self.assertIsNone(self.insert(500))
+        self.assertEqual(select(self.table, ["a", "b"], self.key(500)), [[500, "row0"]])
+        self.assertEqual(select(self.table, ["a", "b"], self.key(7)), [[7, "new"]])
+
+    def test_update_onto_an_existing_value_is_rejected(self):
+        blockPrint()
+        self.table.update({"column_name": "a", "value": 3}, self.key(7))
+        enablePrint()
+        self.assertEqual(select(self.table, ["a"], {"negated": "FALSE", "column_name": "a", "comparator": "<",
+                                                    "value": 10}), [[a] for a in range(10)])
+        # both values are still taken
+        self.assertIsNone(self.insert(3))
+        self.assertIsNone(self.insert(7))
+        self.assertEqual(self.insert(100), 101)
+
+
+class PageSizeTests(unittest.TestCase):
+
+    def test_long_text_on_overflow_pages(self):
+        pool_pages = Settings.get_buffer_pool_pages()
+        # written back and read again all along
+        Settings.set_buffer_pool_pages(8)
+        try:
+            for page_size in [512, 4096, 65536]:
+                blockPrint()
+                table = Table(page_size)
+                table.update_metadata(dict(CDATA), 0, "t")
+                texts = [f"{a} é " * (a * 97 % 6000) for a in range(150)]
+                for a, text in enumerate(texts):
+                    table.insert({"column_name_list": ["a", "b", "c"], "value_list": [a, text or "-", a % 3]})
+                enablePrint()
+
+                cond = {"negated": "FALSE", "column_name": "a", "comparator": "=", "value": 7}
+                table.update({"column_name": "b", "value": "short"}, cond)
+                table.delete(dict(cond, value=8))
+                texts[7], texts[8] = "short", None
+                expected = [[a, text or "-", a % 3] for a, text in enumerate(texts) if text is not None]
+
+                reopened = Table.from_byte_stream(table.to_byte_stream(), page_size, 149, dict(CDATA), "t")
+                self.assertEqual(select(reopened, ["a", "b", "c"]), expected)
+
+                # the leaves' chains are freed along with them
+                reopened.bptree.clear()
+                self.assertEqual(reopened.bptree.pager.page_count, 1)
+
+                # longer than an index page holds, up to the largest pages
+                if page_size < 65536:
+                    self.assertRaises(ValueError, table.create_index, "b")
+        finally:
+            Settings.set_buffer_pool_pages(pool_pages)
+
+    def test_largest_record_fits_either_insert(self):
+        cdata = {"column_names": ["a", "b", "c", "d", "e"], "data_types": ["INT", "TEXT", "TEXT", "BIGINT", "BIGINT"],
+                 "nullability": ["NO", "NO", "NO", "YES", "YES"], "column_keys": ["PRI", "", "", "", ""]}
+        table = Table(4096)
+        table.update_metadata(dict(cdata), 0, "t")
+        # NULLs take no bytes, the rest of the largest record is text
+        filler = table.max_rec_size - Record(0, table.schema, (0, "x" * 500, "y" * 500, None, None)).byte_size() + 1000
+        largest = [0, "x" * (filler // 2), "y" * (filler - filler // 2), None, None]
+        self.assertEqual(Record(0, table.schema, tuple(largest)).byte_size(), table.max_rec_size)
+
+        names = cdata["column_names"]
+        blockPrint()
+        self.assertEqual(table.insert({"column_name_list": names, "value_list": largest}), 1)
+        self.assertEqual(table.insert_many({"column_name_list": names, "value_lists": [[1] + largest[1:]]}), 2)
+        # a byte more is rejected by both, and neither inserts anything
+        over = [2, largest[1] + "x"] + largest[2:]
+        self.assertRaises(OverflowError, table.insert, {"column_name_list": names, "value_list": over})
+        self.assertIsNone(table.insert_many({"column_name_list": names, "value_lists": [[3, "-", "-", 0, 0], over]}))
+        enablePrint()
+        self.assertEqual(select(table, ["a", "d"]), [[0, None], [1, None]])
+
+
+class NullTests(unittest.TestCase):
+
+    def test_nulls_match_no_comparison(self):
+        blockPrint()
+        table = Table(512)
+        table.update_metadata({"column_names": ["a", "b", "c"], "data_types": ["INT", "INT", "TEXT"],
+                               "nullability": ["NO", "YES", "YES"], "column_keys": ["PRI", "", ""]}, 0, "n")
+        for a in range(30):
+            b, c = (None, None) if a % 3 == 0 else (a % 10, f"t{a % 10}")
+            table.insert({"column_name_list": ["a", "b", "c"], "value_list": [a, b, c]})
+        enablePrint()
+        rows = {a: a % 10 for a in range(30) if a % 3}
+
+        def cond(column, comp, value, negated="FALSE"):
+            return {"negated": negated, "column_name": column, "comparator": comp, "value": value}
+
+        self.assertEqual(select(table, ["a"], cond("b", ">", 4)), [[a] for a, b in rows.items() if b > 4])
+        self.assertEqual(select(table, ["a"], cond("b", ">", 4, "TRUE")), [[a] for a, b in rows.items() if b <= 4])
+        self.assertEqual(select(table, ["a"], cond("c", "<", "t3")), [[a] for a, b in rows.items() if b < 3])
+
+        table.update({"column_name": "c", "value": "z"}, cond("b", ">=", 5))
+        table.delete(cond("b", "<=", 2))
+        expected = [[a, b, "z" if b >= 5 else f"t{b}"] for a, b in rows.items() if b > 2]
+        self.assertEqual(select(table, ["a", "b", "c"], cond("b", "<>", 0)), expected)
+        self.assertEqual(len(select(table)), len(expected) + 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
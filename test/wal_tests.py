@@ -0,0 +1,130 @@
+import os
+import sys
+import tempfile
+import unittest
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../src")
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../src/file_abstractions")
+
+import main_loop
+from utils.settings import Settings
+from utils.utils import blockPrint, enablePrint
+from wal import WAL, WriteAheadLog
+
+
+class WriteAheadLogTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "rio.db.wal")
+        self.policy = Settings.get_wal_sync_policy()
+
+    def tearDown(self):
+        Settings.set_wal_sync_policy(self.policy)
+        self.tmp.cleanup()
+
+    def test_records_survive_reopen(self):
+        log = WriteAheadLog()
+        log.open(self.path)
+        records = [{"command": "DELETE", "table_name": "t", "condition": {}},
+                   {"command": "INSERT INTO TABLE", "table_name": "t", "value_list": ["1", "a b"]}]
+        for rec in records:
+            log.append(rec)
+        log.close()
+
+        reopened = WriteAheadLog()
+        reopened.open(self.path)
+        self.assertEqual(list(reopened.read_records()), [(1, records[0]), (2, records[1])])
+        self.assertEqual(reopened.next_lsn, 3)
+        reopened.close()
+
+    def test_torn_tail_is_cut(self):
+        log = WriteAheadLog()
+        log.open(self.path)
+        log.append({"command": "DROP TABLE", "table_name": "t"})
+        good_size = log.size
+        log.append({"command": "DROP TABLE", "table_name": "u"})
+        log.close()
+
+        with open(self.path, "r+b") as f:
+            f.truncate(os.path.getsize(self.path) - 3)
+
+        log.open(self.path)
+        self.assertEqual([lsn for lsn, _ in log.read_records()], [1])
+        self.assertEqual(os.path.getsize(self.path), good_size)
+        log.close()
+
+    def test_group_commit_batches_fsyncs(self):
+        Settings.set_wal_sync_policy("group")
+        size, window = Settings.get_wal_group_commit_size(), Settings.get_wal_group_commit_ms()
+        Settings.set_wal_group_commit_size(10)
+        Settings.set_wal_group_commit_ms(60_000)
+
+        log = WriteAheadLog()
+        log.open(self.path)
+        try:
+            for i in range(25):
+                log.append({"command": "DELETE", "table_name": f"t{i}", "condition": {}})
+            self.assertEqual(log.syncs, 2)
+            log.close()
+            self.assertEqual(log.syncs, 3)
+        finally:
+            Settings.set_wal_group_commit_size(size)
+            Settings.set_wal_group_commit_ms(window)
+
+        Settings.set_wal_sync_policy("always")
+        log.open(self.path)
+        log.append({"command": "DROP TABLE", "table_name": "t"})
+        self.assertEqual(log.syncs, 4)
+        log.close()
+
+
+class CheckpointTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        self.pool_pages = Settings.get_buffer_pool_pages()
+        self.dirty_pages = Settings.get_wal_checkpoint_dirty_pages()
+
+    def tearDown(self):
+        enablePrint()
+        WAL.close()
+        if main_loop.database is not None:
+            main_loop.database.close()
+            main_loop.database = None
+        Settings.set_buffer_pool_pages(self.pool_pages)
+        Settings.set_wal_checkpoint_dirty_pages(self.dirty_pages)
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def test_changed_pages_call_for_a_checkpoint(self):
+        # leaves are written back all through an update of the whole table
+        Settings.set_buffer_pool_pages(8)
+        tables, indices = {}, {}
+        blockPrint()
+        main_loop.load_db(tables, indices)
+        for statement in ["init db;", "create table t (a int primary key, b text);",
+                          "insert into table (a, b) t values " + ", ".join(f"({a}, 'row{a}')" for a in range(400)) + ";",
+                          "save;"]:
+            main_loop.query_delegator(statement, tables, indices)
+        database = main_loop.open_database()
+
+        # the log is far from full, the written back pages are held in memory
+        main_loop.query_delegator("update t set b = 'first' where a >= 0;", tables, indices)
+        self.assertGreater(database.dirty_pages, 16)
+        self.assertLess(database.checkpoint_lsn, WAL.next_lsn - 1)
+
+        Settings.set_wal_checkpoint_dirty_pages(16)
+        main_loop.query_delegator("update t set b = 'second' where a >= 0;", tables, indices)
+        self.assertEqual(database.dirty_pages, 0)
+        self.assertEqual(database.checkpoint_lsn, WAL.next_lsn - 1)
+        self.assertEqual(WAL.size, 0)
+        enablePrint()
+
+        rows, _ = tables["t"].select({"column_name_list": ["b"], "condition": {}})
+        self.assertEqual(rows, [["second"]] * 400)
+
+
+if __name__ == "__main__":
+    unittest.main()